@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Контентно-адресуемое хранилище чекпоинтов и артефактов с дедупликацией
+
+Тензоры режутся на чанки, каждый чанк хешируется (sha256) и хранится один
+раз в сжатом виде: <store>/chunks/<ab>/<hash>. Для каждого чекпоинта пишется
+небольшой JSON-манифест со списком чанков, поэтому неизменившиеся слои между
+чекпоинтами и запусками ничего не стоят.
+
+Использование:
+    python artifact_store.py ingest ../results --store ../results/store --remove-originals
+    python artifact_store.py stats --store ../results/store
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import zlib
+from typing import Any, Dict, List, Optional
+
+import torch
+
+from checkpoint_io import (MANIFEST_EXT, SAFETENSORS_EXT, code_to_dtype, dtype_to_code,
+                           flatten_checkpoint, load_checkpoint, tensor_bytes, unflatten_checkpoint)
+
+MANIFEST_FORMAT = "ml-artifact-manifest/1"
+CHUNK_SIZE = 4 * 1024 * 1024
+COMPRESSION_LEVEL = 3
+# Первый байт чанка — кодек: сжатые веса float32 часто почти не сжимаются,
+# тогда храним как есть и не платим за распаковку
+CODEC_ZLIB = b"Z"
+CODEC_RAW = b"R"
+CHECKPOINT_EXTS = (".pth", ".pt", SAFETENSORS_EXT)
+
+
+class ArtifactStore:
+    """Хранилище уникальных сжатых чанков"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.chunks_dir = os.path.join(root, "chunks")
+        os.makedirs(self.chunks_dir, exist_ok=True)
+        self.stats = {"chunks_written": 0, "chunks_reused": 0, "bytes_written": 0, "bytes_reused": 0}
+
+    def _chunk_path(self, digest: str) -> str:
+        return os.path.join(self.chunks_dir, digest[:2], digest)
+
+    def put_chunk(self, data) -> str:
+        """Сохраняет чанк, если его ещё нет, и возвращает его хеш"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._chunk_path(digest)
+        if os.path.exists(path):
+            self.stats["chunks_reused"] += 1
+            self.stats["bytes_reused"] += len(data)
+            return digest
+
+        compressed = zlib.compress(data, COMPRESSION_LEVEL)
+        payload = CODEC_ZLIB + compressed if len(compressed) < len(data) else CODEC_RAW + bytes(data)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp.{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+        self.stats["chunks_written"] += 1
+        self.stats["bytes_written"] += len(payload)
+        return digest
+
+    def get_chunk(self, digest: str) -> bytes:
+        """Читает и распаковывает чанк"""
+        with open(self._chunk_path(digest), "rb") as f:
+            payload = f.read()
+        codec, body = payload[:1], payload[1:]
+        return zlib.decompress(body) if codec == CODEC_ZLIB else body
+
+    def put_bytes(self, data) -> List[str]:
+        """Режет буфер на чанки фиксированного размера"""
+        view = memoryview(data)
+        return [self.put_chunk(view[i:i + CHUNK_SIZE]) for i in range(0, len(view), CHUNK_SIZE)]
+
+    def get_bytes(self, digests: List[str]) -> bytes:
+        return b"".join(self.get_chunk(digest) for digest in digests)
+
+    def put_tensor(self, tensor: torch.Tensor) -> Dict[str, Any]:
+        """Описание тензора для манифеста"""
+        return {
+            "dtype": dtype_to_code(tensor.dtype),
+            "shape": list(tensor.shape),
+            "chunks": self.put_bytes(tensor_bytes(tensor)),
+        }
+
+    def get_tensor(self, entry: Dict[str, Any]) -> torch.Tensor:
+        dtype = code_to_dtype(entry["dtype"])
+        data = bytearray(self.get_bytes(entry["chunks"]))
+        if not data:
+            return torch.empty(entry["shape"], dtype=dtype)
+        return torch.frombuffer(data, dtype=dtype).view(entry["shape"])
+
+    def put_checkpoint(self, obj: Any, manifest_path: str) -> str:
+        """Сохраняет чекпоинт (state_dict/словарь) и пишет манифест"""
+        tensors, structure = flatten_checkpoint(obj)
+        manifest = {
+            "format": MANIFEST_FORMAT,
+            "kind": "checkpoint",
+            "store": os.path.relpath(self.root, os.path.dirname(os.path.abspath(manifest_path))),
+            "structure": structure,
+            "tensors": {name: self.put_tensor(tensor) for name, tensor in tensors.items()},
+        }
+        return _write_manifest(manifest, manifest_path)
+
+    def put_file(self, path: str, manifest_path: str) -> str:
+        """Сохраняет произвольный файл (логи, результаты) и пишет манифест"""
+        with open(path, "rb") as f:
+            chunks = self.put_bytes(f.read())
+        manifest = {
+            "format": MANIFEST_FORMAT,
+            "kind": "file",
+            "store": os.path.relpath(self.root, os.path.dirname(os.path.abspath(manifest_path))),
+            "name": os.path.basename(path),
+            "size": os.path.getsize(path),
+            "chunks": chunks,
+        }
+        return _write_manifest(manifest, manifest_path)
+
+    def referenced_size(self) -> Dict[str, int]:
+        """Число чанков и их суммарный размер на диске"""
+        count, size = 0, 0
+        for dirpath, _, filenames in os.walk(self.chunks_dir):
+            for name in filenames:
+                count += 1
+                size += os.path.getsize(os.path.join(dirpath, name))
+        return {"chunks": count, "bytes": size}
+
+
+def _write_manifest(manifest: Dict[str, Any], manifest_path: str) -> str:
+    """Атомарная запись манифеста (после всех чанков)"""
+    tmp_path = f"{manifest_path}.tmp.{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, separators=(",", ":"))
+    os.replace(tmp_path, manifest_path)
+    return manifest_path
+
+
+def _read_manifest(manifest_path: str):
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != MANIFEST_FORMAT:
+        raise ValueError(f"Не манифест хранилища: {manifest_path}")
+    root = os.path.join(os.path.dirname(os.path.abspath(manifest_path)), manifest["store"])
+    return manifest, ArtifactStore(os.path.normpath(root))
+
+
+def load_manifest(manifest_path: str) -> Any:
+    """Восстанавливает чекпоинт по манифесту"""
+    manifest, store = _read_manifest(manifest_path)
+    if manifest["kind"] != "checkpoint":
+        raise ValueError(f"Манифест описывает файл, а не чекпоинт: {manifest_path}")
+    tensors = {name: store.get_tensor(entry) for name, entry in manifest["tensors"].items()}
+    return unflatten_checkpoint(tensors, manifest["structure"])
+
+
+def restore_file(manifest_path: str, out_path: Optional[str] = None) -> str:
+    """Восстанавливает исходный файл по манифесту"""
+    manifest, store = _read_manifest(manifest_path)
+    out_path = out_path or os.path.join(os.path.dirname(manifest_path), manifest["name"])
+    with open(out_path, "wb") as f:
+        for digest in manifest["chunks"]:
+            f.write(store.get_chunk(digest))
+    return out_path
+
+
+def manifest_path_for(path: str) -> str:
+    """checkpoint_epoch_2.pth -> checkpoint_epoch_2.manifest.json"""
+    for ext in CHECKPOINT_EXTS:
+        if path.endswith(ext):
+            return path[:-len(ext)] + MANIFEST_EXT
+    return path + MANIFEST_EXT
+
+
+def _is_within(path: str, root: str) -> bool:
+    """path совпадает с root или лежит внутри (по компонентам, а не префиксу строки)"""
+    try:
+        return os.path.commonpath([path, root]) == root
+    except ValueError:
+        # Разные диски (Windows)
+        return False
+
+
+def ingest_tree(root: str, store: ArtifactStore, remove_originals: bool = False) -> Dict[str, int]:
+    """
+    Переносит все чекпоинты под root в хранилище
+
+    .pth читаются с weights_only=True (без распаковки произвольных объектов).
+    Нечитаемые или неподходящие файлы пропускаются по одному и остаются на месте.
+    """
+    ingested, skipped = 0, 0
+    store_root = os.path.abspath(store.root)
+    for dirpath, dirnames, filenames in os.walk(root):
+        if _is_within(os.path.abspath(dirpath), store_root):
+            dirnames[:] = []
+            continue
+        for name in sorted(filenames):
+            if not name.endswith(CHECKPOINT_EXTS):
+                continue
+            path = os.path.join(dirpath, name)
+            try:
+                manifest_path = store.put_checkpoint(load_checkpoint(path, weights_only=True),
+                                                     manifest_path_for(path))
+            except Exception as e:
+                # Ошибки torch.load многострочные — в отчёт идёт первая строка
+                print(f"⚠️ Skipped {path}: {str(e).splitlines()[0] if str(e) else type(e).__name__}",
+                      file=sys.stderr)
+                skipped += 1
+                continue
+            print(f"📦 {path} -> {manifest_path}")
+            if remove_originals:
+                os.remove(path)
+            ingested += 1
+    return {"ingested": ingested, "skipped": skipped}
+
+
+def cmd_ingest(args):
+    """Команда импорта существующих чекпоинтов"""
+    store = ArtifactStore(args.store)
+    total, skipped = 0, 0
+    for root in args.paths:
+        counts = ingest_tree(root, store, args.remove_originals)
+        total += counts["ingested"]
+        skipped += counts["skipped"]
+    stats = store.stats
+    if skipped:
+        print(f"⚠️ Skipped {skipped} unreadable checkpoint(s)")
+    print(f"✅ Ingested {total} checkpoint(s): "
+          f"{stats['chunks_written']} new chunk(s) ({stats['bytes_written'] / 1024**2:.1f} MB), "
+          f"{stats['chunks_reused']} reused ({stats['bytes_reused'] / 1024**2:.1f} MB deduplicated)")
+
+
+def cmd_stats(args):
+    """Команда статистики хранилища"""
+    usage = ArtifactStore(args.store).referenced_size()
+    print(f"📊 {args.store}: {usage['chunks']} chunk(s), {usage['bytes'] / 1024**2:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Content-addressed artifact store")
+    subparsers = parser.add_subparsers(dest="command")
+
+    ingest_parser = subparsers.add_parser("ingest", help="Импорт .pth/.safetensors в хранилище")
+    ingest_parser.add_argument("paths", nargs="+", help="Директории с чекпоинтами")
+    ingest_parser.add_argument("--store", required=True, help="Корень хранилища")
+    ingest_parser.add_argument("--remove-originals", action="store_true",
+                               help="Удалить исходные файлы после импорта")
+
+    stats_parser = subparsers.add_parser("stats", help="Размер хранилища")
+    stats_parser.add_argument("--store", required=True, help="Корень хранилища")
+
+    args = parser.parse_args()
+    if args.command == "ingest":
+        cmd_ingest(args)
+    elif args.command == "stats":
+        cmd_stats(args)
+    else:
+        parser.print_help()
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Формат чекпоинтов с отображением в память (safetensors-совместимый)
+
+Файл: 8 байт длины заголовка (u64 little-endian) + JSON-заголовок + плоский
+блоб тензоров. Структура исходного словаря (optimizer state, скаляры, списки)
+хранится строкой в "__metadata__", поэтому файл читается и библиотекой
+safetensors. Загрузка идёт через mmap без копирования: несколько процессов
+на одном хосте делят одни и те же физические страницы.
+"""
+
+import json
+import mmap
+import os
+import struct
+from typing import Any, Dict, Optional, Tuple
+
+import torch
+
+FORMAT_NAME = "ml-checkpoint/1"
+SAFETENSORS_EXT = ".safetensors"
+MANIFEST_EXT = ".manifest.json"
+HEADER_ALIGNMENT = 8
+TENSOR_REF_KEY = "__tensor__"
+DICT_ITEMS_KEY = "__items__"
+TUPLE_KEY = "__tuple__"
+
+_DTYPE_TO_CODE = {
+    torch.float64: "F64",
+    torch.float32: "F32",
+    torch.float16: "F16",
+    torch.bfloat16: "BF16",
+    torch.int64: "I64",
+    torch.int32: "I32",
+    torch.int16: "I16",
+    torch.int8: "I8",
+    torch.uint8: "U8",
+    torch.bool: "BOOL",
+}
+_CODE_TO_DTYPE = {code: dtype for dtype, code in _DTYPE_TO_CODE.items()}
+
+
+def _flatten(obj: Any, prefix: str, tensors: Dict[str, torch.Tensor]) -> Any:
+    """Заменяет тензоры ссылками и возвращает JSON-совместимую структуру"""
+    if isinstance(obj, torch.Tensor):
+        # Путь через "." неоднозначен ({"a.b": t1, "a": {"b": t2}}): при совпадении
+        # имя получает суффикс, структура всё равно ссылается на точное имя
+        name, copy = prefix, 1
+        while name in tensors:
+            name, copy = f"{prefix}#{copy}", copy + 1
+        tensors[name] = obj
+        return {TENSOR_REF_KEY: name}
+    if isinstance(obj, dict):
+        items = [[key, _flatten(value, f"{prefix}.{key}" if prefix else str(key), tensors)]
+                 for key, value in obj.items()]
+        # JSON не хранит нецелые ключи (например, int в optimizer.state) — сохраняем пары
+        if all(isinstance(key, str) for key, _ in items):
+            return {key: value for key, value in items}
+        return {DICT_ITEMS_KEY: items}
+    if isinstance(obj, (list, tuple)):
+        values = [_flatten(value, f"{prefix}.{i}", tensors) for i, value in enumerate(obj)]
+        return {TUPLE_KEY: values} if isinstance(obj, tuple) else values
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        return obj
+    raise TypeError(f"Неподдерживаемый тип в чекпоинте: {type(obj).__name__} ({prefix})")
+
+
+def _unflatten(node: Any, tensors: Dict[str, torch.Tensor]) -> Any:
+    """Восстанавливает исходную структуру по ссылкам на тензоры"""
+    if isinstance(node, dict):
+        if TENSOR_REF_KEY in node:
+            return tensors[node[TENSOR_REF_KEY]]
+        if DICT_ITEMS_KEY in node:
+            return {key: _unflatten(value, tensors) for key, value in node[DICT_ITEMS_KEY]}
+        if TUPLE_KEY in node:
+            return tuple(_unflatten(value, tensors) for value in node[TUPLE_KEY])
+        return {key: _unflatten(value, tensors) for key, value in node.items()}
+    if isinstance(node, list):
+        return [_unflatten(value, tensors) for value in node]
+    return node
+
+
+def flatten_checkpoint(obj: Any) -> Tuple[Dict[str, torch.Tensor], Any]:
+    """Разделяет чекпоинт на плоский словарь тензоров и JSON-структуру"""
+    tensors: Dict[str, torch.Tensor] = {}
+    structure = _flatten(obj, "", tensors)
+    return tensors, structure
+
+
+def unflatten_checkpoint(tensors: Dict[str, torch.Tensor], structure: Any) -> Any:
+    """Обратная операция к flatten_checkpoint"""
+    return _unflatten(structure, tensors)
+
+
+def dtype_to_code(dtype: torch.dtype) -> str:
+    """Код типа в нотации safetensors"""
+    if dtype not in _DTYPE_TO_CODE:
+        raise TypeError(f"Неподдерживаемый dtype: {dtype}")
+    return _DTYPE_TO_CODE[dtype]
+
+
+def code_to_dtype(code: str) -> torch.dtype:
+    """torch.dtype по коду safetensors"""
+    if code not in _CODE_TO_DTYPE:
+        raise ValueError(f"Неизвестный dtype в заголовке: {code}")
+    return _CODE_TO_DTYPE[code]
+
+
+def tensor_bytes(tensor: torch.Tensor) -> memoryview:
+    """Сырые байты тензора (CPU, contiguous) без лишних копий"""
+    tensor = tensor.detach().to("cpu").contiguous()
+    if tensor.numel() == 0:
+        return memoryview(b"")
+    return memoryview(tensor.view(-1).view(torch.uint8).numpy())
+
+
+def save_checkpoint(obj: Any, path: str, metadata: Optional[Dict[str, str]] = None) -> str:
+    """
+    Сохраняет чекпоинт в mmap-формате
+
+    Запись атомарная (временный файл + os.replace), поэтому наблюдатели
+    за директорией никогда не видят частично записанный файл.
+
+    Args:
+        obj: словарь/state_dict с тензорами и простыми значениями
+        path: путь к файлу (.safetensors)
+        metadata: дополнительные строковые метаданные
+    """
+    tensors, structure = flatten_checkpoint(obj)
+
+    # Сортировка по размеру элемента: при выровненном начале блоба каждый
+    # тензор оказывается выровнен по своему dtype без паддинга между ними
+    order = sorted(tensors, key=lambda name: (-tensors[name].element_size(), name))
+    header: Dict[str, Any] = {}
+    offset = 0
+    for name in order:
+        tensor = tensors[name]
+        nbytes = tensor.numel() * tensor.element_size()
+        header[name] = {
+            "dtype": dtype_to_code(tensor.dtype),
+            "shape": list(tensor.shape),
+            "data_offsets": [offset, offset + nbytes],
+        }
+        offset += nbytes
+
+    meta = {"format": FORMAT_NAME, "structure": json.dumps(structure)}
+    meta.update(metadata or {})
+    header["__metadata__"] = meta
+
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    header_bytes += b" " * (-len(header_bytes) % HEADER_ALIGNMENT)
+
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for name in order:
+            f.write(tensor_bytes(tensors[name]))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return path
+
+
+class CheckpointFile:
+    """
+    Ленивый доступ к чекпоинту через mmap
+
+    Заголовок читается при открытии, тензоры создаются только по запросу и
+    ссылаются прямо на отображённые страницы файла (copy-on-write).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            (header_len,) = struct.unpack("<Q", f.read(8))
+            self.header = json.loads(f.read(header_len))
+            # ACCESS_COPY: приватное отображение — страницы общие с page cache,
+            # пока в них никто не пишет, и тензоры остаются записываемыми
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY) \
+                if os.path.getsize(path) > 8 + header_len else None
+        self.metadata: Dict[str, str] = self.header.pop("__metadata__", {})
+        self._data_start = 8 + header_len
+
+    def keys(self):
+        """Имена тензоров в файле"""
+        return self.header.keys()
+
+    def get_tensor(self, name: str) -> torch.Tensor:
+        """Тензор без копирования данных"""
+        info = self.header[name]
+        dtype = code_to_dtype(info["dtype"])
+        start, end = info["data_offsets"]
+        if end == start:
+            return torch.empty(info["shape"], dtype=dtype)
+        count = (end - start) // torch.empty((), dtype=dtype).element_size()
+        flat = torch.frombuffer(self._mmap, dtype=dtype, count=count,
+                                offset=self._data_start + start)
+        return flat.view(info["shape"])
+
+    def load(self) -> Any:
+        """Восстанавливает исходную структуру чекпоинта"""
+        tensors = {name: self.get_tensor(name) for name in self.keys()}
+        structure = self.metadata.get("structure")
+        if structure is None:
+            # Обычный safetensors-файл без нашей структуры — плоский state_dict
+            return tensors
+        return unflatten_checkpoint(tensors, json.loads(structure))
+
+
+def open_checkpoint(path: str) -> CheckpointFile:
+    """Открывает чекпоинт для ленивого чтения"""
+    return CheckpointFile(path)
+
+
+def load_checkpoint(path: str, map_location: Optional[str] = None, weights_only: bool = False) -> Any:
+    """
+    Загружает чекпоинт любого поддерживаемого формата
+
+    .safetensors читается через mmap без копирования, манифесты — из
+    хранилища артефактов (artifact_store), остальные файлы — через torch.load. Для совместного использования страниц между процессами
+    загружайте веса через model.load_state_dict(state, assign=True).
+    weights_only=True запрещает torch.load распаковывать произвольные объекты
+    (для файлов из непроверенных источников).
+    """
+    if path.endswith(SAFETENSORS_EXT):
+        state = open_checkpoint(path).load()
+        if map_location is not None and torch.device(map_location).type != "cpu":
+            state = _to_device(state, map_location)
+        return state
+    if path.endswith(MANIFEST_EXT):
+        # Ленивый импорт: artifact_store сам зависит от этого модуля
+        from artifact_store import load_manifest
+        return _to_device(load_manifest(path), map_location or "cpu")
+    return torch.load(path, map_location=map_location or "cpu", weights_only=weights_only)
+
+
+def _to_device(obj: Any, device: str) -> Any:
+    """Переносит все тензоры структуры на устройство"""
+    if isinstance(obj, torch.Tensor):
+        return obj.to(device)
+    if isinstance(obj, dict):
+        return {key: _to_device(value, device) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_to_device(value, device) for value in obj)
+    return obj
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Адаптивный интервал чекпоинтов по модели стоимости Young/Daly
+
+Тренер измеряет фактическое время шага и записи чекпоинта, а ожидаемая
+частота прерываний берётся из параметра, переменной окружения или истории
+раннера. Интервал пересчитывается после каждого измерения и минимизирует
+сумму накладных расходов на чекпоинты и ожидаемой потерянной работы.
+"""
+
+import json
+import math
+import os
+from typing import Optional
+
+SECONDS_PER_HOUR = 3600.0
+# Один сбой за 72-часовой запуск — консервативная оценка без истории
+DEFAULT_INTERRUPTIONS_PER_HOUR = 1.0 / 72
+INTERRUPTION_RATE_ENV = "ML_INTERRUPTIONS_PER_HOUR"
+RUNNER_HISTORY_ENV = "ML_RUNNER_HISTORY"
+# Интервал до первого измерения стоимости чекпоинта (прежнее поведение)
+INITIAL_INTERVAL_STEPS = 2
+EMA_SMOOTHING = 0.3
+
+
+def daly_interval(checkpoint_cost: float, mtbf: float) -> float:
+    """
+    Оптимальное время работы между чекпоинтами (Daly, 2006)
+
+    Args:
+        checkpoint_cost: время записи чекпоинта, сек
+        mtbf: среднее время между прерываниями, сек
+    """
+    if checkpoint_cost <= 0:
+        return 0.0
+    if checkpoint_cost >= 2 * mtbf:
+        return mtbf
+    ratio = checkpoint_cost / (2 * mtbf)
+    young = math.sqrt(2 * checkpoint_cost * mtbf)
+    return young * (1 + math.sqrt(ratio) / 3 + ratio / 9) - checkpoint_cost
+
+
+def interruption_rate_from_history(path: str) -> Optional[float]:
+    """
+    Частота прерываний (в час) по истории раннера
+
+    Файл JSONL, одна запись на запуск: {"duration_hours": 12.5, "interrupted": true}
+    """
+    if not os.path.exists(path):
+        return None
+    hours, interruptions = 0.0, 0
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            # Последняя строка прерванного запуска может быть недописана — пропускаем
+            try:
+                record = json.loads(line)
+                duration = float(record.get("duration_hours", 0.0))
+            except (ValueError, TypeError, AttributeError):
+                continue
+            hours += duration
+            interruptions += int(bool(record.get("interrupted", False)))
+    if hours <= 0:
+        return None
+    # +1 в числителе: без единого сбоя в истории интервал не уходит в бесконечность
+    return (interruptions + 1) / hours
+
+
+def resolve_interruption_rate(interruptions_per_hour: Optional[float] = None) -> float:
+    """Параметр -> переменная окружения -> история раннера -> значение по умолчанию"""
+    if interruptions_per_hour is not None:
+        return interruptions_per_hour
+    if os.environ.get(INTERRUPTION_RATE_ENV):
+        return float(os.environ[INTERRUPTION_RATE_ENV])
+    history_path = os.environ.get(RUNNER_HISTORY_ENV)
+    if history_path:
+        rate = interruption_rate_from_history(history_path)
+        if rate is not None:
+            return rate
+    return DEFAULT_INTERRUPTIONS_PER_HOUR
+
+
+class CheckpointPolicy:
+    """Решает, когда писать чекпоинт, по измеренным стоимостям"""
+
+    def __init__(self, interruptions_per_hour: Optional[float] = None,
+                 initial_interval_steps: int = INITIAL_INTERVAL_STEPS):
+        self.interruptions_per_hour = resolve_interruption_rate(interruptions_per_hour)
+        if self.interruptions_per_hour <= 0:
+            raise ValueError("interruptions_per_hour must be positive")
+        self.mtbf = SECONDS_PER_HOUR / self.interruptions_per_hour
+        self.initial_interval_steps = initial_interval_steps
+        self.step_time: Optional[float] = None
+        self.checkpoint_cost: Optional[float] = None
+        self.steps_since_checkpoint = 0
+        self.work_since_checkpoint = 0.0
+
+    @staticmethod
+    def _ema(current: Optional[float], value: float) -> float:
+        return value if current is None else (1 - EMA_SMOOTHING) * current + EMA_SMOOTHING * value
+
+    def record_step(self, seconds: float):
+        """Учитывает завершённый шаг (эпоху) тренировки"""
+        self.step_time = self._ema(self.step_time, seconds)
+        self.steps_since_checkpoint += 1
+        self.work_since_checkpoint += seconds
+
+    def record_checkpoint(self, seconds: float):
+        """Учитывает запись чекпоинта и сбрасывает накопленную работу"""
+        self.checkpoint_cost = self._ema(self.checkpoint_cost, seconds)
+        self.steps_since_checkpoint = 0
+        self.work_since_checkpoint = 0.0
+
+    def interval_seconds(self) -> Optional[float]:
+        """Текущий оптимальный интервал (None — стоимость ещё не измерена)"""
+        if self.checkpoint_cost is None:
+            return None
+        return daly_interval(self.checkpoint_cost, self.mtbf)
+
+    def interval_steps(self) -> int:
+        """Текущий интервал в шагах — для логов"""
+        interval = self.interval_seconds()
+        if interval is None or not self.step_time:
+            return self.initial_interval_steps
+        return max(1, round(interval / self.step_time))
+
+    def should_checkpoint(self) -> bool:
+        """Пора ли писать чекпоинт после последнего шага"""
+        interval = self.interval_seconds()
+        if interval is None:
+            return self.steps_since_checkpoint >= self.initial_interval_steps
+        return self.work_since_checkpoint >= interval
+
+    def expected_overhead(self) -> Optional[float]:
+        """Ожидаемая доля потерь: чекпоинты + переделанная работа"""
+        interval = self.interval_seconds()
+        if interval is None or interval <= 0:
+            return None
+        return self.checkpoint_cost / interval + (interval + self.checkpoint_cost) / (2 * self.mtbf)
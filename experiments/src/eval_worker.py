@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Фоновая оценка чекпоинтов вне критического пути тренировки
+
+Отдельный процесс следит за <exp_dir>/checkpoints/, оценивает каждый новый
+чекпоинт на отложенной выборке крупными батчами в inference_mode со своим
+бюджетом потоков и дописывает accuracy/loss в <exp_dir>/logs/eval_metrics.jsonl.
+Завершается после оценки финальной модели.
+
+Использование:
+    python eval_worker.py ../results/exp_20250918_193000 --threads 2 --data-root ../data
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+import torch
+import torch.nn as nn
+
+from checkpoint_io import MANIFEST_EXT, SAFETENSORS_EXT, load_checkpoint
+from train_example import SimpleCNN
+
+EVAL_LOG_NAME = "eval_metrics.jsonl"
+CHECKPOINT_SUFFIXES = (SAFETENSORS_EXT, MANIFEST_EXT, ".pth")
+FINAL_MODEL_PREFIX = "final_model"
+DEFAULT_THREADS = 2
+DEFAULT_BATCH_SIZE = 1024
+DEFAULT_POLL_INTERVAL = 5.0
+SYNTHETIC_HELD_OUT_SIZE = 2048
+SYNTHETIC_SEED = 1234
+# Попыток загрузить чекпоинт, прежде чем считать его битым
+MAX_EVAL_ATTEMPTS = 5
+# Понижаем приоритет, чтобы оценка не отнимала CPU у тренировки
+EVAL_NICENESS = 10
+
+
+def load_held_out(data_root=None, size=SYNTHETIC_HELD_OUT_SIZE):
+    """
+    Отложенная выборка целиком в памяти (inputs, targets)
+
+    С data_root — тестовая часть CIFAR-10, иначе фиксированный синтетический
+    набор (для режима симуляции тренировки).
+    """
+    if data_root:
+        from torchvision import datasets, transforms
+        transform = transforms.Compose([
+            transforms.ToTensor(),
+            transforms.Normalize((0.5, 0.5, 0.5), (0.5, 0.5, 0.5))
+        ])
+        test_set = datasets.CIFAR10(data_root, train=False, download=False, transform=transform)
+        inputs = torch.stack([test_set[i][0] for i in range(len(test_set))])
+        targets = torch.tensor(test_set.targets)
+        return inputs, targets
+
+    generator = torch.Generator().manual_seed(SYNTHETIC_SEED)
+    inputs = torch.randn(size, 3, 32, 32, generator=generator)
+    targets = torch.randint(0, 10, (size,), generator=generator)
+    return inputs, targets
+
+
+def checkpoint_sort_key(name):
+    """Порядок оценки: чекпоинты по эпохам, финальная модель последней"""
+    if name.startswith(FINAL_MODEL_PREFIX):
+        return (1, 0, name)
+    match = re.search(r"epoch_(\d+)", name)
+    return (0, int(match.group(1)) if match else 0, name)
+
+
+def find_checkpoints(exp_dir):
+    """Готовые чекпоинты и финальная модель эксперимента"""
+    candidates = []
+    checkpoints_dir = os.path.join(exp_dir, "checkpoints")
+    if os.path.isdir(checkpoints_dir):
+        candidates += [os.path.join("checkpoints", name) for name in os.listdir(checkpoints_dir)]
+    candidates += [name for name in os.listdir(exp_dir) if name.startswith(FINAL_MODEL_PREFIX)]
+    # Временные файлы атомарной записи (*.tmp.<pid>) не проходят фильтр по суффиксу
+    ready = [name for name in candidates if name.endswith(CHECKPOINT_SUFFIXES)]
+    return sorted(ready, key=lambda name: checkpoint_sort_key(os.path.basename(name)))
+
+
+def read_evaluated(eval_log):
+    """Чекпоинты, уже оценённые в прошлых запусках воркера"""
+    if not os.path.exists(eval_log):
+        return set()
+    evaluated = set()
+    with open(eval_log) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            # Последняя строка прерванного запуска может быть недописана — пропускаем
+            try:
+                evaluated.add(json.loads(line)["checkpoint"])
+            except (ValueError, TypeError, KeyError):
+                continue
+    return evaluated
+
+
+def evaluate(model, inputs, targets, batch_size):
+    """Средний loss и accuracy на отложенной выборке"""
+    criterion = nn.CrossEntropyLoss(reduction="sum")
+    total_loss, correct = 0.0, 0
+    model.eval()
+    with torch.inference_mode():
+        for start in range(0, len(inputs), batch_size):
+            batch = inputs[start:start + batch_size]
+            target = targets[start:start + batch_size]
+            outputs = model(batch)
+            total_loss += criterion(outputs, target).item()
+            correct += (outputs.argmax(dim=1) == target).sum().item()
+    return total_loss / len(inputs), correct / len(inputs)
+
+
+def evaluate_checkpoint(path, inputs, targets, batch_size):
+    """Загружает чекпоинт и возвращает запись для лога метрик"""
+    state = load_checkpoint(path)
+    epoch = state.get("epoch") if "model_state_dict" in state else None
+    state_dict = state.get("model_state_dict", state)
+
+    model = SimpleCNN(num_classes=10)
+    model.load_state_dict(state_dict, assign=True)
+
+    eval_start = time.time()
+    loss, accuracy = evaluate(model, inputs, targets, batch_size)
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "epoch": epoch,
+        "loss": loss,
+        "accuracy": accuracy,
+        "num_samples": len(inputs),
+        "eval_time": time.time() - eval_start,
+    }
+
+
+def parent_alive(parent_pid):
+    """Жив ли процесс тренировки (без psutil считаем, что жив)"""
+    if parent_pid is None:
+        return True
+    try:
+        import psutil
+    except ImportError:
+        return True
+    return psutil.pid_exists(parent_pid)
+
+
+def run_worker(exp_dir, threads=DEFAULT_THREADS, batch_size=DEFAULT_BATCH_SIZE,
+               poll_interval=DEFAULT_POLL_INTERVAL, data_root=None, once=False, parent_pid=None):
+    """Основной цикл наблюдения за директорией чекпоинтов"""
+    torch.set_num_threads(threads)
+    if hasattr(os, "nice"):
+        os.nice(EVAL_NICENESS)
+
+    eval_log = os.path.join(exp_dir, "logs", EVAL_LOG_NAME)
+    os.makedirs(os.path.dirname(eval_log), exist_ok=True)
+    evaluated = read_evaluated(eval_log)
+    failures = {}
+    inputs, targets = load_held_out(data_root)
+    print(f"🔎 Eval worker: {exp_dir} ({len(inputs)} samples, {threads} thread(s))")
+
+    while True:
+        # Проверяем до прохода: после смерти тренировки делаем последний проход и выходим
+        training_alive = parent_alive(parent_pid)
+        pending = [name for name in find_checkpoints(exp_dir) if name not in evaluated]
+        for name in pending:
+            try:
+                record = evaluate_checkpoint(os.path.join(exp_dir, name), inputs, targets, batch_size)
+            except Exception as e:
+                # Повтор на следующем проходе; навсегда — только после MAX_EVAL_ATTEMPTS,
+                # иначе битая финальная модель держала бы воркер (и ждущую его тренировку)
+                failures[name] = failures.get(name, 0) + 1
+                print(f"❌ Failed to evaluate {name} (attempt {failures[name]}/{MAX_EVAL_ATTEMPTS}): {e}",
+                      file=sys.stderr)
+                if failures[name] >= MAX_EVAL_ATTEMPTS:
+                    evaluated.add(name)
+                continue
+            record["checkpoint"] = name
+            with open(eval_log, "a") as f:
+                f.write(json.dumps(record) + "\n")
+            evaluated.add(name)
+            print(f"   {name}: loss={record['loss']:.4f}, acc={record['accuracy']:.3f}")
+
+        if once or not training_alive or \
+                any(os.path.basename(name).startswith(FINAL_MODEL_PREFIX) for name in evaluated):
+            break
+        time.sleep(poll_interval)
+
+    print(f"✅ Eval worker finished: {eval_log}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent checkpoint evaluation worker")
+    parser.add_argument("exp_dir", help="Директория эксперимента (exp_<timestamp>)")
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS,
+                        help=f"Бюджет потоков для оценки (по умолчанию: {DEFAULT_THREADS})")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Размер батча (по умолчанию: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                        help="Период опроса директории, сек")
+    parser.add_argument("--data-root", default=None,
+                        help="Корень CIFAR-10 (иначе синтетическая отложенная выборка)")
+    parser.add_argument("--once", action="store_true", help="Оценить имеющиеся чекпоинты и выйти")
+    parser.add_argument("--parent-pid", type=int, default=None,
+                        help="PID тренировки: воркер завершится, если она упадёт")
+    args = parser.parse_args()
+
+    return run_worker(args.exp_dir, args.threads, args.batch_size, args.poll_interval,
+                      args.data_root, args.once, args.parent_pid)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Реестр экспериментов в SQLite поверх директорий exp_*
+
+Каждый запуск — строка в runs (конфигурация, хост, коммит, лучший/финальный
+loss), полная конфигурация — в configs (ключ/значение), метрики по эпохам —
+в metrics, пути чекпоинтов и моделей — в artifacts. train_model пишет в
+реестр по ходу тренировки, импортер добавляет существующие директории и
+пропускает уже импортированные без изменений. Индексы покрывают типичные
+запросы ("лучший loss при batch_size=32 за неделю") без обхода директорий.
+
+Использование:
+    python experiment_registry.py import ../results
+    python experiment_registry.py query --where batch_size=32 --since 7d --order best_loss --limit 5
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import sqlite3
+import subprocess
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+REGISTRY_NAME = "registry.sqlite"
+DEFAULT_REGISTRY_PATH = os.path.join("..", "results", REGISTRY_NAME)
+EXPERIMENT_PREFIX = "exp_"
+TRAINING_LOG = os.path.join("logs", "training.log")
+EVAL_LOG = os.path.join("logs", "eval_metrics.jsonl")
+ARTIFACT_SUFFIXES = (".safetensors", ".manifest.json", ".pth", ".pt")
+GIT_TIMEOUT = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    exp_dir TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    status TEXT NOT NULL,
+    host TEXT,
+    git_commit TEXT,
+    model TEXT,
+    dataset TEXT,
+    batch_size INTEGER,
+    learning_rate REAL,
+    num_epochs INTEGER,
+    epochs_completed INTEGER,
+    best_loss REAL,
+    final_loss REAL,
+    best_eval_accuracy REAL,
+    duration REAL,
+    source_signature TEXT
+);
+CREATE TABLE IF NOT EXISTS configs (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    value TEXT,
+    num_value REAL,
+    PRIMARY KEY (run_id, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    epoch INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (run_id, name, epoch)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS artifacts (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size_bytes INTEGER,
+    PRIMARY KEY (run_id, path)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS runs_started ON runs(started_at);
+CREATE INDEX IF NOT EXISTS runs_batch_loss ON runs(batch_size, best_loss);
+CREATE INDEX IF NOT EXISTS runs_best_loss ON runs(best_loss);
+CREATE INDEX IF NOT EXISTS configs_key_num ON configs(key, num_value, run_id);
+CREATE INDEX IF NOT EXISTS configs_key_value ON configs(key, value, run_id);
+CREATE INDEX IF NOT EXISTS metrics_name_value ON metrics(name, value);
+"""
+
+# Поля config.json, вынесенные в колонки runs для индексируемых запросов
+RUN_CONFIG_COLUMNS = ("model", "dataset", "batch_size", "learning_rate", "num_epochs")
+ORDER_COLUMNS = ("started_at", "best_loss", "final_loss", "best_eval_accuracy", "duration",
+                 "batch_size", "learning_rate", "epochs_completed")
+FILTER_COLUMNS = RUN_CONFIG_COLUMNS + ("status", "host", "git_commit", "name")
+NUMERIC_FILTER_COLUMNS = ("batch_size", "learning_rate", "num_epochs")
+SINCE_PATTERN = re.compile(r"^(\d+)([dhm])$")
+SINCE_UNITS = {"d": "days", "h": "hours", "m": "minutes"}
+
+
+def git_commit() -> Optional[str]:
+    """Текущий коммит: GITHUB_SHA в CI, иначе git rev-parse"""
+    if os.environ.get("GITHUB_SHA"):
+        return os.environ["GITHUB_SHA"]
+    try:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                timeout=GIT_TIMEOUT, cwd=os.path.dirname(os.path.abspath(__file__)))
+    except (subprocess.SubprocessError, OSError):
+        return None
+    return result.stdout.strip() or None
+
+
+def _numeric(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+
+def _filter_number(value) -> Optional[float]:
+    """Значение фильтра как число (None, если это не число)"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _source_signature(exp_dir: str) -> str:
+    """Подпись исходных файлов эксперимента для инкрементального импорта"""
+    parts = []
+    for name in ("config.json", TRAINING_LOG, EVAL_LOG):
+        try:
+            stat = os.stat(os.path.join(exp_dir, name))
+        except OSError:
+            continue
+        parts.append(f"{name}:{stat.st_mtime_ns}:{stat.st_size}")
+    return "|".join(parts)
+
+
+def _read_json(path, default=None):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def read_eval_metrics(exp_dir: str) -> List[Dict[str, Any]]:
+    """Записи logs/eval_metrics.jsonl (eval_worker); битые строки пропускаются"""
+    path = os.path.join(exp_dir, EVAL_LOG)
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+def _find_artifacts(exp_dir: str):
+    """(kind, относительный путь) чекпоинтов и финальной модели"""
+    found = []
+    checkpoints_dir = os.path.join(exp_dir, "checkpoints")
+    if os.path.isdir(checkpoints_dir):
+        found += [("checkpoint", os.path.join("checkpoints", name)) for name in sorted(os.listdir(checkpoints_dir))
+                  if name.endswith(ARTIFACT_SUFFIXES)]
+    found += [("final_model", name) for name in sorted(os.listdir(exp_dir))
+              if name.startswith("final_model") and name.endswith(ARTIFACT_SUFFIXES)]
+    return found
+
+
+def parse_since(value: str) -> str:
+    """"7d", "12h", "30m" или ISO-дата -> ISO-строка нижней границы"""
+    match = SINCE_PATTERN.match(value)
+    if match:
+        delta = timedelta(**{SINCE_UNITS[match.group(2)]: int(match.group(1))})
+        return (datetime.now() - delta).isoformat()
+    return datetime.fromisoformat(value).isoformat()
+
+
+def parse_where(items: List[str]) -> Dict[str, Any]:
+    """["batch_size=32", "sampler=importance"] -> словарь фильтров
+    
+    Значения остаются строками: приводит их query по типу колонки, иначе
+    текстовые поля вида git_commit=1234567 никогда бы не совпадали.
+    """
+    filters = {}
+    for item in items:
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"Filter must look like key=value: {item}")
+        filters[key] = value
+    return filters
+
+
+class ExperimentRegistry:
+    """
+    SQLite-реестр запусков
+
+    Args:
+        db_path: путь к файлу базы (создаётся при первом обращении)
+    """
+
+    def __init__(self, db_path: str = DEFAULT_REGISTRY_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        # WAL: запросы не блокируются записью идущей тренировки
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def begin_run(self, exp_dir: str, config: Dict[str, Any], status: str = "running",
+                  commit: Optional[str] = None) -> int:
+        """Создаёт (или перезаписывает) запуск и его конфигурацию; возвращает run_id"""
+        exp_dir = os.path.abspath(exp_dir)
+        with self.conn:
+            self.conn.execute("DELETE FROM runs WHERE exp_dir = ?", (exp_dir,))
+            cursor = self.conn.execute(
+                f"INSERT INTO runs (exp_dir, name, started_at, status, host, git_commit, "
+                f"{', '.join(RUN_CONFIG_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?{', ?' * len(RUN_CONFIG_COLUMNS)})",
+                (exp_dir, os.path.basename(exp_dir), config.get("timestamp"), status,
+                 config.get("host", platform.node()), commit or config.get("git_commit"),
+                 *[config.get(column) for column in RUN_CONFIG_COLUMNS]))
+            run_id = cursor.lastrowid
+            self.conn.executemany(
+                "INSERT INTO configs (run_id, key, value, num_value) VALUES (?, ?, ?, ?)",
+                [(run_id, key, json.dumps(value) if isinstance(value, (dict, list)) else str(value),
+                  _numeric(value)) for key, value in config.items()])
+        return run_id
+
+    def log_epoch(self, run_id: int, entry: Dict[str, Any]):
+        """Числовые поля записи эпохи -> metrics"""
+        epoch = entry["epoch"]
+        rows = [(run_id, epoch, name, _numeric(value)) for name, value in entry.items()
+                if name != "epoch" and _numeric(value) is not None]
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO metrics (run_id, epoch, name, value) "
+                                  "VALUES (?, ?, ?, ?)", rows)
+
+    def log_eval_metrics(self, run_id: int, records: List[Dict[str, Any]]):
+        """Записи eval_metrics.jsonl -> metrics с префиксом eval_"""
+        rows = []
+        for record in records:
+            epoch = record.get("epoch")
+            # Финальная модель без номера эпохи: -1
+            epoch = -1 if epoch is None else epoch
+            rows += [(run_id, epoch, f"eval_{name}", record[name]) for name in ("loss", "accuracy")
+                     if _numeric(record.get(name)) is not None]
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO metrics (run_id, epoch, name, value) "
+                                  "VALUES (?, ?, ?, ?)", rows)
+
+    def add_artifact(self, run_id: int, kind: str, path: str, exp_dir: Optional[str] = None):
+        """Путь артефакта; с exp_dir хранится относительно директории эксперимента"""
+        size = os.path.getsize(path) if os.path.exists(path) else None
+        if exp_dir:
+            path = os.path.relpath(path, exp_dir)
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO artifacts (run_id, kind, path, size_bytes) "
+                              "VALUES (?, ?, ?, ?)", (run_id, kind, path, size))
+
+    def finish_run(self, run_id: int, status: str = "completed", exp_dir: Optional[str] = None):
+        """Итоги запуска из metrics; с exp_dir фиксирует подпись исходных файлов"""
+        with self.conn:
+            self.conn.execute("""
+                UPDATE runs SET
+                    status = ?,
+                    finished_at = ?,
+                    epochs_completed = (SELECT MAX(epoch) FROM metrics
+                                        WHERE run_id = runs.run_id AND name = 'loss'),
+                    best_loss = (SELECT MIN(value) FROM metrics WHERE run_id = runs.run_id AND name = 'loss'),
+                    final_loss = (SELECT value FROM metrics WHERE run_id = runs.run_id AND name = 'loss'
+                                  ORDER BY epoch DESC LIMIT 1),
+                    best_eval_accuracy = (SELECT MAX(value) FROM metrics
+                                          WHERE run_id = runs.run_id AND name = 'eval_accuracy'),
+                    duration = (SELECT SUM(value) FROM metrics WHERE run_id = runs.run_id AND name = 'time'),
+                    source_signature = ?
+                WHERE run_id = ?""",
+                (status, datetime.now().isoformat(), _source_signature(exp_dir) if exp_dir else None, run_id))
+
+    def import_experiment(self, exp_dir: str, force: bool = False) -> bool:
+        """Импорт одной директории exp_*; False, если она не изменилась"""
+        exp_dir = os.path.abspath(exp_dir)
+        signature = _source_signature(exp_dir)
+        row = self.conn.execute("SELECT source_signature FROM runs WHERE exp_dir = ?", (exp_dir,)).fetchone()
+        if not force and row is not None and row["source_signature"] == signature:
+            return False
+
+        config = _read_json(os.path.join(exp_dir, "config.json"), {})
+        training_log = _read_json(os.path.join(exp_dir, TRAINING_LOG), [])
+        # Без training.log запуск прерван или ещё идёт
+        status = "completed" if training_log else "incomplete"
+        run_id = self.begin_run(exp_dir, config, status)
+        for entry in training_log:
+            self.log_epoch(run_id, entry)
+        self.log_eval_metrics(run_id, read_eval_metrics(exp_dir))
+        for kind, path in _find_artifacts(exp_dir):
+            self.add_artifact(run_id, kind, os.path.join(exp_dir, path), exp_dir)
+        self.finish_run(run_id, status, exp_dir)
+        return True
+
+    def import_tree(self, root: str, force: bool = False) -> Dict[str, int]:
+        """Инкрементальный импорт всех exp_* в root"""
+        counts = {"imported": 0, "unchanged": 0}
+        for name in sorted(os.listdir(root)):
+            path = os.path.join(root, name)
+            if name.startswith(EXPERIMENT_PREFIX) and os.path.isdir(path):
+                changed = self.import_experiment(path, force)
+                counts["imported" if changed else "unchanged"] += 1
+        return counts
+
+    def query(self, filters: Optional[Dict[str, Any]] = None, since: Optional[str] = None,
+              order_by: str = "best_loss", descending: bool = False, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Запуски по фильтрам
+
+        Args:
+            filters: колонки runs или произвольные ключи config.json -> значение
+            since: нижняя граница started_at (ISO)
+            order_by: одна из ORDER_COLUMNS
+        """
+        if order_by not in ORDER_COLUMNS:
+            raise ValueError(f"Cannot order by {order_by}; choose from {', '.join(ORDER_COLUMNS)}")
+        clauses, params = [], []
+        for key, value in (filters or {}).items():
+            number = _filter_number(value)
+            if key in NUMERIC_FILTER_COLUMNS:
+                if number is None:
+                    raise ValueError(f"Filter {key} needs a number, got {value!r}")
+                clauses.append(f"{key} = ?")
+                params.append(number)
+            elif key in FILTER_COLUMNS:
+                clauses.append(f"{key} = ?")
+                params.append(str(value))
+            elif number is not None:
+                # Ключ config.json может хранить и число, и текст из цифр — подходит любое
+                clauses.append("EXISTS (SELECT 1 FROM configs c WHERE c.run_id = runs.run_id "
+                               "AND c.key = ? AND (c.num_value = ? OR c.value = ?))")
+                params += [key, number, str(value)]
+            else:
+                clauses.append("EXISTS (SELECT 1 FROM configs c WHERE c.run_id = runs.run_id "
+                               "AND c.key = ? AND c.value = ?)")
+                params += [key, str(value)]
+        if since:
+            clauses.append("started_at >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        direction = "DESC" if descending else "ASC"
+        sql = (f"SELECT * FROM runs {where} ORDER BY {order_by} IS NULL, {order_by} {direction} LIMIT ?")
+        return [dict(row) for row in self.conn.execute(sql, params + [limit])]
+
+    def metrics(self, run_id: int, name: str = "loss") -> List[Dict[str, Any]]:
+        """Кривая метрики запуска по эпохам"""
+        rows = self.conn.execute("SELECT epoch, value FROM metrics WHERE run_id = ? AND name = ? ORDER BY epoch",
+                                 (run_id, name))
+        return [dict(row) for row in rows]
+
+    def artifacts(self, run_id: int) -> List[Dict[str, Any]]:
+        rows = self.conn.execute("SELECT kind, path, size_bytes FROM artifacts WHERE run_id = ? ORDER BY path",
+                                 (run_id,))
+        return [dict(row) for row in rows]
+
+
+def _format_value(value, fmt):
+    return "-" if value is None else format(value, fmt)
+
+
+def cmd_import(args):
+    with ExperimentRegistry(args.db) as registry:
+        counts = {"imported": 0, "unchanged": 0}
+        for root in args.paths:
+            for key, value in registry.import_tree(root, args.force).items():
+                counts[key] += value
+    print(f"✅ Imported {counts['imported']} run(s), {counts['unchanged']} unchanged -> {args.db}")
+
+
+def cmd_query(args):
+    with ExperimentRegistry(args.db) as registry:
+        runs = registry.query(parse_where(args.where), parse_since(args.since) if args.since else None,
+                              args.order, args.desc, args.limit)
+        if args.json:
+            print(json.dumps(runs, indent=2))
+            return
+        for run in runs:
+            print(f"{run['name']:<22} {run['status']:<11} bs={_format_value(run['batch_size'], 'd'):<5} "
+                  f"lr={_format_value(run['learning_rate'], 'g'):<8} "
+                  f"best={_format_value(run['best_loss'], '.4f'):<8} final={_format_value(run['final_loss'], '.4f'):<8} "
+                  f"acc={_format_value(run['best_eval_accuracy'], '.3f'):<6} {(run['git_commit'] or '')[:10]}")
+        print(f"📊 {len(runs)} run(s)")
+
+
+def cmd_show(args):
+    with ExperimentRegistry(args.db) as registry:
+        runs = registry.query({"name": args.name}, limit=1)
+        if not runs:
+            print(f"❌ Run not found: {args.name}")
+            return 1
+        run = runs[0]
+        run["loss_curve"] = registry.metrics(run["run_id"], "loss")
+        run["artifacts"] = registry.artifacts(run["run_id"])
+        print(json.dumps(run, indent=2))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite experiment registry")
+    parser.add_argument("--db", default=DEFAULT_REGISTRY_PATH,
+                        help=f"Файл реестра (по умолчанию: {DEFAULT_REGISTRY_PATH})")
+    subparsers = parser.add_subparsers(dest="command")
+
+    import_parser = subparsers.add_parser("import", help="Импорт директорий exp_*")
+    import_parser.add_argument("paths", nargs="+", help="Директории с exp_*")
+    import_parser.add_argument("--force", action="store_true", help="Переимпортировать без проверки подписи")
+
+    query_parser = subparsers.add_parser("query", help="Поиск запусков")
+    query_parser.add_argument("--where", nargs="*", default=[], help="Фильтры key=value (колонки или ключи config)")
+    query_parser.add_argument("--since", default=None, help="Нижняя граница старта: 7d, 12h, 30m или ISO-дата")
+    query_parser.add_argument("--order", default="best_loss", choices=ORDER_COLUMNS, help="Сортировка")
+    query_parser.add_argument("--desc", action="store_true", help="По убыванию")
+    query_parser.add_argument("--limit", type=int, default=20, help="Максимум строк")
+    query_parser.add_argument("--json", action="store_true", help="Вывод в JSON")
+
+    show_parser = subparsers.add_parser("show", help="Подробности запуска")
+    show_parser.add_argument("name", help="Имя директории (exp_<timestamp>)")
+
+    args = parser.parse_args()
+    if args.command == "import":
+        cmd_import(args)
+    elif args.command == "query":
+        cmd_query(args)
+    elif args.command == "show":
+        return cmd_show(args)
+    else:
+        parser.print_help()
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Быстрая проверка GPU/окружения через кешированный capability probe
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "scripts"))
+
+from capability_probe import get_report, print_report  # noqa: E402
+
+if __name__ == "__main__":
+    print("🔥 GPU Quick Test")
+    print("=" * 50)
+    # --deep: проверка CUDA через torch (TensorFlow не импортируется)
+    report = get_report(deep="--deep" in sys.argv, refresh="--refresh" in sys.argv)
+    print_report(report)
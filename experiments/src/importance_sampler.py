@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Семплер с выбором по важности (loss) и временным отсевом лёгких примеров
+
+Семплер хранит EMA лосса каждого примера и тянет примеры с вероятностью,
+растущей с лоссом (с примесью равномерного распределения, чтобы ни один
+пример не выпал навсегда). Примеры, которые несколько эпох подряд остаются
+лёгкими, случайной долей отправляются «отдыхать» на rest_epochs эпох.
+
+Несмещённость: вес примера i в лоссе батча равен c_i / (N * p_i), где p_i —
+вероятность выбора, N — размер всего датасета, c_i — компенсация отсева для
+оставшихся лёгких примеров (|E| / |E без отдыхающих|). Тогда мат. ожидание
+взвешенного лосса совпадает со средним лоссом по всему датасету.
+
+Использование:
+    sampler = LossImportanceSampler(len(dataset))
+    loader = DataLoader(IndexedDataset(dataset), batch_size=32, sampler=sampler)
+    for epoch in range(num_epochs):
+        sampler.set_epoch(epoch)
+        for inputs, targets, indices in loader:
+            losses = criterion_none(model(inputs), targets)
+            sampler.update(indices, losses.detach())
+            loss = (losses * sampler.weights_for(indices)).mean()
+"""
+
+from typing import Iterator, Optional
+
+import torch
+from torch.utils.data import Dataset, Sampler
+
+
+class IndexedDataset(Dataset):
+    """Обёртка, добавляющая индекс примера к (input, target)"""
+
+    def __init__(self, dataset: Dataset):
+        self.dataset = dataset
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, index):
+        inputs, target = self.dataset[index]
+        return inputs, target, index
+
+
+class LossImportanceSampler(Sampler[int]):
+    """
+    Args:
+        num_examples: размер датасета
+        budget_fraction: доля активных примеров, вытягиваемая за эпоху
+        alpha: «острота» предпочтения тяжёлых примеров (0 — равномерно)
+        uniform_mix: доля равномерного распределения в смеси
+        ema_decay: сглаживание лосса между эпохами
+        easy_quantile: примеры с EMA лосса ниже этого квантиля считаются лёгкими
+        prune_patience: сколько эпох подряд пример должен быть лёгким
+        prune_ratio: какая доля таких примеров отправляется отдыхать
+        rest_epochs: на сколько эпох
+    """
+
+    def __init__(self, num_examples: int, budget_fraction: float = 1.0, alpha: float = 1.0,
+                 uniform_mix: float = 0.1, ema_decay: float = 0.7, easy_quantile: float = 0.3,
+                 prune_patience: int = 3, prune_ratio: float = 0.5, rest_epochs: int = 2,
+                 seed: int = 0):
+        if not 0.0 < budget_fraction <= 1.0:
+            raise ValueError("budget_fraction must be in (0, 1]")
+        if not 0.0 < uniform_mix <= 1.0:
+            raise ValueError("uniform_mix must be in (0, 1] to keep every example reachable")
+        self.num_examples = num_examples
+        self.budget_fraction = budget_fraction
+        self.alpha = alpha
+        self.uniform_mix = uniform_mix
+        self.ema_decay = ema_decay
+        self.easy_quantile = easy_quantile
+        self.prune_patience = prune_patience
+        self.prune_ratio = prune_ratio
+        self.rest_epochs = rest_epochs
+        self.generator = torch.Generator().manual_seed(seed)
+
+        self.epoch = 0
+        self.loss_ema = torch.zeros(num_examples)
+        self.seen = torch.zeros(num_examples, dtype=torch.bool)
+        self.easy_streak = torch.zeros(num_examples, dtype=torch.long)
+        self.rest_until = torch.zeros(num_examples, dtype=torch.long)
+        self.probs = torch.full((num_examples,), 1.0 / num_examples)
+        self.weights = torch.ones(num_examples)
+
+    @property
+    def active(self) -> torch.Tensor:
+        """Маска примеров, которые не отдыхают в текущей эпохе"""
+        return self.rest_until <= self.epoch
+
+    def __len__(self) -> int:
+        return max(1, int(self.active.sum().item() * self.budget_fraction))
+
+    def __iter__(self) -> Iterator[int]:
+        draws = torch.multinomial(self.probs, len(self), replacement=True, generator=self.generator)
+        return iter(draws.tolist())
+
+    def update(self, indices: torch.Tensor, losses: torch.Tensor):
+        """Обновляет EMA лосса для только что обработанных примеров"""
+        indices = indices.to("cpu", torch.long)
+        losses = losses.detach().to("cpu", torch.float32)
+        previous = torch.where(self.seen[indices], self.loss_ema[indices], losses)
+        self.loss_ema[indices] = self.ema_decay * previous + (1 - self.ema_decay) * losses
+        self.seen[indices] = True
+
+    def weights_for(self, indices: torch.Tensor) -> torch.Tensor:
+        """Веса для несмещённого взвешенного лосса батча"""
+        return self.weights[indices.to("cpu", torch.long)]
+
+    def set_epoch(self, epoch: int):
+        """Отсев лёгких примеров и пересчёт вероятностей на новую эпоху"""
+        self.epoch = epoch
+        easy_group = self._update_pruning()
+        self._update_probabilities(easy_group)
+
+    def _update_pruning(self) -> torch.Tensor:
+        """Возвращает группу «устойчиво лёгких» примеров (отдыхающие + кандидаты)"""
+        if self.seen.sum() == 0:
+            return torch.zeros(self.num_examples, dtype=torch.bool)
+
+        threshold = torch.quantile(self.loss_ema[self.seen], self.easy_quantile)
+        # Отдыхающие не переоцениваются — их счётчик замораживается
+        evaluated = self.seen & self.active
+        easy = evaluated & (self.loss_ema <= threshold)
+        self.easy_streak = torch.where(easy, self.easy_streak + 1,
+                                       torch.where(evaluated, 0, self.easy_streak))
+
+        candidates = (self.easy_streak >= self.prune_patience) & self.active
+        coins = torch.rand(self.num_examples, generator=self.generator)
+        to_rest = candidates & (coins < self.prune_ratio)
+        self.rest_until[to_rest] = self.epoch + self.rest_epochs
+        self.easy_streak[to_rest] = 0
+        return candidates | ~self.active
+
+    def _update_probabilities(self, easy_group: torch.Tensor):
+        active = self.active
+        num_active = int(active.sum().item())
+
+        # Непросмотренные примеры получают максимальный лосс — их стоит увидеть
+        max_loss = self.loss_ema[self.seen].max() if self.seen.any() else torch.tensor(1.0)
+        scores = torch.where(self.seen, self.loss_ema, max_loss).clamp_min(1e-8) ** self.alpha
+        scores = scores * active
+        importance = scores / scores.sum()
+        uniform = active.float() / num_active
+        self.probs = (1 - self.uniform_mix) * importance + self.uniform_mix * uniform
+
+        compensation = torch.ones(self.num_examples)
+        kept_easy = easy_group & active
+        if kept_easy.any():
+            compensation[kept_easy] = easy_group.sum().float() / kept_easy.sum().float()
+
+        weights = compensation / (self.num_examples * self.probs.clamp_min(1e-12))
+        self.weights = torch.where(active, weights, torch.zeros_like(weights))
+
+    def state_dict(self) -> dict:
+        """Состояние для чекпоинта"""
+        return {
+            "epoch": self.epoch,
+            "loss_ema": self.loss_ema,
+            "seen": self.seen,
+            "easy_streak": self.easy_streak,
+            "rest_until": self.rest_until,
+        }
+
+    def load_state_dict(self, state: dict, epoch: Optional[int] = None):
+        for key in ("loss_ema", "seen", "easy_streak", "rest_until"):
+            setattr(self, key, state[key].clone())
+        self.epoch = state["epoch"] if epoch is None else epoch
+        self._update_probabilities((self.easy_streak >= self.prune_patience) | ~self.active)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Шардированный tar-формат и потоковый IterableDataset для данных больше RAM
+
+Примеры заранее кодируются в tar-шарды (<key>.npy — изображение uint8 HWC,
+<key>.cls — метка) и читаются крупными последовательными чтениями вместо
+случайного доступа к множеству мелких файлов. Перемешивание — по порядку
+шардов на эпоху и буфером внутри потока. Шарды делятся между ранками
+distributed и воркерами DataLoader; для равного числа шагов на ранк число
+шардов должно делиться на world_size * num_workers.
+
+Использование:
+    python shard_dataset.py write-cifar10 --data-root ../data --out ../data/cifar10-shards
+    dataset = ShardDataset("../data/cifar10-shards", transform=transform)
+    train_model(dataset=dataset)
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import tarfile
+from typing import Callable, Iterator, List, Optional, Union
+
+import numpy as np
+import torch
+from torch.utils.data import IterableDataset, get_worker_info
+
+INDEX_NAME = "index.json"
+SHARD_PATTERN = "shard-{:06d}.tar"
+DEFAULT_SAMPLES_PER_SHARD = 10000
+DEFAULT_SHUFFLE_BUFFER = 2000
+# Крупный буфер чтения: шард читается последовательно большими блоками
+READ_BUFFER_BYTES = 8 * 1024 * 1024
+
+
+def _add_member(tar, name, payload):
+    info = tarfile.TarInfo(name)
+    info.size = len(payload)
+    tar.addfile(info, io.BytesIO(payload))
+
+
+def encode_image(image) -> bytes:
+    """PIL/ndarray/тензор -> .npy (uint8 HWC)"""
+    if isinstance(image, torch.Tensor):
+        image = image.numpy()
+    array = np.asarray(image)
+    buffer = io.BytesIO()
+    np.save(buffer, array, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def decode_image(payload: bytes) -> np.ndarray:
+    return np.load(io.BytesIO(payload), allow_pickle=False)
+
+
+def write_shards(dataset, out_dir: str, samples_per_shard: int = DEFAULT_SAMPLES_PER_SHARD) -> str:
+    """
+    Записывает датасет (image, label) в tar-шарды и index.json
+
+    Датасет должен отдавать сырые изображения (без нормализации) — все
+    преобразования выполняются при чтении.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    shards = []
+    tar, count = None, 0
+    for key in range(len(dataset)):
+        if tar is None:
+            name = SHARD_PATTERN.format(len(shards))
+            tar = tarfile.open(os.path.join(out_dir, name), "w")
+            shards.append({"name": name, "num_samples": 0})
+        image, label = dataset[key]
+        _add_member(tar, f"{key:09d}.npy", encode_image(image))
+        _add_member(tar, f"{key:09d}.cls", str(int(label)).encode("ascii"))
+        shards[-1]["num_samples"] += 1
+        count += 1
+        if shards[-1]["num_samples"] >= samples_per_shard:
+            tar.close()
+            tar = None
+    if tar is not None:
+        tar.close()
+
+    index_path = os.path.join(out_dir, INDEX_NAME)
+    with open(index_path, "w") as f:
+        json.dump({"num_samples": count, "shards": shards}, f, indent=2)
+    return index_path
+
+
+def _distributed_rank() -> tuple:
+    if torch.distributed.is_available() and torch.distributed.is_initialized():
+        return torch.distributed.get_rank(), torch.distributed.get_world_size()
+    return 0, 1
+
+
+class ShardDataset(IterableDataset):
+    """
+    Потоковое чтение tar-шардов
+
+    Args:
+        source: директория с index.json или список путей к шардам
+        transform: преобразование изображения (ndarray HWC uint8)
+        shuffle_buffer: размер буфера перемешивания (0 — без перемешивания)
+        seed: базовое зерно; порядок зависит от seed и эпохи (set_epoch)
+    """
+
+    def __init__(self, source: Union[str, List[str]], transform: Optional[Callable] = None,
+                 shuffle_buffer: int = DEFAULT_SHUFFLE_BUFFER, seed: int = 0):
+        if isinstance(source, str):
+            with open(os.path.join(source, INDEX_NAME)) as f:
+                index = json.load(f)
+            self.shards = [os.path.join(source, shard["name"]) for shard in index["shards"]]
+            self.num_samples = index["num_samples"]
+        else:
+            self.shards = list(source)
+            self.num_samples = None
+        self.transform = transform
+        self.shuffle_buffer = shuffle_buffer
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch: int):
+        """Меняет порядок шардов и перемешивание на новую эпоху"""
+        self.epoch = epoch
+
+    def _assigned_shards(self) -> List[str]:
+        """Шарды текущего ранка и воркера в порядке эпохи"""
+        shards = list(self.shards)
+        if self.shuffle_buffer:
+            random.Random(self.seed + self.epoch).shuffle(shards)
+        rank, world_size = _distributed_rank()
+        shards = shards[rank::world_size]
+        worker = get_worker_info()
+        if worker is not None:
+            shards = shards[worker.id::worker.num_workers]
+        return shards
+
+    def _iter_shard(self, path: str) -> Iterator[tuple]:
+        """Последовательное чтение шарда: пары .npy/.cls с общим ключом"""
+        with open(path, "rb", buffering=READ_BUFFER_BYTES) as raw:
+            with tarfile.open(fileobj=raw, mode="r|") as tar:
+                sample = {}
+                for member in tar:
+                    key, ext = os.path.splitext(member.name)
+                    if sample and sample["key"] != key:
+                        yield sample
+                        sample = {}
+                    sample["key"] = key
+                    sample[ext] = tar.extractfile(member).read()
+                if sample:
+                    yield sample
+
+    def _decode(self, sample: dict) -> tuple:
+        image = decode_image(sample[".npy"])
+        label = int(sample[".cls"])
+        image = self.transform(image) if self.transform else torch.from_numpy(image)
+        return image, label
+
+    def __iter__(self) -> Iterator[tuple]:
+        worker = get_worker_info()
+        rank, _ = _distributed_rank()
+        rng = random.Random(f"{self.seed}-{self.epoch}-{rank}-{worker.id if worker else 0}")
+        buffer = []
+        for path in self._assigned_shards():
+            for sample in self._iter_shard(path):
+                if self.shuffle_buffer <= 1:
+                    yield self._decode(sample)
+                    continue
+                if len(buffer) < self.shuffle_buffer:
+                    buffer.append(sample)
+                    continue
+                # Отдаём случайный элемент буфера, на его место — новый
+                slot = rng.randrange(len(buffer))
+                buffer[slot], sample = sample, buffer[slot]
+                yield self._decode(sample)
+        rng.shuffle(buffer)
+        for sample in buffer:
+            yield self._decode(sample)
+
+
+def cmd_write_cifar10(args):
+    """Конвертация CIFAR-10 в шарды"""
+    from torchvision import datasets
+    dataset = datasets.CIFAR10(args.data_root, train=not args.test, download=True)
+    index_path = write_shards(dataset, args.out, args.samples_per_shard)
+    print(f"✅ Shards written: {index_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tar-shard dataset tools")
+    subparsers = parser.add_subparsers(dest="command")
+
+    cifar_parser = subparsers.add_parser("write-cifar10", help="Записать CIFAR-10 в шарды")
+    cifar_parser.add_argument("--data-root", required=True, help="Корень CIFAR-10")
+    cifar_parser.add_argument("--out", required=True, help="Директория шардов")
+    cifar_parser.add_argument("--samples-per-shard", type=int, default=DEFAULT_SAMPLES_PER_SHARD)
+    cifar_parser.add_argument("--test", action="store_true", help="Тестовая часть вместо обучающей")
+
+    args = parser.parse_args()
+    if args.command == "write-cifar10":
+        cmd_write_cifar10(args)
+    else:
+        parser.print_help()
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
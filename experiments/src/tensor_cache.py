@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Кеш предобработанных тензоров по хешу конвейера преобразований
+
+Детерминированный префикс конвейера (ToTensor, Normalize, Resize, ...)
+вычисляется один раз, результат сохраняется на диск в .npy и читается
+через mmap во всех эпохах, запусках и триалах свипа. Ключ кеша — хеш
+содержимого датасета и repr преобразований префикса. Случайные
+аугментации (всё, начиная с первого недетерминированного шага) выполняются
+на лету поверх закешированного тензора, поэтому их стоит ставить в конец
+конвейера и использовать версии, работающие с тензорами.
+
+Использование:
+    dataset = CachedDataset(datasets.CIFAR10(root, train=True), transform, "../data/tensor_cache")
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+
+CACHE_FORMAT = "tensor-cache/1"
+DETERMINISTIC_TRANSFORMS = {
+    "ToTensor", "PILToTensor", "ConvertImageDtype", "Normalize",
+    "Resize", "CenterCrop", "Grayscale", "ToDtype", "ToImage",
+}
+# Сколько примеров хешировать, если у датасета нет массива .data
+FINGERPRINT_SAMPLES = 64
+
+
+def split_transform(transform: Optional[Callable]) -> Tuple[List[Callable], List[Callable]]:
+    """Делит конвейер на детерминированный префикс и остаток"""
+    if transform is None:
+        return [], []
+    steps = list(getattr(transform, "transforms", [transform]))
+    for i, step in enumerate(steps):
+        if type(step).__name__ not in DETERMINISTIC_TRANSFORMS:
+            return steps[:i], steps[i:]
+    return steps, []
+
+
+def _compose(steps: List[Callable]) -> Optional[Callable]:
+    if not steps:
+        return None
+
+    def apply(value):
+        for step in steps:
+            value = step(value)
+        return value
+    return apply
+
+
+def dataset_fingerprint(dataset: Dataset) -> str:
+    """Хеш исходных данных датасета (без учёта его transform)"""
+    digest = hashlib.sha256()
+    digest.update(f"{type(dataset).__module__}.{type(dataset).__name__}:{len(dataset)}".encode())
+    data = getattr(dataset, "data", None)
+    if isinstance(data, torch.Tensor):
+        data = data.numpy()
+    if isinstance(data, np.ndarray):
+        digest.update(np.ascontiguousarray(data).data)
+        targets = getattr(dataset, "targets", None)
+        if targets is not None:
+            digest.update(np.asarray(targets).tobytes())
+        return digest.hexdigest()
+
+    step = max(1, len(dataset) // FINGERPRINT_SAMPLES)
+    for index in range(0, len(dataset), step):
+        item, target = _raw_item(dataset, index)
+        digest.update(np.asarray(item).tobytes())
+        digest.update(str(target).encode())
+    return digest.hexdigest()
+
+
+def _raw_item(dataset: Dataset, index: int):
+    """Пример без собственного transform датасета"""
+    transform = getattr(dataset, "transform", None)
+    if transform is not None:
+        dataset.transform = None
+    try:
+        return dataset[index]
+    finally:
+        if transform is not None:
+            dataset.transform = transform
+
+
+class CachedDataset(Dataset):
+    """
+    Датасет поверх кеша детерминированного префикса преобразований
+
+    Args:
+        dataset: исходный датасет (image, label)
+        transform: полный конвейер; по умолчанию dataset.transform
+        cache_dir: корень кеша, общий для запусков и триалов
+    """
+
+    def __init__(self, dataset: Dataset, transform: Optional[Callable] = None, cache_dir: str = "tensor_cache"):
+        self.dataset = dataset
+        transform = transform if transform is not None else getattr(dataset, "transform", None)
+        prefix, rest = split_transform(transform)
+        self.prefix = _compose(prefix)
+        self.augment = _compose(rest)
+
+        key_source = json.dumps({
+            "format": CACHE_FORMAT,
+            "dataset": dataset_fingerprint(dataset),
+            "prefix": [repr(step) for step in prefix],
+        }, sort_keys=True)
+        self.key = hashlib.sha256(key_source.encode()).hexdigest()[:24]
+        self.path = os.path.join(cache_dir, self.key)
+        if not os.path.exists(os.path.join(self.path, "meta.json")):
+            self._materialize(key_source)
+
+        # mmap_mode="r": страницы общие для всех процессов и воркеров DataLoader
+        self.inputs = np.load(os.path.join(self.path, "inputs.npy"), mmap_mode="r")
+        self.targets = np.load(os.path.join(self.path, "targets.npy"))
+
+    def _materialize(self, key_source: str):
+        """Однократно вычисляет префикс для всего датасета"""
+        tmp_path = f"{self.path}.tmp.{os.getpid()}"
+        os.makedirs(tmp_path, exist_ok=True)
+        first = self._prefix_item(0)[0]
+        inputs = np.lib.format.open_memmap(os.path.join(tmp_path, "inputs.npy"), mode="w+",
+                                           dtype=first.dtype, shape=(len(self.dataset),) + first.shape)
+        targets = np.empty(len(self.dataset), dtype=np.int64)
+        for index in range(len(self.dataset)):
+            item, target = self._prefix_item(index)
+            inputs[index] = item
+            targets[index] = target
+        inputs.flush()
+        del inputs
+        np.save(os.path.join(tmp_path, "targets.npy"), targets)
+        with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+            f.write(key_source)
+        try:
+            os.rename(tmp_path, self.path)
+        except OSError:
+            # Параллельный процесс успел записать тот же ключ — используем его копию
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def _prefix_item(self, index: int):
+        item, target = _raw_item(self.dataset, index)
+        if self.prefix is not None:
+            item = self.prefix(item)
+        if isinstance(item, torch.Tensor):
+            item = item.numpy()
+        return np.asarray(item), int(target)
+
+    def __len__(self):
+        return len(self.targets)
+
+    def __getitem__(self, index):
+        # Копия строки: mmap только для чтения, а аугментации могут писать на месте
+        item = torch.from_numpy(np.array(self.inputs[index]))
+        if self.augment is not None:
+            item = self.augment(item)
+        return item, int(self.targets[index])
@@ -5,14 +5,38 @@
 """
 
 import os
+import sys
 import time
 import json
+import platform
+import subprocess
 from datetime import datetime
+from pathlib import Path
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from torch.utils.data import DataLoader
-from torchvision import datasets, transforms
+from torch.utils.data import DataLoader, IterableDataset
+
+from artifact_store import ArtifactStore, MANIFEST_EXT
+from checkpoint_io import SAFETENSORS_EXT, save_checkpoint
+from checkpoint_policy import CheckpointPolicy
+from experiment_registry import REGISTRY_NAME, ExperimentRegistry, git_commit, read_eval_metrics
+from importance_sampler import IndexedDataset, LossImportanceSampler
+from synthetic_data import SyntheticBatches
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "scripts"))
+from metrics_archive import MetricsArchive
+from metrics_exporter import MetricsRegistry, start_metrics_server
+from process_profiler import StackSampler, remove_pid_file, write_pid_file
+
+CHECKPOINT_FORMATS = ("safetensors", "torch", "store")
+STORE_DIR_NAME = "store"
+TENSOR_CACHE_DIR_NAME = "tensor_cache"
+SAMPLERS = ("uniform", "importance")
+EVAL_WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "eval_worker.py")
+METRICS_ARCHIVE_DIR = os.path.join("logs", "metrics_archive")
+TRAINING_METRICS = ("epoch", "loss", "time", "samples", "gpu_memory", "checkpoint_time")
+STEP_LOG_NAME = "train_steps.jsonl"
 
 def create_experiment_dir(base_path="../results"):
     """Создает директорию для текущего эксперимента"""
@@ -42,8 +66,127 @@ class SimpleCNN(nn.Module):
         x = self.fc2(x)
         return x
 
-def train_model(num_epochs=5, batch_size=32, learning_rate=0.001):
-    """Основная функция тренировки"""
+def save_artifact(obj, path_without_ext, checkpoint_format, store=None):
+    """Сохраняет чекпоинт/модель в выбранном формате и возвращает путь"""
+    if checkpoint_format == "store":
+        return store.put_checkpoint(obj, path_without_ext + MANIFEST_EXT)
+    if checkpoint_format == "safetensors":
+        return save_checkpoint(obj, path_without_ext + SAFETENSORS_EXT)
+    path = path_without_ext + ".pth"
+    # Атомарно, как save_checkpoint: eval_worker не должен увидеть недописанный файл
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    torch.save(obj, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+def load_cifar10(data_root, tensor_cache=True):
+    """Обучающая часть CIFAR-10 с нормализацией
+    
+    torchvision импортируется только здесь: режим симуляции его не загружает.
+    """
+    from torchvision import datasets, transforms
+    
+    transform = transforms.Compose([
+        transforms.ToTensor(),
+        transforms.Normalize((0.5, 0.5, 0.5), (0.5, 0.5, 0.5))
+    ])
+    dataset = datasets.CIFAR10(data_root, train=True, download=True, transform=transform)
+    if tensor_cache:
+        from tensor_cache import CachedDataset
+        dataset = CachedDataset(dataset, transform, os.path.join(data_root, TENSOR_CACHE_DIR_NAME))
+    return dataset
+
+def build_loader(dataset, batch_size, sampler, num_workers=0):
+    """DataLoader для реальных данных; для "importance" возвращает и семплер
+    
+    Потоковые датасеты (IterableDataset, например ShardDataset) перемешиваются
+    сами и сами делят данные между воркерами.
+    """
+    if isinstance(dataset, IterableDataset):
+        if sampler != "uniform":
+            raise ValueError(f"Sampler '{sampler}' needs a map-style dataset")
+        return DataLoader(dataset, batch_size=batch_size, num_workers=num_workers), None
+    if sampler == "importance":
+        importance_sampler = LossImportanceSampler(len(dataset))
+        loader = DataLoader(IndexedDataset(dataset), batch_size=batch_size, sampler=importance_sampler,
+                            num_workers=num_workers)
+        return loader, importance_sampler
+    return DataLoader(dataset, batch_size=batch_size, shuffle=True, num_workers=num_workers), None
+
+def train_epoch(model, loader, optimizer, device, importance_sampler=None, on_step=None):
+    """Эпоха по реальным данным; возвращает (средний loss, число примеров)
+    
+    С importance_sampler лосс каждого примера взвешивается по семплеру, чтобы
+    оценка градиента оставалась несмещённой. on_step(секунды, примеры, loss)
+    вызывается после каждого шага (метрики экспортёра, пошаговый журнал).
+    """
+    criterion = nn.CrossEntropyLoss(reduction="none")
+    model.train()
+    total_loss, num_samples = 0.0, 0
+    step_start = time.perf_counter()
+    for batch in loader:
+        inputs, targets = batch[0].to(device), batch[1].to(device)
+        optimizer.zero_grad()
+        losses = criterion(model(inputs), targets)
+        if importance_sampler is not None:
+            indices = batch[2]
+            importance_sampler.update(indices, losses.detach())
+            loss = (losses * importance_sampler.weights_for(indices).to(device)).mean()
+        else:
+            loss = losses.mean()
+        loss.backward()
+        optimizer.step()
+        batch_loss = losses.detach().sum().item()
+        total_loss += batch_loss
+        num_samples += len(targets)
+        if on_step is not None:
+            now = time.perf_counter()
+            on_step(now - step_start, len(targets), batch_loss / len(targets))
+            step_start = now
+    return total_loss / max(num_samples, 1), num_samples
+
+def start_eval_worker(exp_dir, threads, data_root=None):
+    """Запускает оценку чекпоинтов отдельным процессом (eval_worker.py)
+    
+    С data_root оценка идёт на тестовой части CIFAR-10, иначе — на синтетике.
+    """
+    command = [
+        sys.executable, EVAL_WORKER_SCRIPT, exp_dir,
+        "--threads", str(threads),
+        "--parent-pid", str(os.getpid()),
+    ]
+    if data_root is not None:
+        command += ["--data-root", os.path.abspath(data_root)]
+    return subprocess.Popen(command)
+
+def train_model(num_epochs=5, batch_size=32, learning_rate=0.001, checkpoint_format="safetensors",
+                interruptions_per_hour=None, eval_threads=0, dataset=None, data_root=None,
+                sampler="uniform", num_workers=0, tensor_cache=True, registry=True, metrics_port=None):
+    """Основная функция тренировки
+    
+    checkpoint_format: "safetensors" — mmap-формат без pickle (checkpoint_io),
+    "torch" — классический torch.save (.pth), "store" — дедуплицированное
+    хранилище артефактов (results/store, общее для всех запусков) + манифесты
+    interruptions_per_hour: ожидаемая частота прерываний раннера; по ней и
+    измеренным временам шага/записи выбирается интервал чекпоинтов (Young/Daly).
+    None — из ML_INTERRUPTIONS_PER_HOUR или истории ML_RUNNER_HISTORY
+    eval_threads: >0 — параллельно оценивать чекпоинты отдельным процессом
+    с таким бюджетом потоков (logs/eval_metrics.jsonl)
+    dataset / data_root: реальные данные (готовый Dataset, потоковый ShardDataset
+    или корень CIFAR-10); без них выполняется быстрая симуляция на случайных тензорах
+    num_workers: число процессов DataLoader
+    tensor_cache: для data_root кешировать результат детерминированных
+    преобразований на диске (<data_root>/tensor_cache, общий для запусков)
+    sampler: "uniform" или "importance" (LossImportanceSampler — выбор по лоссу
+    и временный отсев лёгких примеров)
+    registry: записывать запуск, метрики и артефакты в SQLite-реестр
+    (results/registry.sqlite, общий для всех запусков)
+    metrics_port: порт HTTP /metrics (OpenMetrics) в фоновом потоке; None — выключено
+    """
+    if checkpoint_format not in CHECKPOINT_FORMATS:
+        raise ValueError(f"Unknown checkpoint format: {checkpoint_format}")
+    if sampler not in SAMPLERS:
+        raise ValueError(f"Unknown sampler: {sampler}")
     
     # Проверка GPU
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
@@ -55,91 +198,196 @@ def train_model(num_epochs=5, batch_size=32, learning_rate=0.001):
     # Создание директории эксперимента
     exp_dir = create_experiment_dir()
     print(f"📁 Experiment directory: {exp_dir}")
+    # PID и кооперативный сэмплер стеков для мониторинга (scripts/process_profiler.py)
+    write_pid_file(exp_dir)
+    stack_sampler = StackSampler(exp_dir).start()
+    # Всё, что открыто ниже, закрывается в finally: при исключении не остаётся
+    # train.pid (после переиспользования PID монитор прицепился бы к чужому процессу),
+    # осиротевшего воркера оценки и потоков сэмплера и /metrics
+    eval_process = metrics_server = metrics_writer = step_log = None
+    run_registry = run_id = None
+    try:
+        checkpoint_policy = CheckpointPolicy(interruptions_per_hour)
+        store = ArtifactStore(os.path.join(os.path.dirname(exp_dir), STORE_DIR_NAME)) \
+            if checkpoint_format == "store" else None
+        eval_process = start_eval_worker(exp_dir, eval_threads, data_root) if eval_threads > 0 else None
     
-    # Конфигурация эксперимента
-    config = {
-        "timestamp": datetime.now().isoformat(),
-        "device": str(device),
-        "num_epochs": num_epochs,
-        "batch_size": batch_size,
-        "learning_rate": learning_rate,
-        "model": "SimpleCNN",
-        "dataset": "CIFAR-10"
-    }
-    
-    # Сохранение конфигурации
-    with open(os.path.join(exp_dir, "config.json"), "w") as f:
-        json.dump(config, f, indent=2)
-    
-    # Подготовка данных (заглушка для быстрого тестирования)
-    print("📊 Preparing data...")
-    transform = transforms.Compose([
-        transforms.ToTensor(),
-        transforms.Normalize((0.5, 0.5, 0.5), (0.5, 0.5, 0.5))
-    ])
+        # Конфигурация эксперимента
+        config = {
+            "timestamp": datetime.now().isoformat(),
+            "device": str(device),
+            "num_epochs": num_epochs,
+            "batch_size": batch_size,
+            "learning_rate": learning_rate,
+            "model": "SimpleCNN",
+            "dataset": "CIFAR-10",
+            "checkpoint_format": checkpoint_format,
+            "sampler": sampler,
+            "interruptions_per_hour": checkpoint_policy.interruptions_per_hour,
+            "host": platform.node(),
+            "git_commit": git_commit()
+        }
+    
+        # Сохранение конфигурации
+        with open(os.path.join(exp_dir, "config.json"), "w") as f:
+            json.dump(config, f, indent=2)
+    
+        run_registry = ExperimentRegistry(os.path.join(os.path.dirname(exp_dir), REGISTRY_NAME)) \
+            if registry else None
+        run_id = run_registry.begin_run(exp_dir, config) if run_registry is not None else None
+    
+        # Подготовка данных (заглушка для быстрого тестирования)
+        print("📊 Preparing data...")
+        if dataset is None and data_root is not None:
+            dataset = load_cifar10(data_root, tensor_cache)
+        loader, importance_sampler = build_loader(dataset, batch_size, sampler, num_workers) \
+            if dataset is not None else (None, None)
+        # Симуляция: кольцо батчей выделяется один раз прямо на устройстве
+        synthetic = SyntheticBatches(batch_size, device=device) if loader is None else None
+    
+        # Создание модели
+        model = SimpleCNN(num_classes=10).to(device)
+        criterion = nn.CrossEntropyLoss()
+        optimizer = optim.Adam(model.parameters(), lr=learning_rate)
+    
+        print(f"🧠 Model parameters: {sum(p.numel() for p in model.parameters()):,}")
     
-    # Создание модели
-    model = SimpleCNN(num_classes=10).to(device)
-    criterion = nn.CrossEntropyLoss()
-    optimizer = optim.Adam(model.parameters(), lr=learning_rate)
+        # Лог файл
+        log_file = os.path.join(exp_dir, "logs", "training.log")
     
-    print(f"🧠 Model parameters: {sum(p.numel() for p in model.parameters()):,}")
+        # Живые метрики для /metrics (scripts/metrics_exporter.py)
+        exporter = MetricsRegistry()
+        epoch_gauge = exporter.gauge("ml_train_epoch", "Last completed epoch")
+        loss_gauge = exporter.gauge("ml_train_loss", "Training loss of the last epoch")
+        throughput_gauge = exporter.gauge("ml_train_samples_per_second", "Training throughput of the last epoch")
+        samples_counter = exporter.counter("ml_train_samples", "Training samples processed")
+        step_histogram = exporter.histogram("ml_train_step_duration_seconds", "Training step duration")
+        checkpoint_histogram = exporter.histogram("ml_train_checkpoint_duration_seconds", "Checkpoint write duration")
+        metrics_server = start_metrics_server(exporter, metrics_port) if metrics_port is not None else None
+        if metrics_server is not None:
+            print(f"📡 Metrics: http://{metrics_server.server_address[0]}:{metrics_server.server_address[1]}/metrics")
     
-    # Лог файл
-    log_file = os.path.join(exp_dir, "logs", "training.log")
+        # Метрики эпох в колоночный архив (scripts/metrics_archive.py)
+        metrics_writer = MetricsArchive(os.path.join(exp_dir, METRICS_ARCHIVE_DIR)).writer("training", TRAINING_METRICS)
     
-    # Симуляция тренировки (для быстрого тестирования)
-    print("🏃 Starting training simulation...")
-    training_log = []
+        # Пошаговый журнал JSONL для потокового анализа (scripts/log_analyzer.py)
+        step_log = open(os.path.join(exp_dir, "logs", STEP_LOG_NAME), "a", encoding="utf-8")
+        global_step = 0
     
-    for epoch in range(num_epochs):
-        epoch_start = time.time()
+        def on_step(seconds, samples, loss):
+            nonlocal global_step
+            global_step += 1
+            step_histogram.observe(seconds)
+            step_log.write(json.dumps({"time": time.time(), "epoch": epoch + 1, "step": global_step,
+                                       "step_time": seconds, "samples": samples, "loss": loss}) + "\n")
+    
+        # Симуляция тренировки (для быстрого тестирования)
+        print("🏃 Starting training..." if loader is not None else "🏃 Starting training simulation...")
+        training_log = []
+    
+        for epoch in range(num_epochs):
+            epoch_start = time.time()
         
-        # Симуляция forward/backward pass на GPU
-        dummy_input = torch.randn(batch_size, 3, 32, 32).to(device)
-        dummy_target = torch.randint(0, 10, (batch_size,)).to(device)
+            if loader is not None:
+                if importance_sampler is not None:
+                    importance_sampler.set_epoch(epoch)
+                if hasattr(dataset, "set_epoch"):
+                    dataset.set_epoch(epoch)
+                loss_val, num_samples = train_epoch(model, loader, optimizer, device, importance_sampler, on_step)
+            else:
+                # Симуляция forward/backward pass на GPU
+                dummy_input, dummy_target = synthetic.next_batch()
+            
+                optimizer.zero_grad()
+                outputs = model(dummy_input)
+                loss = criterion(outputs, dummy_target)
+                loss.backward()
+                optimizer.step()
+                loss_val, num_samples = loss.item(), batch_size
+                on_step(time.time() - epoch_start, batch_size, loss_val)
         
-        optimizer.zero_grad()
-        outputs = model(dummy_input)
-        loss = criterion(outputs, dummy_target)
-        loss.backward()
-        optimizer.step()
+            epoch_time = time.time() - epoch_start
+            epoch_gauge.set(epoch + 1)
+            loss_gauge.set(loss_val)
+            throughput_gauge.set(num_samples / epoch_time)
+            samples_counter.inc(num_samples)
         
-        epoch_time = time.time() - epoch_start
-        loss_val = loss.item()
+            # Логирование
+            log_entry = {
+                "epoch": epoch + 1,
+                "loss": loss_val,
+                "time": epoch_time,
+                "samples": num_samples,
+                "gpu_memory": torch.cuda.memory_allocated(device) / 1024**2 if torch.cuda.is_available() else 0
+            }
+            training_log.append(log_entry)
         
-        # Логирование
-        log_entry = {
-            "epoch": epoch + 1,
-            "loss": loss_val,
-            "time": epoch_time,
-            "gpu_memory": torch.cuda.memory_allocated(device) / 1024**2 if torch.cuda.is_available() else 0
-        }
-        training_log.append(log_entry)
+            print(f"Epoch [{epoch+1}/{num_epochs}], Loss: {loss_val:.4f}, Time: {epoch_time:.2f}s")
         
-        print(f"Epoch [{epoch+1}/{num_epochs}], Loss: {loss_val:.4f}, Time: {epoch_time:.2f}s")
+            # Сохранение чекпоинта по адаптивному интервалу
+            checkpoint_policy.record_step(epoch_time)
+            if checkpoint_policy.should_checkpoint():
+                checkpoint_start = time.time()
+                checkpoint = {
+                    'epoch': epoch + 1,
+                    'model_state_dict': model.state_dict(),
+                    'optimizer_state_dict': optimizer.state_dict(),
+                    'loss': loss_val,
+                }
+                checkpoint_path = save_artifact(checkpoint, os.path.join(exp_dir, "checkpoints", f"checkpoint_epoch_{epoch+1}"), checkpoint_format, store)
+                checkpoint_time = time.time() - checkpoint_start
+                checkpoint_histogram.observe(checkpoint_time)
+                previous_interval = checkpoint_policy.interval_steps()
+                checkpoint_policy.record_checkpoint(checkpoint_time)
+                log_entry["checkpoint_time"] = checkpoint_time
+                if checkpoint_policy.interval_steps() != previous_interval:
+                    print(f"   💾 Checkpoint took {checkpoint_time:.2f}s, "
+                          f"interval -> {checkpoint_policy.interval_steps()} epoch(s)")
+                if run_registry is not None:
+                    run_registry.add_artifact(run_id, "checkpoint", checkpoint_path, exp_dir)
         
-        # Сохранение чекпоинта каждые несколько эпох
-        if (epoch + 1) % 2 == 0:
-            checkpoint = {
-                'epoch': epoch + 1,
-                'model_state_dict': model.state_dict(),
-                'optimizer_state_dict': optimizer.state_dict(),
-                'loss': loss_val,
-            }
-            torch.save(checkpoint, os.path.join(exp_dir, "checkpoints", f"checkpoint_epoch_{epoch+1}.pth"))
+            metrics_writer.append(time.time(), log_entry)
+            if run_registry is not None:
+                run_registry.log_epoch(run_id, log_entry)
+    
+        # Сохранение финальной модели
+        final_path = save_artifact(model.state_dict(), os.path.join(exp_dir, "final_model"), checkpoint_format, store)
+    
+        # Сохранение лога тренировки
+        with open(log_file, "w") as f:
+            json.dump(training_log, f, indent=2)
     
-    # Сохранение финальной модели
-    torch.save(model.state_dict(), os.path.join(exp_dir, "final_model.pth"))
+        if eval_process is not None:
+            print("⏳ Waiting for evaluation worker to score the final model...")
+            eval_process.wait()
     
-    # Сохранение лога тренировки
-    with open(log_file, "w") as f:
-        json.dump(training_log, f, indent=2)
+        if run_registry is not None:
+            run_registry.add_artifact(run_id, "final_model", final_path, exp_dir)
+            run_registry.log_eval_metrics(run_id, read_eval_metrics(exp_dir))
+            run_registry.finish_run(run_id, "completed", exp_dir)
     
-    print(f"✅ Training completed! Results saved to: {exp_dir}")
-    print(f"📋 Artifacts: config.json, final_model.pth, checkpoints/, logs/training.log")
+        print(f"✅ Training completed! Results saved to: {exp_dir}")
+        print(f"📋 Artifacts: config.json, {os.path.basename(final_path)}, checkpoints/, logs/training.log, logs/{STEP_LOG_NAME}")
     
-    return exp_dir, training_log
+        return exp_dir, training_log
+    except BaseException:
+        # Прерванный запуск не должен навсегда остаться "running" в реестре
+        if run_id is not None:
+            run_registry.finish_run(run_id, "failed", exp_dir)
+        raise
+    finally:
+        if metrics_writer is not None:
+            metrics_writer.close()
+        if step_log is not None:
+            step_log.close()
+        stack_sampler.stop()
+        if metrics_server is not None:
+            metrics_server.stop()
+        if eval_process is not None and eval_process.poll() is None:
+            eval_process.terminate()
+        if run_registry is not None:
+            run_registry.close()
+        remove_pid_file(exp_dir)
 
 if __name__ == "__main__":
     print("🔥 PyTorch GPU Training Example")
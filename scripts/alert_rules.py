@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Alert Rules
+Декларативные правила оповещений над потоками метрик мониторинга.
+Правила (JSON) бывают трёх видов: threshold — порог значения, rate —
+порог скорости изменения в секунду, absent — нет данных дольше for
+секунд. У всех есть выдержка for (условие должно держаться непрерывно) и
+гистерезис clear (оповещение снимается только после пересечения clear).
+Правила вычисляются инкрементально при поступлении отсчёта: O(1) на
+отсчёт на правило, без истории. Оповещения пишутся в лог и отправляются
+на webhook (локальная заглушка — подкоманда serve).
+
+Формат правила:
+    {"name": "cpu_high", "metric": "resources.cpu_percent", "type": "threshold",
+     "op": ">", "value": 95, "clear": 85, "for": 600, "severity": "warning"}
+
+Использование:
+    python scripts/alert_rules.py check scripts/alert_rules.json
+    python scripts/alert_rules.py replay logs/metrics_archive --rules scripts/alert_rules.json
+    python scripts/alert_rules.py serve --port 9109 --out logs/alerts.jsonl
+"""
+
+import argparse
+import json
+import logging
+import math
+import queue
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+DEFAULT_RULES_PATH = Path(__file__).resolve().parent / "alert_rules.json"
+RULE_TYPES = ("threshold", "rate", "absent")
+OPERATORS = {">": lambda a, b: a > b, ">=": lambda a, b: a >= b,
+             "<": lambda a, b: a < b, "<=": lambda a, b: a <= b}
+SEVERITY_LEVELS = {"info": logging.INFO, "warning": logging.WARNING, "critical": logging.ERROR}
+DEFAULT_WEBHOOK_PORT = 9109
+WEBHOOK_TIMEOUT = 5.0
+WEBHOOK_QUEUE_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+
+class Rule:
+    """
+    Правило и его состояние: ok -> pending (условие держится) -> firing
+
+    Args:
+        spec: словарь правила (см. модуль)
+    """
+
+    def __init__(self, spec):
+        self.name = spec.get("name")
+        self.metric = spec.get("metric")
+        if not self.name or not self.metric:
+            raise ValueError(f"Rule needs name and metric: {spec}")
+        self.type = spec.get("type", "threshold")
+        if self.type not in RULE_TYPES:
+            raise ValueError(f"Rule {self.name}: unknown type {self.type}")
+        self.duration = float(spec.get("for", 0))
+        self.severity = spec.get("severity", "warning")
+        if self.severity not in SEVERITY_LEVELS:
+            raise ValueError(f"Rule {self.name}: unknown severity {self.severity}")
+        self.description = spec.get("description", "")
+        if self.type != "absent":
+            self.op = spec.get("op", ">")
+            if self.op not in OPERATORS:
+                raise ValueError(f"Rule {self.name}: unknown operator {self.op}")
+            if "value" not in spec:
+                raise ValueError(f"Rule {self.name}: value is required")
+            self.threshold = float(spec["value"])
+            self.clear = float(spec.get("clear", self.threshold))
+            # Для гистерезиса clear должен лежать по "безопасную" сторону порога
+            if (self.op in (">", ">=") and self.clear > self.threshold) or \
+                    (self.op in ("<", "<=") and self.clear < self.threshold):
+                raise ValueError(f"Rule {self.name}: clear must be on the safe side of value")
+            self.compare = OPERATORS[self.op]
+            self.smoothing = float(spec.get("smoothing", 1.0))
+        self.state = "ok"
+        self.since = None
+        self.last_value = None
+        self.last_seen = None
+        self.previous = None
+        self.smoothed = None
+
+    def _still_active(self, value):
+        # Снятие — только после пересечения clear, а не самого порога
+        return value > self.clear if self.op in (">", ">=") else value < self.clear
+
+    def _event(self, state, timestamp, value):
+        return {"rule": self.name, "metric": self.metric, "severity": self.severity, "state": state,
+                "value": value, "threshold": getattr(self, "threshold", self.duration), "since": self.since,
+                "time": timestamp, "description": self.description}
+
+    def observe(self, value, timestamp):
+        """Отсчёт метрики; событие (dict) при срабатывании/снятии, иначе None"""
+        self.last_seen = timestamp
+        if self.type == "absent":
+            if self.state == "firing":
+                self.state = "ok"
+                return self._event("resolved", timestamp, None)
+            return None
+        if self.type == "rate":
+            previous, self.previous = self.previous, (timestamp, value)
+            if previous is None or timestamp <= previous[0]:
+                return None
+            rate = (value - previous[1]) / (timestamp - previous[0])
+            self.smoothed = rate if self.smoothed is None else self.smoothed + self.smoothing * (rate - self.smoothed)
+            value = self.smoothed
+        self.last_value = value
+        return self._evaluate(value, timestamp)
+
+    def _evaluate(self, value, timestamp):
+        if self.state == "firing":
+            if self._still_active(value):
+                return None
+            self.state, self.since = "ok", None
+            return self._event("resolved", timestamp, value)
+        if not self.compare(value, self.threshold):
+            self.state, self.since = "ok", None
+            return None
+        if self.state == "ok":
+            self.state, self.since = "pending", timestamp
+        if timestamp - self.since >= self.duration:
+            self.state = "firing"
+            return self._event("firing", timestamp, value)
+        return None
+
+    def tick(self, now, started):
+        """Проверка отсутствия данных (только для absent)"""
+        if self.state == "firing":
+            return None
+        last = self.last_seen if self.last_seen is not None else started
+        if now - last >= self.duration:
+            self.state, self.since = "firing", last
+            return self._event("firing", now, None)
+        return None
+
+
+def load_rules(path=DEFAULT_RULES_PATH):
+    """Правила из JSON: список или {"rules": [...]}"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    specs = data.get("rules", []) if isinstance(data, dict) else data
+    rules = [Rule(spec) for spec in specs]
+    names = [rule.name for rule in rules]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate rule names: {', '.join(duplicates)}")
+    return rules
+
+
+class AlertEngine:
+    """
+    Инкрементальное вычисление правил: отсчёт уходит только в правила своей метрики
+
+    Args:
+        rules: список Rule
+        notifiers: вызываемые объекты notifier(event)
+    """
+
+    def __init__(self, rules, notifiers=(), started=None):
+        self.rules = list(rules)
+        self.notifiers = list(notifiers)
+        self.started = time.time() if started is None else started
+        self.by_metric = {}
+        for rule in self.rules:
+            self.by_metric.setdefault(rule.metric, []).append(rule)
+        self.absent_rules = [rule for rule in self.rules if rule.type == "absent"]
+        self.events = 0
+
+    def _emit(self, event):
+        self.events += 1
+        for notifier in self.notifiers:
+            try:
+                notifier(event)
+            except Exception as e:
+                logger.error(f"❌ Alert notifier {type(notifier).__name__}: {e}")
+
+    def observe(self, metric, value, timestamp=None):
+        rules = self.by_metric.get(metric)
+        if not rules or value is None:
+            return
+        value = float(value)
+        if math.isnan(value):
+            return
+        timestamp = time.time() if timestamp is None else timestamp
+        for rule in rules:
+            event = rule.observe(value, timestamp)
+            if event is not None:
+                self._emit(event)
+
+    def observe_many(self, values, timestamp=None, prefix=""):
+        """Словарь метрика -> значение (имена с префиксом "<probe>.")"""
+        timestamp = time.time() if timestamp is None else timestamp
+        by_metric = self.by_metric
+        for name, value in values.items():
+            if prefix + name in by_metric:
+                self.observe(prefix + name, value, timestamp)
+
+    def tick(self, now=None):
+        """Правила absent; вызывается периодически (например, на каждом отсчёте)"""
+        now = time.time() if now is None else now
+        for rule in self.absent_rules:
+            event = rule.tick(now, self.started)
+            if event is not None:
+                self._emit(event)
+
+    def firing(self):
+        return [rule.name for rule in self.rules if rule.state == "firing"]
+
+
+def format_event(event):
+    value = "no data" if event["value"] is None else f"{event['value']:.4g}"
+    return f"{event['rule']} [{event['severity']}] {event['metric']} = {value}" + \
+        (f" — {event['description']}" if event["description"] else "")
+
+
+class LogNotifier:
+    """Оповещения в лог: срабатывание — по severity (critical — ERROR), снятие — INFO"""
+
+    def __init__(self, target_logger=None):
+        self.logger = target_logger or logger
+
+    def __call__(self, event):
+        if event["state"] == "firing":
+            level = SEVERITY_LEVELS[event["severity"]]
+            self.logger.log(level, f"🚨 Alert: {format_event(event)}")
+        else:
+            self.logger.info(f"✅ Resolved: {format_event(event)}")
+
+
+class WebhookNotifier:
+    """
+    POST JSON на webhook из фонового потока: вызов не ждёт сети
+
+    При переполнении очереди (недоступный приёмник) события отбрасываются
+    и считаются в dropped.
+    """
+
+    def __init__(self, url, timeout=WEBHOOK_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+        self.queue = queue.Queue(maxsize=WEBHOOK_QUEUE_SIZE)
+        self.dropped = 0
+        self.failed = 0
+        self.thread = threading.Thread(target=self._run, name="alert-webhook", daemon=True)
+        self.thread.start()
+
+    def __call__(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            event = self.queue.get()
+            if event is None:
+                break
+            request = urllib.request.Request(self.url, data=json.dumps(event).encode("utf-8"),
+                                             headers={"Content-Type": "application/json"}, method="POST")
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout):
+                    pass
+            except OSError as e:
+                self.failed += 1
+                logger.warning(f"⚠️ Webhook {self.url}: {e}")
+
+    def close(self):
+        """Отправляет накопленное (ожидание не дольше timeout на событие)"""
+        self.queue.put(None)
+        self.thread.join(timeout=self.timeout * (self.queue.qsize() + 1))
+
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            event = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self.send_error(400)
+            return
+        with self.server.lock:
+            with open(self.server.out, "a", encoding="utf-8") as f:
+                f.write(json.dumps(event) + "\n")
+        print(f"📨 {event.get('state', '?')}: {format_event(event) if 'rule' in event else event}")
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def cmd_check(args):
+    rules = load_rules(args.rules)
+    by_type = {}
+    for rule in rules:
+        by_type[rule.type] = by_type.get(rule.type, 0) + 1
+    print(f"✅ {len(rules)} rule(s): " + ", ".join(f"{t} {n}" for t, n in sorted(by_type.items())))
+    for rule in rules:
+        condition = f"no data {rule.duration:g}s" if rule.type == "absent" else \
+            f"{rule.type} {rule.op} {rule.threshold:g} (clear {rule.clear:g}) for {rule.duration:g}s"
+        print(f"   {rule.name}: {rule.metric} {condition} [{rule.severity}]")
+    return 0
+
+
+def cmd_replay(args):
+    """Прогон правил по архиву метрик (metrics_archive) для подбора порогов"""
+    from metrics_archive import MetricsArchive
+
+    rules = load_rules(args.rules)
+    archive = MetricsArchive(args.archive)
+    events = []
+    engine = AlertEngine(rules, [events.append])
+    started = time.perf_counter()
+    samples = 0
+    for series in archive.series():
+        data = archive.query(series)
+        if not len(data["timestamp"]):
+            continue
+        engine.started = float(data["timestamp"][0])
+        names = [name for name in data if name != "timestamp"]
+        for i, timestamp in enumerate(data["timestamp"]):
+            engine.observe_many({name: data[name][i] for name in names}, float(timestamp), f"{series}.")
+            engine.tick(float(timestamp))
+            samples += 1
+    elapsed = time.perf_counter() - started
+    for event in events:
+        print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(event['time']))} "
+              f"{'🚨' if event['state'] == 'firing' else '✅'} {format_event(event)}")
+    print(f"📊 {samples} samples × {len(rules)} rule(s) in {elapsed:.2f}s, {len(events)} event(s), "
+          f"firing at end: {', '.join(engine.firing()) or 'none'}")
+    return 0
+
+
+def cmd_serve(args):
+    server = ThreadingHTTPServer((args.host, args.port), _WebhookHandler)
+    server.out = args.out
+    server.lock = threading.Lock()
+    print(f"📡 Webhook stand-in: http://{args.host}:{server.server_address[1]}/ -> {args.out}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental alert rules over metric streams")
+    subparsers = parser.add_subparsers(dest="command")
+
+    check_parser = subparsers.add_parser("check", help="Проверить и показать правила")
+    check_parser.add_argument("rules", nargs="?", default=str(DEFAULT_RULES_PATH), help="Файл правил JSON")
+
+    replay_parser = subparsers.add_parser("replay", help="Прогнать правила по архиву метрик")
+    replay_parser.add_argument("archive", help="Каталог metrics_archive")
+    replay_parser.add_argument("--rules", default=str(DEFAULT_RULES_PATH), help="Файл правил JSON")
+
+    serve_parser = subparsers.add_parser("serve", help="Локальный приёмник webhook (заглушка)")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="Адрес (по умолчанию: 127.0.0.1)")
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_WEBHOOK_PORT, help="Порт")
+    serve_parser.add_argument("--out", default="alerts.jsonl", help="Куда дописывать оповещения")
+
+    args = parser.parse_args()
+    if args.command == "check":
+        return cmd_check(args)
+    if args.command == "replay":
+        return cmd_replay(args)
+    if args.command == "serve":
+        return cmd_serve(args)
+    parser.print_help()
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
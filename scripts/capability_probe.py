@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Capability Probe
+Структурированный отчёт о среде: версии фреймворков, флаги ISA процессора
+(AVX2/AVX-512/AMX), потоки, память и устройства. Версии берутся из
+метаданных пакетов, GPU — из nvidia-smi, поэтому TensorFlow и torch не
+импортируются (torch — только с --deep). Отчёт кешируется на диске по ключу
+из версий пакетов и отпечатка железа: повторные проверки мгновенны.
+
+Использование:
+    python scripts/capability_probe.py
+    python scripts/capability_probe.py --deep --json-out logs/capabilities.json
+    python scripts/capability_probe.py --refresh
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+from datetime import datetime
+from importlib import metadata
+from pathlib import Path
+
+SCHEMA = "capability-report/1"
+CACHE_ENV = "ML_CAPABILITY_CACHE"
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "ml-workstation" / "capability"
+PACKAGES = ("torch", "torchvision", "torchaudio", "tensorflow", "numpy", "psutil")
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "TF_NUM_INTRAOP_THREADS")
+ISA_FLAGS = ("sse4_2", "avx", "avx2", "fma", "avx512f", "avx512bw", "avx512_vnni", "avx512_bf16",
+             "amx_tile", "amx_bf16", "amx_int8")
+# Имена фич numpy (Windows/macOS, где нет /proc/cpuinfo)
+NUMPY_FEATURES = {"sse4_2": "SSE42", "avx": "AVX", "avx2": "AVX2", "fma": "FMA3", "avx512f": "AVX512F",
+                  "avx512bw": "AVX512BW", "avx512_vnni": "AVX512_CLX", "avx512_bf16": "AVX512_SPR"}
+NVIDIA_SMI_PATHS = ("nvidia-smi", r"C:\Program Files\NVIDIA Corporation\NVSMI\nvidia-smi.exe")
+NVIDIA_SMI_TIMEOUT = 10
+
+
+def package_versions():
+    """Версии пакетов без их импорта"""
+    versions = {}
+    for name in PACKAGES:
+        try:
+            versions[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            versions[name] = None
+    return versions
+
+
+def read_cpuinfo():
+    """Модель CPU и флаги из /proc/cpuinfo (Linux)"""
+    info = {"model": None, "flags": set()}
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                key = key.strip()
+                if key == "model name" and info["model"] is None:
+                    info["model"] = value.strip()
+                elif key == "flags" and not info["flags"]:
+                    info["flags"] = set(value.split())
+    except OSError:
+        return None
+    return info
+
+
+def cpu_flags():
+    """Флаги ISA: /proc/cpuinfo, иначе диспетчер фич numpy"""
+    cpuinfo = read_cpuinfo()
+    if cpuinfo and cpuinfo["flags"]:
+        return {flag: flag in cpuinfo["flags"] for flag in ISA_FLAGS}
+    try:
+        from numpy._core._multiarray_umath import __cpu_features__ as features
+    except ImportError:
+        try:
+            from numpy.core._multiarray_umath import __cpu_features__ as features
+        except ImportError:
+            return {flag: None for flag in ISA_FLAGS}
+    return {flag: features.get(NUMPY_FEATURES[flag]) if flag in NUMPY_FEATURES else None
+            for flag in ISA_FLAGS}
+
+
+def cpu_model():
+    cpuinfo = read_cpuinfo()
+    if cpuinfo and cpuinfo["model"]:
+        return cpuinfo["model"]
+    return platform.processor() or platform.machine()
+
+
+def total_memory_gb():
+    """Объём RAM: psutil, иначе /proc/meminfo"""
+    try:
+        import psutil
+        return round(psutil.virtual_memory().total / 1024**3, 1)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/meminfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return round(int(line.split()[1]) / 1024**2, 1)
+    except OSError:
+        pass
+    return None
+
+
+def find_nvidia_smi():
+    for candidate in NVIDIA_SMI_PATHS:
+        path = shutil.which(candidate) or (candidate if os.path.isfile(candidate) else None)
+        if path:
+            return path
+    return None
+
+
+def nvidia_devices(nvidia_smi):
+    """GPU через nvidia-smi (без импорта фреймворков)"""
+    if nvidia_smi is None:
+        return []
+    try:
+        result = subprocess.run(
+            [nvidia_smi, "--query-gpu=name,memory.total,driver_version", "--format=csv,noheader,nounits"],
+            capture_output=True, text=True, timeout=NVIDIA_SMI_TIMEOUT, check=True)
+    except (subprocess.SubprocessError, OSError):
+        return []
+    devices = []
+    for line in result.stdout.strip().splitlines():
+        name, memory, driver = [part.strip() for part in line.split(",")]
+        devices.append({"name": name, "memory_total_mb": int(float(memory)), "driver": driver})
+    return devices
+
+
+def hardware_fingerprint(nvidia_smi):
+    """Отпечаток железа: дешёвые признаки без запуска внешних утилит"""
+    parts = [platform.node(), platform.machine(), cpu_model(), str(os.cpu_count()), str(total_memory_gb())]
+    if nvidia_smi:
+        # Обновление драйвера меняет бинарник nvidia-smi
+        parts.append(f"{nvidia_smi}:{os.stat(nvidia_smi).st_mtime_ns}")
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()[:16]
+
+
+def torch_details():
+    """Подробности torch (--deep): CUDA, потоки, oneDNN"""
+    try:
+        import torch
+    except ImportError:
+        return None
+    details = {
+        "cuda_available": torch.cuda.is_available(),
+        "cuda_version": torch.version.cuda,
+        "num_threads": torch.get_num_threads(),
+        "num_interop_threads": torch.get_num_interop_threads(),
+        "mkldnn": torch.backends.mkldnn.is_available(),
+        "devices": [],
+    }
+    if details["cuda_available"]:
+        for index in range(torch.cuda.device_count()):
+            props = torch.cuda.get_device_properties(index)
+            details["devices"].append({"name": props.name, "memory_total_mb": props.total_memory // 1024**2,
+                                       "capability": f"{props.major}.{props.minor}"})
+    return details
+
+
+def build_report(deep, cache_key, packages, nvidia_smi):
+    affinity = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    report = {
+        "schema": SCHEMA,
+        "generated_at": datetime.now().isoformat(),
+        "cache_key": cache_key,
+        "python": {"version": platform.python_version(), "implementation": platform.python_implementation(),
+                   "executable": sys.executable},
+        "platform": {"system": platform.system(), "release": platform.release(),
+                     "machine": platform.machine(), "node": platform.node()},
+        "packages": packages,
+        "cpu": {"model": cpu_model(), "flags": cpu_flags()},
+        "threads": {"logical_cpus": os.cpu_count(), "affinity": affinity,
+                    "env": {name: os.environ.get(name) for name in THREAD_ENV_VARS}},
+        "memory_gb": total_memory_gb(),
+        "devices": {"nvidia": nvidia_devices(nvidia_smi)},
+    }
+    if deep:
+        report["torch"] = torch_details()
+    return report
+
+
+def get_report(deep=False, refresh=False, cache_dir=None):
+    """Отчёт из кеша или свежий (с записью в кеш)"""
+    cache_dir = Path(cache_dir or os.environ.get(CACHE_ENV, DEFAULT_CACHE_DIR))
+    packages = package_versions()
+    nvidia_smi = find_nvidia_smi()
+    key_source = json.dumps({"schema": SCHEMA, "packages": packages, "deep": deep,
+                             "python": sys.executable, "hardware": hardware_fingerprint(nvidia_smi),
+                             "threads_env": {name: os.environ.get(name) for name in THREAD_ENV_VARS}},
+                            sort_keys=True)
+    cache_key = hashlib.sha256(key_source.encode()).hexdigest()[:24]
+    cache_path = cache_dir / f"{cache_key}.json"
+
+    if not refresh and cache_path.exists():
+        with open(cache_path, encoding="utf-8") as f:
+            report = json.load(f)
+        report["cached"] = True
+        return report
+
+    report = build_report(deep, cache_key, packages, nvidia_smi)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(f".tmp.{os.getpid()}")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, cache_path)
+    report["cached"] = False
+    return report
+
+
+def print_report(report):
+    """Человекочитаемая сводка"""
+    print(f"🐍 Python: {report['python']['version']} ({report['platform']['system']} {report['platform']['machine']})")
+    for name, version in report["packages"].items():
+        print(f"📦 {name}: {version or 'not installed'}")
+    flags = [flag for flag, present in report["cpu"]["flags"].items() if present]
+    print(f"💻 CPU: {report['cpu']['model']}")
+    print(f"   ISA: {', '.join(flags) or 'unknown'}")
+    print(f"🔢 Threads: {report['threads']['logical_cpus']} logical, {report['threads']['affinity']} available")
+    print(f"🧠 RAM: {report['memory_gb']} GB")
+    gpus = report["devices"]["nvidia"]
+    if gpus:
+        for index, gpu in enumerate(gpus):
+            print(f"🎮 GPU {index}: {gpu['name']} ({gpu['memory_total_mb']} MB, driver {gpu['driver']})")
+    else:
+        print("🎮 GPU: not found")
+    torch_info = report.get("torch")
+    if torch_info:
+        print(f"🔥 Torch CUDA available: {torch_info['cuda_available']} "
+              f"(threads {torch_info['num_threads']}, oneDNN {torch_info['mkldnn']})")
+    print(f"🗂️ {'cached' if report['cached'] else 'fresh'} report, key {report['cache_key']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cached environment/device capability probe")
+    parser.add_argument("--deep", action="store_true", help="Импортировать torch для проверки CUDA")
+    parser.add_argument("--refresh", action="store_true", help="Игнорировать кеш")
+    parser.add_argument("--json", action="store_true", help="Вывести отчёт в JSON")
+    parser.add_argument("--json-out", default=None, help="Сохранить отчёт в файл")
+    parser.add_argument("--cache-dir", default=None, help=f"Каталог кеша (по умолчанию: {DEFAULT_CACHE_DIR})")
+    args = parser.parse_args()
+
+    report = get_report(args.deep, args.refresh, args.cache_dir)
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
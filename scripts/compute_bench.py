@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Compute Benchmark
+Кросс-фреймворковый бенчмарк CPU: GEMM (GFLOPS по размерам), conv2d на
+формах SimpleCNN и пропускная способность памяти — для PyTorch и
+TensorFlow. Результаты в общей JSON-схеме, плюс выбор более быстрого
+фреймворка для каждой операции.
+
+Использование:
+    python scripts/compute_bench.py
+    python scripts/compute_bench.py --frameworks torch --quick --json-out logs/compute_bench.json
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from datetime import datetime
+from importlib import util as importlib_util
+
+SCHEMA = "compute-bench/1"
+FRAMEWORKS = ("torch", "tensorflow")
+GEMM_SIZES = (256, 512, 1024, 2048)
+QUICK_GEMM_SIZES = (256, 512)
+# Формы свёрток SimpleCNN (experiments/src/train_example.py): N, C_in, H, W, C_out, kernel
+CONV_SHAPES = (
+    {"name": "conv1", "batch": 64, "in_channels": 3, "size": 32, "out_channels": 32, "kernel": 3},
+    {"name": "conv2", "batch": 64, "in_channels": 32, "size": 16, "out_channels": 64, "kernel": 3},
+)
+BANDWIDTH_MB = 256
+QUICK_BANDWIDTH_MB = 32
+WARMUP_ITERS = 2
+MIN_MEASURE_SECONDS = 0.5
+MAX_ITERS = 50
+# У TensorFlow нет out=, поэтому и в PyTorch операции выделяют новый результат
+# на каждом вызове: стоимость выделения входит в замер обоих фреймворков одинаково
+
+
+def time_op(fn, min_seconds=MIN_MEASURE_SECONDS):
+    """Медианное время одного вызова fn после прогрева"""
+    for _ in range(WARMUP_ITERS):
+        fn()
+    times = []
+    started = time.perf_counter()
+    while len(times) < MAX_ITERS and (time.perf_counter() - started < min_seconds or len(times) < 3):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), len(times)
+
+
+def result_entry(framework, op, params, seconds, iters, **metrics):
+    entry = {"framework": framework, "op": op, "params": params, "dtype": "float32",
+             "seconds": seconds, "iters": iters}
+    entry.update(metrics)
+    return entry
+
+
+def conv_flops(shape):
+    """FLOPs свёртки с padding=same: 2 * N * C_out * H * W * C_in * k * k"""
+    return (2 * shape["batch"] * shape["out_channels"] * shape["size"] ** 2
+            * shape["in_channels"] * shape["kernel"] ** 2)
+
+
+def bench_torch(gemm_sizes, bandwidth_mb, threads):
+    import torch
+    import torch.nn.functional as F
+
+    if threads:
+        torch.set_num_threads(threads)
+    results = []
+    with torch.inference_mode():
+        for n in gemm_sizes:
+            a, b = torch.randn(n, n), torch.randn(n, n)
+            seconds, iters = time_op(lambda: torch.mm(a, b))
+            results.append(result_entry("torch", "gemm", {"n": n}, seconds, iters,
+                                        gflops=2 * n ** 3 / seconds / 1e9))
+
+        for shape in CONV_SHAPES:
+            x = torch.randn(shape["batch"], shape["in_channels"], shape["size"], shape["size"])
+            w = torch.randn(shape["out_channels"], shape["in_channels"], shape["kernel"], shape["kernel"])
+            seconds, iters = time_op(lambda: F.conv2d(x, w, padding=shape["kernel"] // 2))
+            results.append(result_entry("torch", "conv2d", dict(shape), seconds, iters,
+                                        gflops=conv_flops(shape) / seconds / 1e9,
+                                        samples_per_sec=shape["batch"] / seconds))
+
+        numel = bandwidth_mb * 1024 ** 2 // 4
+        src = torch.randn(numel)
+        seconds, iters = time_op(lambda: torch.mul(src, 1.0))
+        results.append(result_entry("torch", "stream_scale", {"megabytes": bandwidth_mb}, seconds, iters,
+                                    gbytes_per_sec=2 * numel * 4 / seconds / 1e9))
+    return results
+
+
+def bench_tensorflow(gemm_sizes, bandwidth_mb, threads):
+    import tensorflow as tf
+
+    if threads:
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+    results = []
+    with tf.device("/CPU:0"):
+        for n in gemm_sizes:
+            a, b = tf.random.normal((n, n)), tf.random.normal((n, n))
+            seconds, iters = time_op(lambda: tf.linalg.matmul(a, b))
+            results.append(result_entry("tensorflow", "gemm", {"n": n}, seconds, iters,
+                                        gflops=2 * n ** 3 / seconds / 1e9))
+
+        for shape in CONV_SHAPES:
+            # TensorFlow на CPU работает в NHWC
+            x = tf.random.normal((shape["batch"], shape["size"], shape["size"], shape["in_channels"]))
+            w = tf.random.normal((shape["kernel"], shape["kernel"], shape["in_channels"], shape["out_channels"]))
+            seconds, iters = time_op(lambda: tf.nn.conv2d(x, w, strides=1, padding="SAME"))
+            results.append(result_entry("tensorflow", "conv2d", dict(shape), seconds, iters,
+                                        gflops=conv_flops(shape) / seconds / 1e9,
+                                        samples_per_sec=shape["batch"] / seconds))
+
+        numel = bandwidth_mb * 1024 ** 2 // 4
+        src = tf.random.normal((numel,))
+        seconds, iters = time_op(lambda: tf.math.multiply(src, 1.0))
+        results.append(result_entry("tensorflow", "stream_scale", {"megabytes": bandwidth_mb}, seconds, iters,
+                                    gbytes_per_sec=2 * numel * 4 / seconds / 1e9))
+    return results
+
+
+BENCHMARKS = {"torch": bench_torch, "tensorflow": bench_tensorflow}
+
+
+def op_key(entry):
+    """Ключ операции: gemm:n=512, conv2d:conv1, stream_scale:megabytes=256"""
+    params = entry["params"]
+    if "name" in params:
+        return f"{entry['op']}:{params['name']}"
+    return entry["op"] + ":" + ",".join(f"{key}={value}" for key, value in sorted(params.items()))
+
+
+def best_per_op(results):
+    """Быстрейший фреймворк для каждой операции и набора параметров"""
+    best = {}
+    for entry in results:
+        key = op_key(entry)
+        if key not in best or entry["seconds"] < best[key]["seconds"]:
+            best[key] = {"framework": entry["framework"], "seconds": entry["seconds"]}
+    return {key: value["framework"] for key, value in best.items()}
+
+
+def host_summary():
+    """Краткие сведения о машине из кешированного capability probe"""
+    try:
+        from capability_probe import get_report
+    except ImportError:
+        return {}
+    report = get_report()
+    return {"cpu": report["cpu"], "threads": report["threads"], "packages": report["packages"]}
+
+
+def run_benchmarks(frameworks=FRAMEWORKS, quick=False, threads=None):
+    """Запускает бенчмарки установленных фреймворков; возвращает отчёт"""
+    gemm_sizes = QUICK_GEMM_SIZES if quick else GEMM_SIZES
+    bandwidth_mb = QUICK_BANDWIDTH_MB if quick else BANDWIDTH_MB
+    results, skipped = [], []
+    for framework in frameworks:
+        if importlib_util.find_spec(framework) is None:
+            skipped.append(framework)
+            continue
+        results += BENCHMARKS[framework](gemm_sizes, bandwidth_mb, threads)
+    return {
+        "schema": SCHEMA,
+        "generated_at": datetime.now().isoformat(),
+        "host": host_summary(),
+        "skipped": skipped,
+        "results": results,
+        "best": best_per_op(results),
+    }
+
+
+def format_entry(entry):
+    params = ", ".join(f"{key}={value}" for key, value in entry["params"].items() if key != "name")
+    if "gbytes_per_sec" in entry:
+        metric = f"{entry['gbytes_per_sec']:.1f} GB/s"
+    else:
+        metric = f"{entry['gflops']:.1f} GFLOPS"
+    return f"{entry['framework']:>10} {entry['op']:<12} {params:<60} {metric:>14}"
+
+
+def print_report(report):
+    for entry in report["results"]:
+        print(format_entry(entry))
+    for framework in report["skipped"]:
+        print(f"⚠️ {framework} not installed — skipped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-framework CPU compute benchmark")
+    parser.add_argument("--frameworks", default=",".join(FRAMEWORKS),
+                        help=f"Фреймворки через запятую (по умолчанию: {','.join(FRAMEWORKS)})")
+    parser.add_argument("--quick", action="store_true", help="Малые размеры для smoke-проверки")
+    parser.add_argument("--threads", type=int, default=None, help="Число потоков (по умолчанию — фреймворка)")
+    parser.add_argument("--json-out", default=None, help="Сохранить отчёт в JSON")
+    args = parser.parse_args()
+
+    frameworks = [name for name in args.frameworks.split(",") if name]
+    unknown = set(frameworks) - set(FRAMEWORKS)
+    if unknown:
+        parser.error(f"unknown frameworks: {', '.join(sorted(unknown))}")
+
+    report = run_benchmarks(frameworks, args.quick, args.threads)
+    print_report(report)
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0 if report["results"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,7 +6,6 @@ Context7 CLI - Утилита командной строки для работ
     python context7_cli.py docs "/react-hook-form/documentation" --topic hooks --tokens 2000
 """
 
-import requests
 import json
 import argparse
 import sys
@@ -18,6 +17,8 @@ BASE_URL = "https://context7.com/api/v1"
 
 class Context7API:
     def __init__(self, api_key: str):
+        # requests импортируется лениво: --help и разбор аргументов его не требуют
+        import requests
         self.api_key = api_key
         self.base_url = BASE_URL
         self.session = requests.Session()
@@ -221,7 +222,7 @@ def main():
     
     # Проверяем requests
     try:
-        import requests
+        import requests  # noqa: F401
     except ImportError:
         print("❌ Модуль requests не установлен. Выполните: pip install requests")
         sys.exit(1)
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Resource Sampler
+Сэмплер ресурсов с малыми накладными расходами: CPU, память, диск и сеть
+системы и отслеживаемых процессов (psutil), плюс GPU через NVML, если
+pynvml и драйвер доступны. Дескрипторы процессов и счётчики переиспользуются
+между отсчётами, строки пишутся пачками — поэтому работают и интервалы
+меньше секунды. Вывод: компактный CSV или бинарный колоночный формат (.bin).
+
+Использование:
+    python scripts/gpu_monitor.py --interval 60 --out logs/gpu_usage.csv
+    python scripts/gpu_monitor.py --interval 0.2 --out logs/resources.bin --match train --per-process
+"""
+
+import argparse
+import array
+import csv
+import json
+import os
+import struct
+import sys
+import time
+
+import psutil
+
+DEFAULT_INTERVAL = 1.0
+DEFAULT_MATCH = "python"
+# Список процессов обновляется реже, чем снимаются отсчёты
+PROCESS_REFRESH_SECONDS = 5.0
+# Срок отказа по PID: после exec (обёртка -> python) тот же PID может начать подходить
+REJECT_TTL_SECONDS = 60.0
+FLUSH_SECONDS = 10.0
+FLUSH_ROWS = 512
+MB = 1024 ** 2
+COLUMNAR_MAGIC = b"RSCOL1\n"
+BLOCK_HEADER = struct.Struct("<I")
+
+SYSTEM_COLUMNS = ("timestamp", "cpu_percent", "mem_used_mb", "mem_percent", "swap_percent",
+                  "disk_read_mbps", "disk_write_mbps", "net_sent_mbps", "net_recv_mbps",
+                  "procs", "proc_cpu_percent", "proc_rss_mb", "proc_read_mbps", "proc_write_mbps")
+GPU_FIELDS = ("util", "mem_used_mb", "temp_c", "power_w")
+PROCESS_COLUMNS = ("timestamp", "pid", "name", "cpu_percent", "rss_mb", "read_mbps", "write_mbps")
+
+
+class NvmlBackend:
+    """GPU-метрики через NVML; None из create(), если NVML недоступен"""
+
+    def __init__(self, nvml):
+        self.nvml = nvml
+        self.handles = [nvml.nvmlDeviceGetHandleByIndex(i) for i in range(nvml.nvmlDeviceGetCount())]
+
+    @classmethod
+    def create(cls):
+        try:
+            import pynvml
+            pynvml.nvmlInit()
+        except Exception:
+            return None
+        backend = cls(pynvml)
+        return backend if backend.handles else None
+
+    @property
+    def columns(self):
+        return tuple(f"gpu{i}_{field}" for i in range(len(self.handles)) for field in GPU_FIELDS)
+
+    def sample(self):
+        values = []
+        for handle in self.handles:
+            util = self.nvml.nvmlDeviceGetUtilizationRates(handle)
+            memory = self.nvml.nvmlDeviceGetMemoryInfo(handle)
+            temp = self.nvml.nvmlDeviceGetTemperature(handle, self.nvml.NVML_TEMPERATURE_GPU)
+            try:
+                power = self.nvml.nvmlDeviceGetPowerUsage(handle) / 1000
+            except self.nvml.NVMLError:
+                power = float("nan")
+            values += [util.gpu, memory.used / MB, temp, power]
+        return values
+
+    def close(self):
+        self.nvml.nvmlShutdown()
+
+
+class ResourceSampler:
+    """
+    Снимает отсчёты системы и отслеживаемых процессов
+
+    Args:
+        match: подстрока имени/командной строки отслеживаемых процессов
+        pids: явный список PID (дополняет match)
+        gpu: пытаться подключить NVML
+    """
+
+    def __init__(self, match=DEFAULT_MATCH, pids=None, gpu=True):
+        self.match = match
+        self.pids = set(pids or [])
+        self.gpu = NvmlBackend.create() if gpu else None
+        self.columns = SYSTEM_COLUMNS + (self.gpu.columns if self.gpu else ())
+        self.processes = {}
+        # Не подошедшие PID -> срок (monotonic): до него name()/cmdline() не повторяются
+        self.rejected = {}
+        self.process_io = {}
+        self.next_refresh = 0.0
+        self.self_pid = os.getpid()
+        # Первый вызов cpu_percent(None) инициализирует счётчик и возвращает 0
+        psutil.cpu_percent(None)
+        self.last_time = time.monotonic()
+        self.last_disk = psutil.disk_io_counters()
+        self.last_net = psutil.net_io_counters()
+
+    def _matches(self, proc):
+        if proc.pid in self.pids:
+            return True
+        if not self.match or proc.pid == self.self_pid:
+            return False
+        try:
+            name = proc.name()
+            return self.match in name or self.match in " ".join(proc.cmdline())
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return False
+
+    def refresh_processes(self):
+        """Подключает новые процессы; известные дескрипторы и отказы сохраняются"""
+        pids = set(psutil.pids())
+        now = time.monotonic()
+        self.rejected = {pid: expires for pid, expires in self.rejected.items() if pid in pids and expires > now}
+        for pid in pids - self.rejected.keys() - self.processes.keys():
+            try:
+                proc = psutil.Process(pid)
+            except psutil.NoSuchProcess:
+                continue
+            if self._matches(proc):
+                proc.cpu_percent(None)
+                self.processes[pid] = proc
+            else:
+                self.rejected[pid] = now + REJECT_TTL_SECONDS
+
+    def _process_rows(self, elapsed, timestamp):
+        rows = []
+        for pid, proc in list(self.processes.items()):
+            try:
+                with proc.oneshot():
+                    cpu = proc.cpu_percent(None)
+                    rss = proc.memory_info().rss
+                    io = proc.io_counters() if hasattr(proc, "io_counters") else None
+                    name = proc.name()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                del self.processes[pid]
+                self.process_io.pop(pid, None)
+                continue
+            read_rate = write_rate = 0.0
+            if io is not None:
+                last = self.process_io.get(pid)
+                if last is not None:
+                    read_rate = (io.read_bytes - last.read_bytes) / elapsed / MB
+                    write_rate = (io.write_bytes - last.write_bytes) / elapsed / MB
+                self.process_io[pid] = io
+            rows.append((timestamp, pid, name, cpu, rss / MB, read_rate, write_rate))
+        return rows
+
+    def sample(self):
+        """Отсчёт: (строка по SYSTEM_COLUMNS + GPU, строки процессов)"""
+        now = time.monotonic()
+        if now >= self.next_refresh:
+            self.refresh_processes()
+            self.next_refresh = now + PROCESS_REFRESH_SECONDS
+        elapsed = max(now - self.last_time, 1e-6)
+        timestamp = time.time()
+
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_io_counters()
+        net = psutil.net_io_counters()
+        disk_rates = ((disk.read_bytes - self.last_disk.read_bytes) / elapsed / MB,
+                      (disk.write_bytes - self.last_disk.write_bytes) / elapsed / MB) \
+            if disk and self.last_disk else (0.0, 0.0)
+        net_rates = ((net.bytes_sent - self.last_net.bytes_sent) / elapsed / MB,
+                     (net.bytes_recv - self.last_net.bytes_recv) / elapsed / MB)
+        self.last_time, self.last_disk, self.last_net = now, disk, net
+
+        processes = self._process_rows(elapsed, timestamp)
+        row = [timestamp, psutil.cpu_percent(None), memory.used / MB, memory.percent,
+               psutil.swap_memory().percent, *disk_rates, *net_rates, len(processes),
+               sum(p[3] for p in processes), sum(p[4] for p in processes),
+               sum(p[5] for p in processes), sum(p[6] for p in processes)]
+        if self.gpu:
+            row += self.gpu.sample()
+        return row, processes
+
+    def close(self):
+        if self.gpu:
+            self.gpu.close()
+
+
+class CsvSink:
+    """CSV с пакетной записью; числа округляются до 3 знаков"""
+
+    def __init__(self, path, columns):
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "a", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        if new_file:
+            self.writer.writerow(columns)
+        self.rows = []
+
+    def write(self, row):
+        self.rows.append([round(value, 3) if isinstance(value, float) else value for value in row])
+
+    def flush(self):
+        self.writer.writerows(self.rows)
+        self.rows.clear()
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+class ColumnarSink:
+    """
+    Бинарный колоночный формат (.bin)
+
+    Заголовок: магия, JSON-строка с именами колонок. Далее блоки: u32 число
+    строк и значения float64 по колонкам подряд (строковые колонки не пишутся).
+    """
+
+    def __init__(self, path, columns):
+        self.columns = columns
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "ab")
+        if new_file:
+            self.file.write(COLUMNAR_MAGIC + json.dumps(list(columns)).encode() + b"\n")
+        self.buffers = [array.array("d") for _ in columns]
+        self.count = 0
+
+    def write(self, row):
+        for buffer, value in zip(self.buffers, row):
+            buffer.append(float(value))
+        self.count += 1
+
+    def flush(self):
+        if not self.count:
+            return
+        self.file.write(BLOCK_HEADER.pack(self.count))
+        for buffer in self.buffers:
+            self.file.write(buffer.tobytes())
+            del buffer[:]
+        self.count = 0
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def read_columnar(path):
+    """Читает .bin в словарь колонка -> array('d')"""
+    with open(path, "rb") as f:
+        if f.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+            raise ValueError(f"{path} is not a columnar sampler file")
+        columns = json.loads(f.readline())
+        data = {name: array.array("d") for name in columns}
+        while True:
+            header = f.read(BLOCK_HEADER.size)
+            if len(header) < BLOCK_HEADER.size:
+                break
+            (count,) = BLOCK_HEADER.unpack(header)
+            for name in columns:
+                data[name].frombytes(f.read(count * 8))
+    return data
+
+
+def open_sink(path, columns, fmt=None):
+    """Формат по расширению: .bin — колоночный, иначе CSV"""
+    fmt = fmt or ("columnar" if path.endswith(".bin") else "csv")
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return ColumnarSink(path, columns) if fmt == "columnar" else CsvSink(path, columns)
+
+
+def process_sink_path(path):
+    root, _ = os.path.splitext(path)
+    return f"{root}.processes.csv"
+
+
+def run_sampler(sampler, out, interval, duration=None, fmt=None, per_process=False, history=None):
+    """Фиксированный шаг по монотонным часам: время сэмплирования не копится в дрейф
+
+    history: TimeSeriesStore, куда дублируются отсчёты (история прогона в памяти)
+    """
+    sink = open_sink(out, sampler.columns + ("sampler_ms",), fmt)
+    process_sink = CsvSink(process_sink_path(out), PROCESS_COLUMNS) if per_process else None
+    next_tick = time.monotonic()
+    deadline = next_tick + duration if duration else None
+    last_flush = next_tick
+    samples = 0
+    try:
+        while deadline is None or next_tick < deadline:
+            cpu_start = time.process_time()
+            row, processes = sampler.sample()
+            sink.write(row + [(time.process_time() - cpu_start) * 1000])
+            if history is not None:
+                history.append(row[0], row[1:])
+            if process_sink:
+                for process_row in processes:
+                    process_sink.write(process_row)
+            samples += 1
+
+            now = time.monotonic()
+            if now - last_flush >= FLUSH_SECONDS or samples % FLUSH_ROWS == 0:
+                sink.flush()
+                if process_sink:
+                    process_sink.flush()
+                last_flush = now
+            next_tick += interval
+            if next_tick < now:
+                # Пропущенные тики не догоняем пачкой
+                next_tick = now + interval
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sink.close()
+        if process_sink:
+            process_sink.close()
+        sampler.close()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Low-overhead resource sampler")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL,
+                        help=f"Интервал отсчётов в секундах, допускается < 1 (по умолчанию: {DEFAULT_INTERVAL})")
+    parser.add_argument("--out", default="gpu_usage.csv", help="Файл вывода (.csv или .bin)")
+    parser.add_argument("--format", choices=("csv", "columnar"), default=None,
+                        help="Формат вывода (по умолчанию — по расширению)")
+    parser.add_argument("--duration", type=float, default=None, help="Длительность в секундах (по умолчанию — бесконечно)")
+    parser.add_argument("--match", default=DEFAULT_MATCH,
+                        help=f"Подстрока имени отслеживаемых процессов (по умолчанию: {DEFAULT_MATCH})")
+    parser.add_argument("--pid", type=int, nargs="*", default=[], help="Дополнительные PID для отслеживания")
+    parser.add_argument("--per-process", action="store_true", help="Писать строки процессов в <out>.processes.csv")
+    parser.add_argument("--no-gpu", action="store_true", help="Не подключать NVML")
+    parser.add_argument("--history", default=None,
+                        help="Сохранить многоразрешающую историю (timeseries_store) в .npz при выходе")
+    args = parser.parse_args()
+
+    if args.interval <= 0:
+        parser.error("--interval must be positive")
+
+    sampler = ResourceSampler(args.match, args.pid, gpu=not args.no_gpu)
+    gpu_state = f"{len(sampler.gpu.handles)} GPU(s) via NVML" if sampler.gpu else "no GPU backend"
+    print(f"📊 Sampling every {args.interval}s -> {args.out} ({gpu_state})")
+    history = None
+    if args.history:
+        from timeseries_store import TimeSeriesStore
+        history = TimeSeriesStore(sampler.columns[1:])
+    samples = run_sampler(sampler, args.out, args.interval, args.duration, args.format, args.per_process, history)
+    if history is not None:
+        history.save(args.history)
+    print(f"✅ Wrote {samples} sample(s) to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк времени импорта точек входа
+Запускает каждую точку входа в отдельном интерпретаторе с `-X importtime`,
+суммирует накопленное время импортов верхнего уровня и сравнивает его с
+бюджетом из import_budgets.json. Модули из "exclude" (неизбежный torch)
+в бюджет не входят, чтобы порог не зависел от скорости машины.
+Код возврата 1, если бюджет превышен.
+
+Использование:
+    python scripts/import_time_bench.py
+    python scripts/import_time_bench.py --repeat 5 --json import_times.json
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_BUDGETS = Path(__file__).resolve().parent / "import_budgets.json"
+DEFAULT_REPEAT = 3
+TOP_MODULES = 5
+
+# "import time:       412 |       1208 |   torch._C"
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)")
+
+# Загружаем модуль как скрипт, но без блока __main__ (если не заданы argv)
+RUNNER = """
+import runpy, sys, os
+path, run_name = sys.argv[1], sys.argv[2]
+sys.argv = [path] + sys.argv[3:]
+sys.path.insert(0, os.path.dirname(os.path.abspath(path)))
+try:
+    runpy.run_path(path, run_name=run_name)
+except SystemExit:
+    pass
+"""
+
+
+def parse_importtime(stderr):
+    """Модули верхнего уровня и их накопленное время, мкс"""
+    top_level = {}
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(2)), match.group(3), match.group(4)
+        # Вложенные импорты сдвинуты на два пробела на уровень
+        if len(indent) == 1:
+            top_level[name] = top_level.get(name, 0) + cumulative
+    return top_level
+
+
+def measure_entry(script, argv, cwd):
+    """Один замер: (суммарное время импортов мкс, модули, wall-время сек)"""
+    run_name = "__main__" if argv else "__import_bench__"
+    command = [sys.executable, "-X", "importtime", "-c", RUNNER, script, run_name] + argv
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=cwd, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    modules = parse_importtime(result.stderr)
+    if result.returncode != 0:
+        tail = result.stderr.strip().splitlines()[-1:] or ["unknown error"]
+        raise RuntimeError(f"{script} failed: {tail[0]}")
+    return sum(modules.values()), modules, wall
+
+
+def bench_entry(name, spec, repeat):
+    """Медиана по нескольким запускам (первый прогревает файловый кеш)"""
+    script = str(REPO_ROOT / name)
+    cwd = str(REPO_ROOT / spec.get("cwd", os.path.dirname(name) or "."))
+    samples = [measure_entry(script, spec.get("argv", []), cwd) for _ in range(repeat)]
+    totals = [total for total, _, _ in samples]
+    median_index = totals.index(statistics.median_low(totals))
+    total, modules, wall = samples[median_index]
+    excluded = sum(us for module, us in modules.items() if module in spec.get("exclude", []))
+    heaviest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:TOP_MODULES]
+    return {
+        "entry": name,
+        "import_ms": total / 1000,
+        "budgeted_ms": (total - excluded) / 1000,
+        "wall_ms": wall * 1000,
+        "budget_ms": spec["budget_ms"],
+        "over_budget": (total - excluded) / 1000 > spec["budget_ms"],
+        "top_modules": [{"module": module, "ms": us / 1000} for module, us in heaviest],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time benchmark for entry points")
+    parser.add_argument("--budgets", default=str(DEFAULT_BUDGETS), help="JSON с бюджетами точек входа")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Число запусков на точку входа")
+    parser.add_argument("--json", dest="json_out", default=None, help="Сохранить отчёт в JSON")
+    parser.add_argument("--only", nargs="*", default=None, help="Ограничить список точек входа")
+    args = parser.parse_args()
+
+    with open(args.budgets, encoding="utf-8") as f:
+        budgets = json.load(f)
+
+    report, failed = [], False
+    for name, spec in budgets.items():
+        if args.only and name not in args.only:
+            continue
+        try:
+            entry = bench_entry(name, spec, args.repeat)
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            failed = True
+            continue
+        report.append(entry)
+        status = "❌" if entry["over_budget"] else "✅"
+        heaviest = ", ".join(f"{m['module']} {m['ms']:.0f}ms" for m in entry["top_modules"])
+        print(f"{status} {name}: imports {entry['import_ms']:.0f}ms, "
+              f"budgeted {entry['budgeted_ms']:.0f}ms / {entry['budget_ms']}ms "
+              f"(wall {entry['wall_ms']:.0f}ms) — {heaviest}")
+        failed = failed or entry["over_budget"]
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,574 @@
+#!/usr/bin/env python3
+"""
+Log Analyzer
+Потоковый анализ JSONL-журналов тренировки (logs/train_steps.jsonl) и
+записей мониторинга (JSONL или CSV gpu_monitor) произвольной длины в
+постоянной памяти: перцентили — t-digest, аномалии — скользящие медиана и
+MAD. По окнам времени считаются пропускная способность, p50/p99 времени
+шага и средний loss; помечаются выбросы времени шага, провалы пропускной
+способности и скачки loss. Результат — компактная сводка (текст, Markdown,
+JSON) для артефактов workflow вместо 72 часов сырых логов.
+
+Использование:
+    python scripts/log_analyzer.py results/exp_*/logs/train_steps.jsonl --window 10m
+    python scripts/log_analyzer.py logs/gpu_usage.csv --metric cpu_percent --metric gpu0_util
+    python scripts/log_analyzer.py train_steps.jsonl --markdown-out summary.md --json-out summary.json
+"""
+
+import argparse
+import bisect
+import csv
+import gzip
+import json
+import math
+import os
+import sys
+import time
+from collections import deque
+from datetime import datetime
+
+TIME_FIELDS = ("time", "timestamp")
+DEFAULT_WINDOW = "10m"
+DEFAULT_COMPRESSION = 100
+# Робастный z-порог: |x - медиана| > THRESHOLD * 1.4826 * MAD
+DEFAULT_THRESHOLD = 6.0
+MAD_SCALE = 1.4826
+STEP_HISTORY = 101
+WINDOW_HISTORY = 12
+MAD_REFRESH = 16
+# Выброс должен ещё и заметно отличаться от медианы (при MAD ≈ 0)
+MIN_RELATIVE_CHANGE = 0.5
+MAX_EVENTS = 20
+TIME_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+class TDigest:
+    """
+    Merging t-digest (Dunning): квантили потока в O(compression) памяти
+
+    Точки копятся в буфере и вливаются в центроиды пачкой; размер
+    центроида ограничен функцией масштаба k1, поэтому хвосты (p99) точнее
+    середины.
+    """
+
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.means = []
+        self.weights = []
+        self.buffer = []
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        self.buffer.append(value)
+        self.count += 1
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if len(self.buffer) >= 5 * self.compression:
+            self._merge()
+
+    def _k_limit(self, q):
+        """Верхняя граница доли q для центроида, начинающегося в q (k1: k -> k+1)"""
+        k = self.compression / (2 * math.pi) * math.asin(2 * q - 1) + 1
+        if k >= self.compression / 4:
+            return 1.0
+        return (math.sin(2 * math.pi * k / self.compression) + 1) / 2
+
+    def _merge(self):
+        if not self.buffer:
+            return
+        points = sorted(list(zip(self.means, self.weights)) + [(value, 1.0) for value in self.buffer])
+        self.buffer = []
+        total = sum(weight for _, weight in points)
+        means, weights = [], []
+        mean, weight = points[0]
+        done = 0.0
+        limit = total * self._k_limit(0.0)
+        for next_mean, next_weight in points[1:]:
+            if done + weight + next_weight <= limit:
+                weight += next_weight
+                mean += (next_mean - mean) * next_weight / weight
+            else:
+                means.append(mean)
+                weights.append(weight)
+                done += weight
+                limit = total * self._k_limit(done / total)
+                mean, weight = next_mean, next_weight
+        means.append(mean)
+        weights.append(weight)
+        self.means, self.weights = means, weights
+
+    def quantile(self, q):
+        self._merge()
+        if not self.weights:
+            return math.nan
+        if len(self.weights) == 1:
+            return self.means[0]
+        target = q * self.count
+        cumulative = 0.0
+        previous_center, previous_mean = 0.0, self.min
+        for mean, weight in zip(self.means, self.weights):
+            center = cumulative + weight / 2
+            if target < center:
+                span = center - previous_center
+                fraction = (target - previous_center) / span if span > 0 else 0.0
+                return previous_mean + fraction * (mean - previous_mean)
+            previous_center, previous_mean = center, mean
+            cumulative += weight
+        span = self.count - previous_center
+        fraction = (target - previous_center) / span if span > 0 else 1.0
+        return previous_mean + fraction * (self.max - previous_mean)
+
+
+class RollingMedianMAD:
+    """
+    Медиана и MAD последних size значений
+
+    Медиана — из отсортированного окна (bisect), MAD пересчитывается раз в
+    refresh обновлений: выбросы ищутся по статистике прошлых значений, и
+    небольшое запаздывание MAD на результат не влияет.
+    """
+
+    def __init__(self, size, refresh=MAD_REFRESH):
+        self.size = size
+        self.refresh = refresh
+        self.window = deque()
+        self.sorted = []
+        self.updates = 0
+        self.mad_value = 0.0
+
+    def __len__(self):
+        return len(self.window)
+
+    def add(self, value):
+        self.window.append(value)
+        bisect.insort(self.sorted, value)
+        if len(self.window) > self.size:
+            old = self.window.popleft()
+            del self.sorted[bisect.bisect_left(self.sorted, old)]
+        self.updates += 1
+        if self.updates % self.refresh == 0 or len(self.window) <= self.refresh:
+            median = self.median()
+            deviations = sorted(abs(v - median) for v in self.sorted)
+            self.mad_value = _middle(deviations)
+
+    def median(self):
+        return _middle(self.sorted)
+
+    def mad(self):
+        return self.mad_value
+
+    def check(self, value, threshold, direction):
+        """
+        Проверка value по окну (до добавления); direction: 1 — выброс вверх, -1 — вниз
+
+        Returns:
+            медиана окна, если value — аномалия, иначе None
+        """
+        if len(self.window) < max(8, self.size // 4):
+            return None
+        median = self.median()
+        deviation = (value - median) * direction
+        if deviation > threshold * MAD_SCALE * self.mad_value and deviation > MIN_RELATIVE_CHANGE * abs(median):
+            return median
+        return None
+
+
+def _middle(values):
+    n = len(values)
+    if not n:
+        return math.nan
+    return values[n // 2] if n % 2 else (values[n // 2 - 1] + values[n // 2]) / 2
+
+
+class RunningTrend:
+    """Линейная регрессия y(t) по потоку: наклон в единицах за час"""
+
+    def __init__(self):
+        self.n = 0
+        self.sum_t = self.sum_y = self.sum_tt = self.sum_ty = 0.0
+        self.origin = None
+
+    def add(self, timestamp, value):
+        if self.origin is None:
+            self.origin = timestamp
+        t = (timestamp - self.origin) / 3600
+        self.n += 1
+        self.sum_t += t
+        self.sum_y += value
+        self.sum_tt += t * t
+        self.sum_ty += t * value
+
+    def slope(self):
+        denominator = self.n * self.sum_tt - self.sum_t ** 2
+        if self.n < 2 or denominator <= 0:
+            return math.nan
+        return (self.n * self.sum_ty - self.sum_t * self.sum_y) / denominator
+
+
+class WindowStats:
+    """Агрегаты одного окна времени"""
+
+    def __init__(self, start, compression):
+        self.start = start
+        self.steps = 0
+        self.samples = 0
+        self.step_seconds = 0.0
+        self.loss_sum = 0.0
+        self.loss_count = 0
+        self.spikes = 0
+        self.step_times = TDigest(compression)
+
+    def add_step(self, step_time, samples, loss):
+        self.steps += 1
+        if step_time is not None:
+            self.step_times.add(step_time)
+            self.step_seconds += step_time
+        if samples is not None:
+            self.samples += samples
+        if loss is not None and math.isfinite(loss):
+            self.loss_sum += loss
+            self.loss_count += 1
+
+    def throughput(self):
+        return self.samples / self.step_seconds if self.step_seconds > 0 and self.samples else None
+
+    def mean_loss(self):
+        return self.loss_sum / self.loss_count if self.loss_count else None
+
+    def row(self):
+        return {"start": self.start, "steps": self.steps, "samples": self.samples,
+                "throughput": self.throughput(), "p50_step": self.step_times.quantile(0.5),
+                "p99_step": self.step_times.quantile(0.99), "mean_loss": self.mean_loss(),
+                "step_spikes": self.spikes}
+
+
+class MetricStats:
+    """Перцентили и выбросы одной метрики мониторинга"""
+
+    def __init__(self, name, compression):
+        self.name = name
+        self.digest = TDigest(compression)
+        self.history = RollingMedianMAD(STEP_HISTORY)
+        self.spikes = 0
+
+
+class LogAnalyzer:
+    """
+    Однопроходный анализатор записей (словарей) в постоянной памяти
+
+    Args:
+        window: длина окна, секунды
+        step_field / samples_field / loss_field: поля записей тренировки
+        metrics: дополнительные числовые поля (мониторинг)
+        threshold: робастный z-порог аномалий
+    """
+
+    def __init__(self, window=600, step_field="step_time", samples_field="samples", loss_field="loss",
+                 metrics=(), threshold=DEFAULT_THRESHOLD, compression=DEFAULT_COMPRESSION):
+        self.window = window
+        self.step_field = step_field
+        self.samples_field = samples_field
+        self.loss_field = loss_field
+        self.threshold = threshold
+        self.compression = compression
+        self.metrics = {name: MetricStats(name, compression) for name in metrics}
+        self.records = 0
+        self.skipped = 0
+        self.first_time = None
+        self.last_time = None
+        self.steps = 0
+        self.samples = 0
+        self.step_seconds = 0.0
+        self.non_finite_loss = 0
+        self.step_times = TDigest(compression)
+        self.step_history = RollingMedianMAD(STEP_HISTORY)
+        self.throughput_history = RollingMedianMAD(WINDOW_HISTORY, refresh=1)
+        self.loss_history = RollingMedianMAD(WINDOW_HISTORY, refresh=1)
+        self.loss_trend = RunningTrend()
+        self.first_loss = None
+        self.last_loss = None
+        self.window_stats = None
+        self.windows = 0
+        self.anomaly_counts = {}
+        self.events = deque(maxlen=MAX_EVENTS)
+        self.worst = {}
+        self.worst_scores = {}
+
+    def _flag(self, kind, timestamp, value, median, detail=""):
+        self.anomaly_counts[kind] = self.anomaly_counts.get(kind, 0) + 1
+        event = {"kind": kind, "time": timestamp, "value": value, "median": median, "detail": detail}
+        self.events.append(event)
+        # Самый сильный выброс каждого вида сохраняется, даже если вытеснен из events
+        ratio = value / median if median and math.isfinite(value) else math.inf
+        score = abs(math.log(ratio)) if 0 < ratio < math.inf else math.inf
+        if score > self.worst_scores.get(kind, -1.0):
+            self.worst_scores[kind] = score
+            self.worst[kind] = event
+
+    def add(self, record):
+        timestamp = parse_timestamp(record)
+        if timestamp is None:
+            self.skipped += 1
+            return
+        self.records += 1
+        if self.first_time is None:
+            self.first_time = timestamp
+        self.last_time = timestamp if self.last_time is None else max(self.last_time, timestamp)
+
+        window_start = timestamp - timestamp % self.window
+        if self.window_stats is None or window_start > self.window_stats.start:
+            self._close_window()
+            self.window_stats = WindowStats(window_start, self.compression)
+
+        step_time = _number(record.get(self.step_field))
+        loss = _number(record.get(self.loss_field))
+        if step_time is not None or loss is not None:
+            self._add_step(timestamp, record, step_time, loss)
+        for name, stats in self.metrics.items():
+            value = _number(record.get(name))
+            if value is None or not math.isfinite(value):
+                continue
+            stats.digest.add(value)
+            median = stats.history.check(value, self.threshold, 1)
+            if median is not None:
+                stats.spikes += 1
+                self._flag(f"{name}_spike", timestamp, value, median)
+            stats.history.add(value)
+
+    def _add_step(self, timestamp, record, step_time, loss):
+        samples = _number(record.get(self.samples_field))
+        self.steps += 1
+        if samples is not None:
+            self.samples += samples
+        if loss is not None:
+            if not math.isfinite(loss):
+                self.non_finite_loss += 1
+                self._flag("loss_non_finite", timestamp, loss, math.nan, f"step {record.get('step', '?')}")
+            else:
+                if self.first_loss is None:
+                    self.first_loss = loss
+                self.last_loss = loss
+        if step_time is not None:
+            self.step_times.add(step_time)
+            self.step_seconds += step_time
+            median = self.step_history.check(step_time, self.threshold, 1)
+            if median is not None:
+                self.window_stats.spikes += 1
+                self._flag("step_time_spike", timestamp, step_time, median, f"step {record.get('step', '?')}")
+            self.step_history.add(step_time)
+        self.window_stats.add_step(step_time, samples, loss)
+
+    def _close_window(self):
+        stats = self.window_stats
+        if stats is None or not stats.steps:
+            return
+        self.windows += 1
+        throughput = stats.throughput()
+        if throughput is not None:
+            median = self.throughput_history.check(throughput, self.threshold, -1)
+            if median is not None:
+                self._flag("throughput_drop", stats.start, throughput, median, "window")
+            self.throughput_history.add(throughput)
+        mean_loss = stats.mean_loss()
+        if mean_loss is not None:
+            median = self.loss_history.check(mean_loss, self.threshold, 1)
+            if median is not None:
+                self._flag("loss_spike", stats.start, mean_loss, median, "window mean")
+            self.loss_history.add(mean_loss)
+            self.loss_trend.add(stats.start, mean_loss)
+        self.on_window(stats.row())
+
+    def on_window(self, row):
+        """Строка окна по закрытии; переопределяется для потоковой выгрузки (--windows-csv)"""
+
+    def finish(self):
+        self._close_window()
+        self.window_stats = None
+        return self.summary()
+
+    def summary(self):
+        span = (self.last_time - self.first_time) if self.records else 0.0
+        result = {
+            "records": self.records,
+            "skipped": self.skipped,
+            "start": self.first_time,
+            "end": self.last_time,
+            "hours": span / 3600,
+            "windows": self.windows,
+            "window_seconds": self.window,
+            "anomalies": dict(sorted(self.anomaly_counts.items())),
+            "recent_events": list(self.events),
+            "worst_events": self.worst,
+        }
+        if self.steps:
+            result["training"] = {
+                "steps": self.steps,
+                "samples": self.samples,
+                "throughput": self.samples / self.step_seconds if self.step_seconds > 0 else None,
+                "p50_step": self.step_times.quantile(0.5),
+                "p90_step": self.step_times.quantile(0.9),
+                "p99_step": self.step_times.quantile(0.99),
+                "max_step": self.step_times.max if self.step_times.count else None,
+                "first_loss": self.first_loss,
+                "last_loss": self.last_loss,
+                "loss_slope_per_hour": self.loss_trend.slope(),
+                "non_finite_loss": self.non_finite_loss,
+            }
+        if self.metrics:
+            result["metrics"] = {name: {"count": stats.digest.count,
+                                        "p50": stats.digest.quantile(0.5), "p99": stats.digest.quantile(0.99),
+                                        "max": stats.digest.max if stats.digest.count else None,
+                                        "spikes": stats.spikes}
+                                 for name, stats in self.metrics.items()}
+        return result
+
+
+def _number(value):
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_timestamp(record):
+    for field in TIME_FIELDS:
+        value = record.get(field)
+        if value is None or value == "":
+            continue
+        number = _number(value)
+        if number is not None:
+            return number
+        try:
+            return datetime.fromisoformat(str(value)).timestamp()
+        except ValueError:
+            return None
+    return None
+
+
+def parse_duration(value):
+    """"10m", "1h", "30s" или число секунд"""
+    if value[-1] in TIME_UNITS:
+        return float(value[:-1]) * TIME_UNITS[value[-1]]
+    return float(value)
+
+
+def _open_text(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, encoding="utf-8", errors="replace", newline="")
+
+
+def iter_records(path):
+    """Записи файла по одной: JSONL (битые строки пропускаются) или CSV по заголовку"""
+    with _open_text(path) as f:
+        if path.endswith((".csv", ".csv.gz")):
+            yield from csv.DictReader(f)
+            return
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict):
+                yield record
+
+
+def _fmt(value, spec=".3f", suffix=""):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "n/a"
+    return f"{value:{spec}}{suffix}"
+
+
+def _ms(seconds):
+    return _fmt(seconds * 1000 if seconds is not None else None, ".1f", " ms")
+
+
+def _fmt_time(timestamp):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp)) if timestamp is not None else "n/a"
+
+
+def summary_lines(summary, markdown=False):
+    """Строки сводки; markdown=True — для GITHUB_STEP_SUMMARY и артефактов"""
+    bullet = "- " if markdown else "   "
+    lines = [("## " if markdown else "📊 ") + "Log analysis",
+             f"{bullet}{summary['records']} records, {_fmt_time(summary['start'])} → {_fmt_time(summary['end'])} "
+             f"({summary['hours']:.1f}h, {summary['windows']} window(s) of {summary['window_seconds']:g}s)"]
+    training = summary.get("training")
+    if training:
+        lines += [
+            f"{bullet}Steps: {training['steps']}, samples: {training['samples']:.0f}, "
+            f"throughput: {_fmt(training['throughput'], '.1f', ' samples/s')}",
+            f"{bullet}Step time p50 {_ms(training['p50_step'])}, p90 {_ms(training['p90_step'])}, "
+            f"p99 {_ms(training['p99_step'])}, max {_ms(training['max_step'])}",
+            f"{bullet}Loss {_fmt(training['first_loss'], '.4f')} → {_fmt(training['last_loss'], '.4f')}, "
+            f"trend {_fmt(training['loss_slope_per_hour'], '+.4f', '/h')}",
+        ]
+    for name, stats in summary.get("metrics", {}).items():
+        lines.append(f"{bullet}{name}: p50 {_fmt(stats['p50'], '.2f')}, p99 {_fmt(stats['p99'], '.2f')}, "
+                     f"max {_fmt(stats['max'], '.2f')}, spikes {stats['spikes']}")
+    if summary["anomalies"]:
+        lines.append(("### " if markdown else "⚠️  ") + "Anomalies: " +
+                     ", ".join(f"{kind} ×{count}" for kind, count in summary["anomalies"].items()))
+        for kind, event in summary["worst_events"].items():
+            lines.append(f"{bullet}worst {kind}: {_fmt_time(event['time'])} value {_fmt(event['value'], '.4g')} "
+                         f"vs median {_fmt(event['median'], '.4g')} {event['detail']}".rstrip())
+    else:
+        lines.append(("### " if markdown else "✅ ") + "No anomalies")
+    if summary["skipped"]:
+        lines.append(f"{bullet}{summary['skipped']} record(s) without timestamp skipped")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming constant-memory log and metrics analyzer")
+    parser.add_argument("paths", nargs="+", help="JSONL/CSV файлы (.gz допускается), читаются по порядку")
+    parser.add_argument("--window", default=DEFAULT_WINDOW, help="Окно агрегации: 30s, 10m, 1h (по умолчанию: 10m)")
+    parser.add_argument("--metric", action="append", default=[], help="Числовое поле мониторинга (можно повторять)")
+    parser.add_argument("--step-field", default="step_time", help="Поле времени шага, секунды")
+    parser.add_argument("--samples-field", default="samples", help="Поле числа примеров шага")
+    parser.add_argument("--loss-field", default="loss", help="Поле loss")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Робастный z-порог аномалий")
+    parser.add_argument("--windows-csv", default=None, help="Выгрузить строки окон в CSV (потоково)")
+    parser.add_argument("--json-out", default=None, help="Сохранить сводку в JSON")
+    parser.add_argument("--markdown-out", default=None, help="Сохранить сводку в Markdown")
+    args = parser.parse_args()
+
+    analyzer = LogAnalyzer(parse_duration(args.window), args.step_field, args.samples_field, args.loss_field,
+                           args.metric, args.threshold)
+    windows_file = None
+    if args.windows_csv:
+        windows_file = open(args.windows_csv, "w", newline="", encoding="utf-8")
+        windows_writer = csv.DictWriter(windows_file, fieldnames=list(WindowStats(0, 1).row()))
+        windows_writer.writeheader()
+        analyzer.on_window = windows_writer.writerow
+
+    started = time.perf_counter()
+    for path in args.paths:
+        if not os.path.exists(path):
+            print(f"❌ File not found: {path}")
+            return 1
+        for record in iter_records(path):
+            analyzer.add(record)
+    summary = analyzer.finish()
+    if windows_file is not None:
+        windows_file.close()
+
+    print("\n".join(summary_lines(summary)))
+    print(f"⏱️  Analyzed in {time.perf_counter() - started:.1f}s")
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, default=str)
+    if args.markdown_out:
+        with open(args.markdown_out, "w", encoding="utf-8") as f:
+            f.write("\n".join(summary_lines(summary, markdown=True)) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
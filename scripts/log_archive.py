@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Log Archive
+Архив логов с переходом по времени для многодневных прогонов. Записи
+копятся в блок и сбрасываются, когда блок набрал BLOCK_BYTES или прожил
+BLOCK_SECONDS: каждый блок сжат zlib независимо от остальных, а в индекс
+(по строке на блок) пишутся его min/max времени и смещение. Запрос окна
+"часы 51–52" читает из индекса смещения и распаковывает только блоки,
+пересекающие окно, не трогая остальной файл.
+
+Структура архива:
+    <root>/blocks.dat   — сжатые блоки подряд (только дозапись)
+    <root>/index.jsonl  — запись индекса на каждый блок
+
+Использование:
+    python scripts/log_archive.py info logs/train_archive
+    python scripts/log_archive.py query logs/train_archive --start 51h --end 52h
+    python scripts/log_archive.py query logs/train_archive --last 30m --grep "loss|error" -i
+    python scripts/log_archive.py build train.log logs/train_archive
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import struct
+import sys
+import time
+import zlib
+from array import array
+from datetime import datetime
+
+DATA_FILE = "blocks.dat"
+INDEX_FILE = "index.jsonl"
+BLOCK_BYTES = 256 * 1024
+BLOCK_SECONDS = 60.0
+DEFAULT_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+COMPRESSION_LEVEL = 6
+BLOCK_HEADER = struct.Struct("<2sI")
+BLOCK_MAGIC = b"LB"
+# Начало записи в логах с форматом "%(asctime)s - ..." (для build)
+ASCTIME_RE = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),(\d{3}) ")
+TIME_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def encode_block(records):
+    """[(время, текст)] -> заголовок + zlib(времена float64, длины uint32, текст)"""
+    times = array("d", (timestamp for timestamp, _ in records))
+    texts = [text.encode("utf-8") for _, text in records]
+    lengths = array("I", (len(text) for text in texts))
+    body = zlib.compress(times.tobytes() + lengths.tobytes() + b"".join(texts), COMPRESSION_LEVEL)
+    return BLOCK_HEADER.pack(BLOCK_MAGIC, len(records)) + body
+
+
+def decode_block(data):
+    magic, count = BLOCK_HEADER.unpack_from(data)
+    if magic != BLOCK_MAGIC:
+        raise ValueError("Corrupt log block")
+    raw = zlib.decompress(data[BLOCK_HEADER.size:])
+    times, lengths = array("d"), array("I")
+    times.frombytes(raw[:8 * count])
+    lengths.frombytes(raw[8 * count:12 * count])
+    records, position = [], 12 * count
+    for timestamp, length in zip(times, lengths):
+        records.append((timestamp, raw[position:position + length].decode("utf-8", errors="replace")))
+        position += length
+    return records
+
+
+class LogArchive:
+    """Каталог архива: дозапись блоков и чтение окна по времени"""
+
+    def __init__(self, root):
+        self.root = str(root)
+        os.makedirs(self.root, exist_ok=True)
+        self.data_path = os.path.join(self.root, DATA_FILE)
+        self.index_path = os.path.join(self.root, INDEX_FILE)
+
+    def append_block(self, records):
+        """Сжимает и дописывает блок, затем запись индекса (после данных)"""
+        payload = encode_block(records)
+        with open(self.data_path, "ab") as f:
+            offset = f.tell()
+            f.write(payload)
+        entry = {"t_min": min(t for t, _ in records), "t_max": max(t for t, _ in records),
+                 "records": len(records), "offset": offset, "length": len(payload),
+                 "raw_bytes": sum(len(text) + 1 for _, text in records)}
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        return entry
+
+    def index(self):
+        """Записи индекса; незаконченная последняя строка (обрыв записи) пропускается"""
+        if not os.path.exists(self.index_path):
+            return []
+        entries = []
+        with open(self.index_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+        return entries
+
+    def blocks(self, start=None, end=None, entries=None):
+        """Блоки, пересекающие [start, end]"""
+        entries = self.index() if entries is None else entries
+        return [entry for entry in entries
+                if (start is None or entry["t_max"] >= start) and (end is None or entry["t_min"] <= end)]
+
+    def query(self, start=None, end=None, pattern=None, entries=None):
+        """
+        Записи за [start, end] (по возрастанию времени), опционально по регулярному выражению
+
+        Yields:
+            (время, текст записи)
+        """
+        selected = self.blocks(start, end, entries)
+        if not selected:
+            return
+        with open(self.data_path, "rb") as f:
+            for entry in selected:
+                f.seek(entry["offset"])
+                records = decode_block(f.read(entry["length"]))
+                records.sort(key=lambda record: record[0])
+                for timestamp, text in records:
+                    if start is not None and timestamp < start or end is not None and timestamp > end:
+                        continue
+                    if pattern is None or pattern.search(text):
+                        yield timestamp, text
+
+
+class LogArchiveHandler(logging.Handler):
+    """
+    Обработчик logging, пишущий записи в LogArchive блоками
+
+    Рассчитан на поток QueueListener (log_setup): force_flush на простое
+    очереди закрывает блок, только если он старше block_seconds, поэтому
+    мелких блоков не образуется.
+
+    Args:
+        root: каталог архива
+        block_bytes: размер несжатого блока
+        block_seconds: максимальный возраст незакрытого блока
+    """
+
+    def __init__(self, root, fmt=None, level=logging.NOTSET, block_bytes=BLOCK_BYTES, block_seconds=BLOCK_SECONDS):
+        super().__init__(level)
+        self.archive = LogArchive(root)
+        self.block_bytes = block_bytes
+        self.block_seconds = block_seconds
+        self.records = []
+        self.pending_bytes = 0
+        self.opened = None
+        if fmt:
+            self.setFormatter(logging.Formatter(fmt))
+
+    def emit(self, record):
+        try:
+            text = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        if self.opened is None:
+            self.opened = time.monotonic()
+        self.records.append((record.created, text))
+        self.pending_bytes += len(text) + 1
+        if self.pending_bytes >= self.block_bytes:
+            self.seal()
+
+    def force_flush(self):
+        if self.opened is not None and time.monotonic() - self.opened >= self.block_seconds:
+            self.seal()
+
+    def seal(self):
+        if not self.records:
+            return
+        self.acquire()
+        try:
+            records, self.records, self.pending_bytes, self.opened = self.records, [], 0, None
+            self.archive.append_block(records)
+        finally:
+            self.release()
+
+    def close(self):
+        self.seal()
+        super().close()
+
+
+def archive_handler(root, fmt=DEFAULT_FORMAT, level=logging.NOTSET):
+    """LogArchiveHandler для списка обработчиков start_queue_logging"""
+    return LogArchiveHandler(root, fmt, level)
+
+
+def build_from_log(log_path, archive, block_bytes=BLOCK_BYTES):
+    """
+    Архивирует обычный лог с asctime в начале записи
+
+    Строки без метки времени (трейсбеки) присоединяются к предыдущей записи.
+    """
+    records, pending, blocks = [], 0, 0
+    current_time, current_lines = None, []
+
+    def finish_record():
+        nonlocal pending
+        if current_lines:
+            text = "".join(current_lines).rstrip("\n")
+            records.append((current_time, text))
+            pending += len(text) + 1
+
+    with open(log_path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            match = ASCTIME_RE.match(line)
+            if match or current_time is None:
+                finish_record()
+                if pending >= block_bytes:
+                    archive.append_block(records)
+                    records, pending, blocks = [], 0, blocks + 1
+                current_lines = [line]
+                if match:
+                    current_time = time.mktime(time.strptime(match.group(1), "%Y-%m-%d %H:%M:%S")) + \
+                        int(match.group(2)) / 1000
+                else:
+                    current_time = os.path.getmtime(log_path)
+            else:
+                current_lines.append(line)
+    finish_record()
+    if records:
+        archive.append_block(records)
+        blocks += 1
+    return blocks
+
+
+def parse_time(value, origin, end):
+    """
+    Граница окна: "51h" — от начала архива, "-30m" — от конца,
+    "2025-01-31 12:00[:SS]" — локальное время, число — unix-время
+    """
+    if value[-1] in TIME_UNITS:
+        offset = float(value[:-1]) * TIME_UNITS[value[-1]]
+        return end + offset if value.startswith("-") else origin + offset
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def format_time(timestamp):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+
+
+def cmd_info(args):
+    archive = LogArchive(args.root)
+    entries = archive.index()
+    if not entries:
+        print(f"❌ Empty archive: {args.root}")
+        return 1
+    stored = sum(e["length"] for e in entries)
+    raw = sum(e["raw_bytes"] for e in entries)
+    origin, end = min(e["t_min"] for e in entries), max(e["t_max"] for e in entries)
+    print(f"📊 {len(entries)} block(s), {sum(e['records'] for e in entries)} records, "
+          f"{format_time(origin)} → {format_time(end)} ({(end - origin) / 3600:.1f}h)")
+    print(f"💾 {stored / 1024**2:.1f} MB stored, {raw / 1024**2:.1f} MB raw ({raw / max(stored, 1):.1f}x)")
+    return 0
+
+
+def cmd_query(args):
+    archive = LogArchive(args.root)
+    entries = archive.index()
+    if not entries:
+        print(f"❌ Empty archive: {args.root}")
+        return 1
+    origin, last = min(e["t_min"] for e in entries), max(e["t_max"] for e in entries)
+    start = parse_time(args.start, origin, last) if args.start else None
+    end = parse_time(args.end, origin, last) if args.end else None
+    if args.last:
+        start = parse_time("-" + args.last.lstrip("-"), origin, last)
+    pattern = re.compile(args.grep, re.IGNORECASE if args.ignore_case else 0) if args.grep else None
+
+    started = time.perf_counter()
+    matched = 0
+    for _, text in archive.query(start, end, pattern, entries):
+        matched += 1
+        if not args.count:
+            print(text)
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"🔎 {matched} record(s) in {elapsed:.1f} ms "
+          f"({len(archive.blocks(start, end, entries))} of {len(entries)} block(s) read)", file=sys.stderr)
+    return 0
+
+
+def cmd_build(args):
+    archive = LogArchive(args.root)
+    started = time.perf_counter()
+    blocks = build_from_log(args.log, archive, args.block_kb * 1024)
+    print(f"✅ {args.log} → {args.root}: {blocks} block(s) in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time-indexed compressed log archive")
+    subparsers = parser.add_subparsers(dest="command")
+
+    info_parser = subparsers.add_parser("info", help="Диапазон времени, блоки и степень сжатия")
+    info_parser.add_argument("root", help="Каталог архива")
+
+    query_parser = subparsers.add_parser("query", help="Записи за окно времени")
+    query_parser.add_argument("root", help="Каталог архива")
+    query_parser.add_argument("--start", default=None, help="Начало: 51h от начала, -30m от конца, дата или unix-время")
+    query_parser.add_argument("--end", default=None, help="Конец окна (те же форматы)")
+    query_parser.add_argument("--last", default=None, help="Последние N: 30m, 2h")
+    query_parser.add_argument("--grep", default=None, help="Регулярное выражение по тексту записи")
+    query_parser.add_argument("-i", "--ignore-case", action="store_true", help="grep без учёта регистра")
+    query_parser.add_argument("--count", action="store_true", help="Только число записей")
+
+    build_parser = subparsers.add_parser("build", help="Архивировать существующий лог")
+    build_parser.add_argument("log", help="Файл лога (формат asctime - ...)")
+    build_parser.add_argument("root", help="Каталог архива")
+    build_parser.add_argument("--block-kb", type=int, default=BLOCK_BYTES // 1024, help="Размер блока, КБ")
+
+    args = parser.parse_args()
+    if args.command == "info":
+        return cmd_info(args)
+    if args.command == "query":
+        return cmd_query(args)
+    if args.command == "build":
+        return cmd_build(args)
+    parser.print_help()
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Log Setup
+Неблокирующее логирование для мониторинга и тренировки: вызовы logging
+кладут запись в очередь (QueueHandler), а запись на диск и в консоль идёт в
+фоновом потоке QueueListener. Файлы пишутся пачками (сброс буфера не чаще
+раза в FLUSH_INTERVAL секунд и при простое очереди), ротируются по размеру
+или времени, а ротированные сегменты сжимаются gzip (или zstd, если
+установлен zstandard) в отдельном потоке.
+
+Использование:
+    from log_setup import console_handler, file_handler, start_queue_logging
+    start_queue_logging([file_handler("logs/train.log"), console_handler()])
+"""
+
+import atexit
+import gzip
+import io
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 10
+FLUSH_INTERVAL = 1.0
+FILE_BUFFER_SIZE = 64 * 1024
+COMPRESSIONS = ("gzip", "zstd", None)
+
+_listener = None
+
+
+class SegmentCompressor:
+    """Сжатие ротированных сегментов в фоновом потоке"""
+
+    def __init__(self, method="gzip"):
+        if method == "zstd":
+            try:
+                import zstandard
+            except ImportError:
+                method = "gzip"
+            else:
+                self.zstd = zstandard
+        self.method = method
+        self.suffix = ".zst" if method == "zstd" else ".gz"
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="log-compress")
+        self.pending = None
+
+    def namer(self, default_name):
+        return default_name + self.suffix
+
+    def wait(self):
+        """Дождаться сжатия предыдущего сегмента"""
+        if self.pending is not None:
+            self.pending.result()
+
+    def rotator(self, source, dest):
+        """Переименование сразу, сжатие — в фоне"""
+        # Основное ожидание — в doRollover до сдвига сегментов; здесь — страховка
+        self.wait()
+        plain = dest[:-len(self.suffix)] + ".rotating"
+        os.replace(source, plain)
+        self.pending = self.executor.submit(self._compress, plain, dest)
+
+    def _compress(self, plain, dest):
+        tmp = f"{dest}.tmp.{os.getpid()}"
+        with open(plain, "rb") as src:
+            if self.method == "zstd":
+                with open(tmp, "wb") as dst:
+                    self.zstd.ZstdCompressor().copy_stream(src, dst)
+            else:
+                with gzip.open(tmp, "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+        os.replace(tmp, dest)
+        os.remove(plain)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+class _BatchedFlushMixin:
+    """Буфер файла сбрасывается не на каждую запись, а по времени"""
+
+    def _open(self):
+        return open(self.baseFilename, self.mode, buffering=FILE_BUFFER_SIZE, encoding=self.encoding)
+
+    def flush(self):
+        if time.monotonic() - getattr(self, "_last_flush", 0.0) >= FLUSH_INTERVAL:
+            self.force_flush()
+
+    def force_flush(self):
+        self._last_flush = time.monotonic()
+        super().flush()
+
+    def doRollover(self):
+        # Сдвиг .N.gz -> .N+1.gz идёт до вызова rotator: если прошлый сегмент ещё
+        # сжимается, его .1.gz пропустился бы при сдвиге и затем был бы перезаписан
+        if getattr(self, "compressor", None):
+            self.compressor.wait()
+        super().doRollover()
+
+    def close(self):
+        self.force_flush()
+        super().close()
+        if getattr(self, "compressor", None):
+            self.compressor.close()
+
+
+class BatchedRotatingFileHandler(_BatchedFlushMixin, logging.handlers.RotatingFileHandler):
+    pass
+
+
+class BatchedTimedRotatingFileHandler(_BatchedFlushMixin, logging.handlers.TimedRotatingFileHandler):
+    pass
+
+
+def file_handler(path, fmt=DEFAULT_FORMAT, max_bytes=DEFAULT_MAX_BYTES, when=None,
+                 backup_count=DEFAULT_BACKUP_COUNT, compress="gzip", level=logging.NOTSET):
+    """
+    Файловый обработчик с пакетной записью, ротацией и сжатием сегментов
+
+    Args:
+        max_bytes: ротация по размеру (если when не задан)
+        when: ротация по времени ("H", "midnight", ... как в TimedRotatingFileHandler)
+        compress: "gzip", "zstd" или None
+    """
+    if compress not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression: {compress}")
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    if when:
+        handler = BatchedTimedRotatingFileHandler(path, when=when, backupCount=backup_count, encoding="utf-8")
+    else:
+        handler = BatchedRotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+    handler.compressor = SegmentCompressor(compress) if compress else None
+    if handler.compressor:
+        handler.namer = handler.compressor.namer
+        handler.rotator = handler.compressor.rotator
+    handler.setFormatter(logging.Formatter(fmt))
+    handler.setLevel(level)
+    return handler
+
+
+def console_handler(fmt=DEFAULT_FORMAT, level=logging.NOTSET):
+    """Вывод в исходный stdout процесса (работает и при перенаправлении sys.stdout)"""
+    handler = logging.StreamHandler(sys.__stdout__)
+    handler.setFormatter(logging.Formatter(fmt))
+    handler.setLevel(level)
+    return handler
+
+
+class _IdleFlushListener(logging.handlers.QueueListener):
+    """QueueListener, сбрасывающий файлы, когда очередь простаивает"""
+
+    def dequeue(self, block):
+        while True:
+            try:
+                return self.queue.get(block=block, timeout=FLUSH_INTERVAL if block else None)
+            except queue.Empty:
+                if not block:
+                    raise
+                for handler in self.handlers:
+                    if hasattr(handler, "force_flush"):
+                        handler.force_flush()
+
+
+def start_queue_logging(handlers, logger=None, level=logging.INFO):
+    """
+    Ставит QueueHandler на logger (по умолчанию корневой) и запускает слушатель
+
+    Обработчики вызываются только из потока слушателя. Повторный вызов
+    сначала останавливает прежний слушатель. Остановка — stop_queue_logging
+    (регистрируется в atexit).
+    """
+    global _listener
+    stop_queue_logging()
+    log_queue = queue.SimpleQueue()
+    target = logger or logging.getLogger()
+    for handler in list(target.handlers):
+        target.removeHandler(handler)
+    target.addHandler(logging.handlers.QueueHandler(log_queue))
+    target.setLevel(level)
+    _listener = _IdleFlushListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.target = target
+    _listener.start()
+    return _listener
+
+
+def stop_queue_logging():
+    """Дописывает очередь, закрывает файлы и дожидается сжатия сегментов"""
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+    for handler in list(listener.target.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            listener.target.removeHandler(handler)
+
+
+atexit.register(stop_queue_logging)
+
+
+class StreamToLogger(io.TextIOBase):
+    """Поток, превращающий строки print() в записи лога (вместо Tee-Object)"""
+
+    def __init__(self, logger, level=logging.INFO):
+        self.logger = logger
+        self.level = level
+        self.buffer_text = ""
+        self.lock = threading.Lock()
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        with self.lock:
+            self.buffer_text += text
+            *lines, self.buffer_text = self.buffer_text.split("\n")
+        for line in lines:
+            if line.strip():
+                self.logger.log(self.level, line.rstrip())
+        return len(text)
+
+    def flush(self):
+        with self.lock:
+            line, self.buffer_text = self.buffer_text, ""
+        if line.strip():
+            self.logger.log(self.level, line.rstrip())
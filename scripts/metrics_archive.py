@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Metrics Archive
+Колоночный архив метрик мониторинга и тренировки. Отсчёты копятся в памяти
+и сбрасываются чанками: метки времени (мс) кодируются delta-of-delta,
+значения float64 — XOR с предыдущим значением (как в Gorilla) и
+перестановкой байтов, затем всё сжимается zlib. Индекс чанков (серия,
+min/max времени, смещение) лежит отдельным файлом, поэтому запрос по
+диапазону читает только нужные чанки.
+
+Структура архива:
+    <root>/chunks.dat   — чанки подряд (только дозапись)
+    <root>/index.jsonl  — запись индекса на каждый чанк
+
+Использование:
+    python scripts/metrics_archive.py info logs/metrics_archive
+    python scripts/metrics_archive.py query logs/metrics_archive --series resources --since 6h --columns cpu_percent
+"""
+
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+
+import numpy as np
+
+DATA_FILE = "chunks.dat"
+INDEX_FILE = "index.jsonl"
+DEFAULT_CHUNK_ROWS = 4096
+COMPRESSION_LEVEL = 6
+CHUNK_HEADER = struct.Struct("<2sIH")
+CHUNK_MAGIC = b"MC"
+BLOCK_LENGTH = struct.Struct("<I")
+
+
+def encode_timestamps(timestamps):
+    """Секунды -> мс, delta-of-delta, перестановка байтов, zlib"""
+    ms = np.round(np.asarray(timestamps, dtype=np.float64) * 1000).astype(np.int64)
+    # Первое значение и первая разность остаются как есть, дальше — вторые разности
+    encoded = np.diff(ms, n=1, prepend=0)
+    encoded[2:] = np.diff(encoded[1:])
+    return zlib.compress(_shuffle(encoded.view(np.uint64)), COMPRESSION_LEVEL)
+
+
+def decode_timestamps(data, count):
+    encoded = _unshuffle(zlib.decompress(data), count).view(np.int64)
+    deltas = encoded.copy()
+    deltas[1:] = np.cumsum(encoded[1:])
+    return np.cumsum(deltas) / 1000.0
+
+
+def encode_floats(values):
+    """XOR с предыдущим значением: у медленно меняющихся рядов почти одни нули"""
+    bits = np.asarray(values, dtype=np.float64).view(np.uint64)
+    xored = bits ^ np.concatenate(([np.uint64(0)], bits[:-1]))
+    return zlib.compress(_shuffle(xored), COMPRESSION_LEVEL)
+
+
+def decode_floats(data, count):
+    xored = _unshuffle(zlib.decompress(data), count)
+    # Префиксный XOR: np.bitwise_xor.accumulate восстанавливает исходные биты
+    return np.bitwise_xor.accumulate(xored).view(np.float64)
+
+
+def _shuffle(words):
+    """Байт i всех слов подряд: старшие байты (обычно одинаковые) идут блоком"""
+    return np.ascontiguousarray(words.view(np.uint8).reshape(-1, 8).T).tobytes()
+
+
+def _unshuffle(data, count):
+    return np.ascontiguousarray(np.frombuffer(data, dtype=np.uint8).reshape(8, count).T).view(np.uint64).ravel()
+
+
+class ChunkWriter:
+    """
+    Буфер одной серии; при заполнении чанк дописывается в архив
+
+    Args:
+        archive: MetricsArchive
+        series: имя серии ("resources", "training")
+        columns: имена колонок значений
+        chunk_rows: строк в чанке
+    """
+
+    def __init__(self, archive, series, columns, chunk_rows=DEFAULT_CHUNK_ROWS):
+        self.archive = archive
+        self.series = series
+        self.columns = list(columns)
+        self.chunk_rows = chunk_rows
+        self.timestamps = []
+        self.rows = []
+
+    def append(self, timestamp, values):
+        """Отсчёт: список по columns или словарь (недостающие — NaN)"""
+        if isinstance(values, dict):
+            values = [values.get(name, np.nan) for name in self.columns]
+        self.timestamps.append(timestamp)
+        self.rows.append([np.nan if value is None else value for value in values])
+        if len(self.rows) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        self.archive.write_chunk(self.series, self.columns, self.timestamps,
+                                 np.asarray(self.rows, dtype=np.float64))
+        self.timestamps, self.rows = [], []
+
+    def close(self):
+        self.flush()
+
+
+class MetricsArchive:
+    """Каталог архива: дозапись чанков и запросы по диапазону времени"""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.data_path = os.path.join(root, DATA_FILE)
+        self.index_path = os.path.join(root, INDEX_FILE)
+
+    def writer(self, series, columns, chunk_rows=DEFAULT_CHUNK_ROWS):
+        return ChunkWriter(self, series, columns, chunk_rows)
+
+    def write_chunk(self, series, columns, timestamps, values):
+        """Кодирует и дописывает чанк, затем запись индекса (после данных)"""
+        blocks = [encode_timestamps(timestamps)] + [encode_floats(values[:, i]) for i in range(len(columns))]
+        payload = CHUNK_HEADER.pack(CHUNK_MAGIC, len(timestamps), len(columns)) + \
+            b"".join(BLOCK_LENGTH.pack(len(block)) + block for block in blocks)
+        with open(self.data_path, "ab") as f:
+            offset = f.tell()
+            f.write(payload)
+        entry = {"series": series, "t_min": float(min(timestamps)), "t_max": float(max(timestamps)),
+                 "rows": len(timestamps), "columns": list(columns), "offset": offset, "length": len(payload),
+                 "raw_bytes": 8 * len(timestamps) * (len(columns) + 1)}
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        return entry
+
+    def index(self):
+        """Записи индекса; незаконченная последняя строка (обрыв записи) пропускается"""
+        if not os.path.exists(self.index_path):
+            return []
+        entries = []
+        with open(self.index_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+        return entries
+
+    def series(self):
+        return sorted({entry["series"] for entry in self.index()})
+
+    def chunks(self, series, start=None, end=None):
+        """Чанки серии, пересекающие [start, end]"""
+        return [entry for entry in self.index() if entry["series"] == series
+                and (start is None or entry["t_max"] >= start) and (end is None or entry["t_min"] <= end)]
+
+    def read_chunk(self, f, entry, columns=None):
+        f.seek(entry["offset"])
+        data = f.read(entry["length"])
+        magic, count, num_columns = CHUNK_HEADER.unpack_from(data)
+        if magic != CHUNK_MAGIC:
+            raise ValueError(f"Corrupt chunk at offset {entry['offset']}")
+        position = CHUNK_HEADER.size
+        blocks = []
+        for _ in range(num_columns + 1):
+            (length,) = BLOCK_LENGTH.unpack_from(data, position)
+            position += BLOCK_LENGTH.size
+            blocks.append(data[position:position + length])
+            position += length
+        result = {"timestamp": decode_timestamps(blocks[0], count)}
+        for name, block in zip(entry["columns"], blocks[1:]):
+            if columns is None or name in columns:
+                result[name] = decode_floats(block, count)
+        return result
+
+    def query(self, series, start=None, end=None, columns=None):
+        """
+        Отсчёты серии за [start, end], только из пересекающихся чанков
+
+        Returns:
+            словарь колонка -> np.ndarray (включая "timestamp"), по времени
+        """
+        entries = self.chunks(series, start, end)
+        parts = []
+        if entries:
+            with open(self.data_path, "rb") as f:
+                parts = [self.read_chunk(f, entry, columns) for entry in entries]
+        names = ["timestamp"] + [name for name in dict.fromkeys(n for p in parts for n in p) if name != "timestamp"]
+        result = {}
+        for name in names:
+            # Колонки, которых нет в части чанков, дополняются NaN
+            result[name] = np.concatenate([p.get(name, np.full(len(p["timestamp"]), np.nan)) for p in parts]) \
+                if parts else np.empty(0)
+        if parts:
+            order = np.argsort(result["timestamp"], kind="stable")
+            mask = np.ones(len(order), dtype=bool)
+            timestamps = result["timestamp"][order]
+            if start is not None:
+                mask &= timestamps >= start
+            if end is not None:
+                mask &= timestamps <= end
+            result = {name: values[order][mask] for name, values in result.items()}
+        return result
+
+
+def parse_since(value):
+    """"6h", "30m", "2d" -> метка времени начала"""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    return time.time() - float(value[:-1]) * units[value[-1]] if value[-1] in units else float(value)
+
+
+def cmd_info(args):
+    archive = MetricsArchive(args.root)
+    for series in archive.series():
+        entries = archive.chunks(series)
+        rows = sum(e["rows"] for e in entries)
+        stored = sum(e["length"] for e in entries)
+        raw = sum(e["raw_bytes"] for e in entries)
+        span = (max(e["t_max"] for e in entries) - min(e["t_min"] for e in entries)) / 3600
+        print(f"📊 {series}: {len(entries)} chunk(s), {rows} rows over {span:.1f}h, "
+              f"{stored / 1024:.1f} KB ({raw / max(stored, 1):.1f}x vs raw float64)")
+
+
+def cmd_query(args):
+    archive = MetricsArchive(args.root)
+    start = parse_since(args.since) if args.since else None
+    columns = args.columns.split(",") if args.columns else None
+    started = time.perf_counter()
+    result = archive.query(args.series, start, None, columns)
+    elapsed = (time.perf_counter() - started) * 1000
+    if args.csv:
+        names = list(result)
+        with open(args.csv, "w", encoding="utf-8") as f:
+            f.write(",".join(names) + "\n")
+            for row in zip(*(result[name] for name in names)):
+                f.write(",".join(f"{value:.6g}" for value in row) + "\n")
+    print(f"🔎 {len(result['timestamp'])} rows in {elapsed:.1f} ms "
+          f"({len(archive.chunks(args.series, start))} chunk(s) read)")
+    for name, values in result.items():
+        if name == "timestamp" or not len(values):
+            continue
+        print(f"   {name}: min {np.nanmin(values):.3f}, mean {np.nanmean(values):.3f}, max {np.nanmax(values):.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compressed columnar metrics archive")
+    subparsers = parser.add_subparsers(dest="command")
+
+    info_parser = subparsers.add_parser("info", help="Серии, чанки и степень сжатия")
+    info_parser.add_argument("root", help="Каталог архива")
+
+    query_parser = subparsers.add_parser("query", help="Отсчёты серии за диапазон")
+    query_parser.add_argument("root", help="Каталог архива")
+    query_parser.add_argument("--series", required=True, help="Имя серии (resources, training)")
+    query_parser.add_argument("--since", default=None, help="Начало диапазона: 30m, 6h, 2d или unix-время")
+    query_parser.add_argument("--columns", default=None, help="Колонки через запятую")
+    query_parser.add_argument("--csv", default=None, help="Сохранить результат в CSV")
+
+    args = parser.parse_args()
+    if args.command == "info":
+        cmd_info(args)
+    elif args.command == "query":
+        cmd_query(args)
+    else:
+        parser.print_help()
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,540 @@
+#!/usr/bin/env python3
+"""
+Metrics Collector
+Сбор метрик с нескольких self-hosted раннеров. Агент (run_monitoring.py
+--agent-collector) копит отсчёты в ограниченном буфере и раз в несколько
+секунд отправляет их пачкой: JSON, сжатый zlib, в кадре с длиной. По TCP
+агент переподключается с экспоненциальной задержкой, по UDP — шлёт без
+подтверждений. Переполнение буфера отбрасывает самые старые отсчёты.
+
+Коллектор (asyncio) принимает кадры от многих агентов в очередь
+ограниченного размера. Когда разбор не успевает, TCP-соединения перестают
+читаться (агенты упираются в окно TCP и копят у себя), а UDP-кадры
+отбрасываются. Отсчёты ложатся в общий TimeSeriesStore по серии
+"<хост>/<серия>" и в сжатый архив metrics_archive; память ограничена
+числом серий и размером очереди.
+
+Структура каталога коллектора:
+    <root>/<хост>__<серия>.npz  — TimeSeriesStore серии (timeseries_store.py)
+    <root>/archive/             — все отсчёты (metrics_archive.py query --series <хост>/<серия>)
+
+Использование:
+    python scripts/metrics_collector.py serve --root logs/collector --port 9177 --udp-port 9177
+    python scripts/run_monitoring.py --agent-collector collector-host:9177
+    python scripts/metrics_collector.py bench 127.0.0.1:9177 --agents 32 --rate 100 --seconds 30
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import logging
+import os
+import random
+import re
+import socket
+import struct
+import sys
+import threading
+import time
+import zlib
+from pathlib import Path
+
+DEFAULT_PORT = 9177
+FRAME_HEADER = struct.Struct("<2sI")
+FRAME_MAGIC = b"MB"
+MAX_FRAME_BYTES = 4 * 1024 * 1024
+# Предел распакованного кадра: защита от «zip-бомбы» в чужом кадре
+MAX_DECODED_BYTES = 32 * 1024 * 1024
+# Меньше датаграммы — меньше IP-фрагментов, потеря любого из которых теряет весь кадр
+MAX_DATAGRAM_BYTES = 8192
+UDP_RECEIVE_BUFFER = 8 * 1024 * 1024
+COMPRESSION_LEVEL = 6
+DEFAULT_BATCH_ROWS = 500
+DEFAULT_FLUSH_INTERVAL = 5.0
+DEFAULT_MAX_BUFFERED = 50000
+CONNECT_TIMEOUT = 5.0
+SEND_TIMEOUT = 10.0
+MIN_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+DEFAULT_QUEUE_FRAMES = 256
+DEFAULT_MAX_SERIES = 1024
+ARCHIVE_DIR = "archive"
+ARCHIVE_CHUNK_ROWS = 1024
+SAVE_INTERVAL = 300
+STATS_INTERVAL = 60
+DRAIN_TIMEOUT = 30
+# Хост и серия от агента идут в имена файлов: всё прочее заменяется на "_"
+UNSAFE_NAME_CHARS = re.compile(r"[^A-Za-z0-9_.-]")
+
+logger = logging.getLogger(__name__)
+
+
+def parse_address(value, default_port=DEFAULT_PORT):
+    """"host:port" или "host" -> (host, port)"""
+    host, _, port = value.rpartition(":") if ":" in value else (value, "", "")
+    return host or "127.0.0.1", int(port) if port else default_port
+
+
+def encode_frame(batch):
+    payload = zlib.compress(json.dumps(batch, separators=(",", ":")).encode("utf-8"), COMPRESSION_LEVEL)
+    return FRAME_HEADER.pack(FRAME_MAGIC, len(payload)) + payload
+
+
+def decode_payload(payload):
+    """Сжатое тело кадра -> пачка; ValueError на повреждённом или слишком большом кадре"""
+    try:
+        decompressor = zlib.decompressobj()
+        data = decompressor.decompress(payload, MAX_DECODED_BYTES)
+        if decompressor.unconsumed_tail:
+            raise ValueError("decoded frame too large")
+        batch = json.loads(data)
+    except zlib.error as e:
+        raise ValueError(str(e)) from e
+    if not isinstance(batch, dict) or not isinstance(batch.get("series"), dict):
+        raise ValueError("malformed batch")
+    return batch
+
+
+def read_header(header):
+    magic, length = FRAME_HEADER.unpack(header)
+    if magic != FRAME_MAGIC or length > MAX_FRAME_BYTES:
+        raise ValueError(f"bad frame header ({magic!r}, {length} bytes)")
+    return length
+
+
+def _numeric(values):
+    """Числовые поля отсчёта (строки и вложенные структуры не передаются)"""
+    return {name: value for name, value in values.items()
+            if name != "timestamp" and (value is None or isinstance(value, (int, float)))}
+
+
+def _safe_name(value):
+    """Имя хоста/серии, пригодное для файла (без разделителей путей и "..")"""
+    name = UNSAFE_NAME_CHARS.sub("_", str(value))
+    return name if name.strip(".") else "_"
+
+
+class MetricsAgent:
+    """
+    Отправка отсчётов коллектору из фонового потока: вызов send не ждёт сети
+
+    Args:
+        address: (host, port) коллектора
+        protocol: "tcp" (переподключение, повтор кадра) или "udp" (без гарантий)
+        host: имя хоста в сериях коллектора (по умолчанию — имя машины)
+        batch_rows: отсчётов в пачке; полная пачка отправляется без ожидания
+        flush_interval: период отправки неполной пачки, сек
+        max_buffered: предел буфера; сверх него отбрасываются старые отсчёты
+    """
+
+    def __init__(self, address, protocol="tcp", host=None, batch_rows=DEFAULT_BATCH_ROWS,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, max_buffered=DEFAULT_MAX_BUFFERED):
+        if protocol not in ("tcp", "udp"):
+            raise ValueError(f"Unknown protocol: {protocol}")
+        self.address = address
+        self.protocol = protocol
+        self.host = host or socket.gethostname()
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self.buffer = collections.deque(maxlen=max_buffered)
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.closing = False
+        self.sock = None
+        # Кадры пачки, не ушедшие из-за обрыва: повторяются первыми, поэтому в памяти не больше одной пачки
+        self.pending = None
+        self.backoff = MIN_BACKOFF
+        self.next_attempt = 0.0
+        self.sent_rows = 0
+        self.sent_frames = 0
+        self.sent_bytes = 0
+        self.dropped = 0
+        self.failures = 0
+        self.failed_rows = 0
+        self.thread = threading.Thread(target=self._run, name="metrics-agent", daemon=True)
+        self.thread.start()
+
+    def send(self, series, timestamp, values):
+        """Ставит отсчёт в буфер; values — словарь, нечисловые поля пропускаются"""
+        with self.lock:
+            if len(self.buffer) == self.buffer.maxlen:
+                self.dropped += 1
+            self.buffer.append((series, timestamp, _numeric(values)))
+            full = len(self.buffer) >= self.batch_rows
+        if full:
+            self.wake.set()
+
+    def _take(self, limit):
+        with self.lock:
+            return [self.buffer.popleft() for _ in range(min(limit, len(self.buffer)))]
+
+    def _batch(self, items):
+        """Отсчёты -> пачка: колонки серии один раз, строки [ts, значения...]"""
+        grouped = {}
+        for name, timestamp, values in items:
+            grouped.setdefault(name, []).append((timestamp, values))
+        series = {}
+        for name, samples in grouped.items():
+            columns = list(dict.fromkeys(column for _, values in samples for column in values))
+            series[name] = {"columns": columns,
+                            "rows": [[timestamp] + [values.get(column) for column in columns]
+                                     for timestamp, values in samples]}
+        return {"host": self.host, "sent": time.time(), "dropped": self.dropped, "series": series}
+
+    def _frames(self, items):
+        """[(кадр, отсчётов)]; для UDP пачка делится, пока кадр не влезет в датаграмму"""
+        frame = encode_frame(self._batch(items))
+        if self.protocol == "tcp" or len(frame) <= MAX_DATAGRAM_BYTES or len(items) == 1:
+            return [(frame, len(items))]
+        middle = len(items) // 2
+        return self._frames(items[:middle]) + self._frames(items[middle:])
+
+    def _connect(self):
+        if self.protocol == "udp":
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.connect(self.address)
+            return
+        self.sock = socket.create_connection(self.address, timeout=CONNECT_TIMEOUT)
+        self.sock.settimeout(SEND_TIMEOUT)
+        logger.info(f"📡 Агент метрик подключён к {self.address[0]}:{self.address[1]}")
+
+    def _disconnect(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def _transmit(self, frame):
+        """True — кадр ушёл; при ошибке соединение закрывается до следующей попытки"""
+        try:
+            if self.sock is None:
+                self._connect()
+            if self.protocol == "udp":
+                self.sock.send(frame)
+            else:
+                # Таймаут sendall — коллектор перестал читать (перегружен); кадр повторится
+                self.sock.sendall(frame)
+        except OSError as e:
+            self.failures += 1
+            self._disconnect()
+            if self.backoff == MIN_BACKOFF:
+                logger.warning(f"⚠️ Коллектор {self.address[0]}:{self.address[1]} недоступен: {e}")
+            # Случайная добавка разводит переподключения агентов после перезапуска коллектора
+            self.next_attempt = time.monotonic() + self.backoff * random.uniform(1.0, 1.5)
+            self.backoff = min(self.backoff * 2, MAX_BACKOFF)
+            return False
+        self.backoff = MIN_BACKOFF
+        self.sent_frames += 1
+        self.sent_bytes += len(frame)
+        return True
+
+    def _flush(self):
+        while True:
+            if time.monotonic() < self.next_attempt:
+                return
+            if self.pending is None:
+                items = self._take(self.batch_rows)
+                if not items:
+                    return
+                self.pending = self._frames(items)
+            while self.pending:
+                frame, rows = self.pending[0]
+                if self._transmit(frame):
+                    self.sent_rows += rows
+                elif self.protocol == "tcp":
+                    return
+                else:
+                    # UDP без повторов: кадр потерян
+                    self.failed_rows += rows
+                self.pending.pop(0)
+            self.pending = None
+
+    def _run(self):
+        while not self.closing:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            self._flush()
+
+    def stats(self):
+        return {"buffered": len(self.buffer), "sent_rows": self.sent_rows, "sent_frames": self.sent_frames,
+                "sent_bytes": self.sent_bytes, "dropped": self.dropped, "failures": self.failures,
+                "failed_rows": self.failed_rows}
+
+    def close(self, timeout=SEND_TIMEOUT):
+        """Отправляет накопленное (одна попытка) и закрывает соединение"""
+        self.closing = True
+        self.wake.set()
+        self.thread.join(timeout=timeout)
+        if not self.thread.is_alive():
+            self.next_attempt = 0.0
+            self._flush()
+            self._disconnect()
+
+
+class _DatagramReceiver(asyncio.DatagramProtocol):
+    def __init__(self, collector):
+        self.collector = collector
+
+    def connection_made(self, transport):
+        # Всплески от многих агентов переполняют буфер ядра по умолчанию (потери не видны коллектору)
+        sock = transport.get_extra_info("socket")
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, UDP_RECEIVE_BUFFER)
+        except OSError:
+            pass
+
+    def datagram_received(self, data, addr):
+        self.collector._enqueue_datagram(data, addr)
+
+
+class MetricsCollector:
+    """
+    Приёмник пачек от агентов: очередь кадров, TimeSeriesStore и архив по сериям
+
+    Args:
+        root: каталог хранилищ (<хост>__<серия>.npz и archive/)
+        run_hours: длительность прогона для архивов TimeSeriesStore
+        queue_frames: предел очереди кадров (память: queue_frames * MAX_FRAME_BYTES в худшем случае)
+        max_series: предел числа серий "<хост>/<серия>"; новые сверх него отбрасываются
+        archive: писать ли все отсчёты в metrics_archive
+    """
+
+    def __init__(self, root, run_hours=72, queue_frames=DEFAULT_QUEUE_FRAMES, max_series=DEFAULT_MAX_SERIES,
+                 archive=True):
+        from metrics_archive import MetricsArchive
+
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.run_hours = run_hours
+        self.queue_frames = queue_frames
+        self.max_series = max_series
+        self.archive = MetricsArchive(self.root / ARCHIVE_DIR) if archive else None
+        self.queue = None
+        self.stores = {}
+        self.writers = {}
+        self.hosts = {}
+        self.connections = 0
+        self.frames = 0
+        self.rows = 0
+        self.bad_frames = 0
+        self.failed_frames = 0
+        self.dropped_frames = 0
+        self.dropped_series = 0
+
+    def ingest(self, batch):
+        """Раскладывает пачку по сериям "<хост>/<серия>" """
+        from timeseries_store import TimeSeriesStore
+
+        host = _safe_name(batch.get("host", "unknown"))
+        info = self.hosts.setdefault(host, {"rows": 0, "frames": 0, "agent_dropped": 0, "last_seen": None})
+        info["frames"] += 1
+        info["last_seen"] = time.time()
+        info["agent_dropped"] = batch.get("dropped", 0)
+        self.frames += 1
+        for name, entry in batch["series"].items():
+            key = f"{host}/{_safe_name(name)}"
+            columns, rows = entry.get("columns", []), entry.get("rows", [])
+            store = self.stores.get(key)
+            if store is None:
+                if len(self.stores) >= self.max_series:
+                    self.dropped_series += 1
+                    continue
+                store = self.stores[key] = TimeSeriesStore(columns, run_hours=self.run_hours)
+                if self.archive is not None:
+                    self.writers[key] = self.archive.writer(key, columns, ARCHIVE_CHUNK_ROWS)
+            writer = self.writers.get(key)
+            for row in rows:
+                # Колонки серии фиксируются первой пачкой; новые поля у агента отбрасываются
+                values = dict(zip(columns, row[1:]))
+                store.append(row[0], values)
+                if writer is not None:
+                    writer.append(row[0], values)
+            info["rows"] += len(rows)
+            self.rows += len(rows)
+
+    async def _handle_connection(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        self.connections += 1
+        try:
+            while True:
+                length = read_header(await reader.readexactly(FRAME_HEADER.size))
+                payload = await reader.readexactly(length)
+                # Полная очередь — соединение не читается, агент упирается в окно TCP
+                await self.queue.put(payload)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except ValueError as e:
+            self.bad_frames += 1
+            logger.warning(f"⚠️ {peer}: {e} — соединение закрыто")
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    def _enqueue_datagram(self, data, addr):
+        try:
+            length = read_header(data[:FRAME_HEADER.size])
+            if length != len(data) - FRAME_HEADER.size:
+                raise ValueError("truncated datagram")
+        except (ValueError, struct.error):
+            self.bad_frames += 1
+            return
+        try:
+            self.queue.put_nowait(data[FRAME_HEADER.size:])
+        except asyncio.QueueFull:
+            self.dropped_frames += 1
+
+    async def _consume(self):
+        while True:
+            payload = await self.queue.get()
+            try:
+                self.ingest(decode_payload(payload))
+            except (ValueError, KeyError, TypeError, IndexError) as e:
+                self.bad_frames += 1
+                logger.warning(f"⚠️ Повреждённая пачка: {e}")
+            except Exception as e:
+                # Например, OSError архива (диск заполнен): пачка теряется, разбор продолжается,
+                # иначе очередь встанет и все TCP-агенты упрутся в backpressure
+                self.failed_frames += 1
+                logger.error(f"❌ Не удалось сохранить пачку: {e!r}")
+
+    def save(self):
+        """Сохраняет хранилища серий (атомарно) и сбрасывает буферы архива"""
+        for key, store in list(self.stores.items()):
+            path = self.root / (key.replace("/", "__") + ".npz")
+            tmp_path = path.with_name(path.stem + ".tmp.npz")
+            store.save(tmp_path)
+            os.replace(tmp_path, path)
+        for writer in self.writers.values():
+            writer.flush()
+
+    def stats(self):
+        return {"connections": self.connections, "hosts": len(self.hosts), "series": len(self.stores),
+                "frames": self.frames, "rows": self.rows, "queued": self.queue.qsize() if self.queue else 0,
+                "bad_frames": self.bad_frames, "failed_frames": self.failed_frames,
+                "dropped_frames": self.dropped_frames,
+                "dropped_series": self.dropped_series,
+                "agent_dropped": sum(info["agent_dropped"] for info in self.hosts.values())}
+
+    async def serve(self, bind="0.0.0.0", port=DEFAULT_PORT, udp_port=None, duration=None):
+        """Принимает кадры до истечения duration (None — бесконечно); периодически сохраняет"""
+        self.queue = asyncio.Queue(maxsize=self.queue_frames)
+        loop = asyncio.get_running_loop()
+        server = await asyncio.start_server(self._handle_connection, bind, port)
+        transport = None
+        if udp_port:
+            transport, _ = await loop.create_datagram_endpoint(lambda: _DatagramReceiver(self),
+                                                               local_addr=(bind, udp_port))
+        logger.info(f"📡 Коллектор метрик: tcp {bind}:{port}" + (f", udp {bind}:{udp_port}" if udp_port else ""))
+        consumer = asyncio.create_task(self._consume())
+        started = last_save = last_stats = time.monotonic()
+        last_rows = 0
+        try:
+            while duration is None or time.monotonic() - started < duration:
+                await asyncio.sleep(1.0)
+                if consumer.done():
+                    error = None if consumer.cancelled() else consumer.exception()
+                    logger.error(f"❌ Разбор очереди остановился ({error!r}) — перезапуск")
+                    consumer = asyncio.create_task(self._consume())
+                now = time.monotonic()
+                if now - last_stats >= STATS_INTERVAL:
+                    stats = self.stats()
+                    logger.info(f"📥 {(stats['rows'] - last_rows) / (now - last_stats):.0f} отсчётов/с, "
+                                f"хостов {stats['hosts']}, соединений {stats['connections']}, "
+                                f"в очереди {stats['queued']}, отброшено кадров {stats['dropped_frames']}")
+                    last_rows, last_stats = stats["rows"], now
+                if now - last_save >= SAVE_INTERVAL:
+                    try:
+                        self.save()
+                    except OSError as e:
+                        logger.error(f"❌ Не удалось сохранить хранилища: {e}")
+                    last_save = now
+        finally:
+            server.close()
+            if transport is not None:
+                transport.close()
+            # Остаток очереди разбирается до сохранения (не дольше DRAIN_TIMEOUT)
+            deadline = time.monotonic() + DRAIN_TIMEOUT
+            while not self.queue.empty() and not consumer.done() and time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+            consumer.cancel()
+            self.save()
+
+
+def cmd_serve(args):
+    collector = MetricsCollector(args.root, args.run_hours, args.queue_frames, args.max_series,
+                                 archive=not args.no_archive)
+    try:
+        asyncio.run(collector.serve(args.bind, args.port, args.udp_port, args.duration))
+    except KeyboardInterrupt:
+        collector.save()
+    stats = collector.stats()
+    print(f"✅ {stats['rows']} отсчётов от {stats['hosts']} хостов в {stats['series']} сериях "
+          f"({stats['frames']} кадров, повреждённых {stats['bad_frames']}, "
+          f"не сохранено {stats['failed_frames']}, отброшено {stats['dropped_frames']})")
+    for host, info in sorted(collector.hosts.items()):
+        print(f"   {host}: {info['rows']} отсчётов, {info['frames']} кадров, потеряно агентом {info['agent_dropped']}")
+    return 0
+
+
+def cmd_bench(args):
+    """Синтетическая нагрузка: agents агентов по rate отсчётов/с"""
+    address = parse_address(args.address)
+    columns = [f"metric_{i}" for i in range(args.columns)]
+    agents = [MetricsAgent(address, args.protocol, host=f"bench-{i:03d}") for i in range(args.agents)]
+    started = time.monotonic()
+    ticks = 0
+    while time.monotonic() - started < args.seconds:
+        now = time.time()
+        for agent in agents:
+            for _ in range(args.rate // 10):
+                agent.send("resources", now, {name: random.random() for name in columns})
+        ticks += 1
+        time.sleep(max(0.0, started + ticks * 0.1 - time.monotonic()))
+    for agent in agents:
+        agent.close()
+    totals = collections.Counter()
+    for agent in agents:
+        totals.update(agent.stats())
+    elapsed = time.monotonic() - started
+    print(f"📊 {args.agents} агентов: {totals['sent_rows']} отсчётов за {elapsed:.1f} с "
+          f"({totals['sent_rows'] / elapsed:.0f}/с), {totals['sent_frames']} кадров, "
+          f"{totals['sent_bytes'] / max(totals['sent_rows'], 1):.1f} байт/отсчёт, "
+          f"отброшено {totals['dropped']}, ошибок отправки {totals['failures']}, потеряно {totals['failed_rows']}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-runner metrics collector")
+    subparsers = parser.add_subparsers(dest="command")
+
+    serve_parser = subparsers.add_parser("serve", help="Принимать метрики агентов")
+    serve_parser.add_argument("--root", default="logs/collector", help="Каталог хранилищ")
+    serve_parser.add_argument("--bind", default="0.0.0.0", help="Адрес прослушивания")
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="TCP порт")
+    serve_parser.add_argument("--udp-port", type=int, default=None, help="UDP порт (по умолчанию выключен)")
+    serve_parser.add_argument("--run-hours", type=float, default=72, help="Глубина TimeSeriesStore, часов")
+    serve_parser.add_argument("--queue-frames", type=int, default=DEFAULT_QUEUE_FRAMES, help="Предел очереди кадров")
+    serve_parser.add_argument("--max-series", type=int, default=DEFAULT_MAX_SERIES, help="Предел числа серий")
+    serve_parser.add_argument("--no-archive", action="store_true", help="Не писать отсчёты в metrics_archive")
+    serve_parser.add_argument("--duration", type=float, default=None, help="Остановиться через N секунд")
+
+    bench_parser = subparsers.add_parser("bench", help="Нагрузить коллектор синтетическими агентами")
+    bench_parser.add_argument("address", help="host:port коллектора")
+    bench_parser.add_argument("--agents", type=int, default=16, help="Число агентов")
+    bench_parser.add_argument("--rate", type=int, default=100, help="Отсчётов/с на агента")
+    bench_parser.add_argument("--columns", type=int, default=12, help="Метрик в отсчёте")
+    bench_parser.add_argument("--seconds", type=float, default=10, help="Длительность")
+    bench_parser.add_argument("--protocol", choices=("tcp", "udp"), default="tcp")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    if args.command == "serve":
+        return cmd_serve(args)
+    if args.command == "bench":
+        return cmd_bench(args)
+    parser.print_help()
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
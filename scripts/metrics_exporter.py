@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Metrics Exporter
+Встроенная точка /metrics в формате OpenMetrics для мониторинга и
+тренировки. Метрики (gauge, counter, histogram) агрегируются при обновлении
+под коротким замком, поэтому ответ на опрос строится за O(числа метрик) и
+не задерживает цикл тренировки. HTTP-сервер работает в фоновом потоке.
+
+Использование:
+    registry = MetricsRegistry()
+    loss = registry.gauge("ml_train_loss", "Loss of the last epoch")
+    server = start_metrics_server(registry, port=9108)
+    loss.set(0.42)
+"""
+
+import bisect
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def _format_value(value):
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, lock):
+        self.name = name
+        self.help = help_text
+        self.lock = lock
+        # Ключ — кортеж пар меток
+        self.values = {}
+
+    @staticmethod
+    def _key(labels):
+        return tuple(sorted(labels.items()))
+
+    def render(self):
+        lines = [f"# TYPE {self.name} {self.kind}", f"# HELP {self.name} {self.help}"]
+        with self.lock:
+            snapshot = list(self.values.items())
+        for key, value in snapshot:
+            lines += self._render_series(key, value)
+        return lines
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[self._key(labels)] = float(value)
+
+    def _render_series(self, key, value):
+        return [f"{self.name}{_format_labels(key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    """Монотонный счётчик; в выводе суффикс _total"""
+    kind = "counter"
+
+    def inc(self, amount=1.0, **labels):
+        if amount < 0:
+            raise ValueError("Counter can only increase")
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def _render_series(self, key, value):
+        return [f"{self.name}_total{_format_labels(key)} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    """Гистограмма с фиксированными границами; наблюдение — O(log числа корзин)"""
+    kind = "histogram"
+
+    def __init__(self, name, help_text, lock, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, lock)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            state["counts"][index] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def _render_series(self, key, state):
+        lines, cumulative = [], 0
+        with self.lock:
+            counts, total, count = list(state["counts"]), state["sum"], state["count"]
+        for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+            cumulative += bucket_count
+            lines.append(f"{self.name}_bucket{_format_labels(key, [('le', _format_value(bound))])} {cumulative}")
+        lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+        return lines
+
+
+class MetricsRegistry:
+    """Набор метрик процесса; повторная регистрация возвращает ту же метрику"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+
+    def _register(self, cls, name, help_text, **kwargs):
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = self.metrics[name] = cls(name, help_text, self.lock, **kwargs)
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} already registered as {metric.kind}")
+        return metric
+
+    def gauge(self, name, help_text):
+        return self._register(Gauge, name, help_text)
+
+    def counter(self, name, help_text):
+        return self._register(Counter, name, help_text)
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, help_text, buckets=buckets)
+
+    def render(self):
+        """Текст OpenMetrics для всех метрик"""
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines += metric.render()
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Опросы раз в несколько секунд не должны засорять логи
+        pass
+
+
+class MetricsServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, registry, host, port):
+        self.registry = registry
+        super().__init__((host, port), _MetricsHandler)
+        self.thread = threading.Thread(target=self.serve_forever, name="metrics-exporter", daemon=True)
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def start_metrics_server(registry, port, host=DEFAULT_HOST):
+    """Запускает /metrics в фоновом потоке; port=0 — свободный порт"""
+    server = MetricsServer(registry, host, port)
+    server.thread.start()
+    return server
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Model Probe
+Периодическая проверка модели для мониторинга: загружает самый свежий
+final_model или чекпоинт эксперимента (любой формат checkpoint_io),
+прогоняет фиксированный канареечный батч и возвращает перцентили
+задержки инференса, пропускную способность и дрейф выходов (расстояние
+логитов, KL, совпадение top-1) относительно предыдущей модели.
+
+Проверка держится в бюджете: torch ограничен threads потоками, а после
+прогона следующий откладывается так, чтобы доля CPU не превышала
+cpu_budget. Модель перезагружается только при появлении нового файла.
+
+Использование:
+    python scripts/model_probe.py                          # последний эксперимент
+    python scripts/model_probe.py experiments/results/exp_20250918_193000 --threads 1 --repeats 50
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "experiments" / "src"
+DEFAULT_RESULTS_DIR = SRC_DIR.parent / "results"
+DEFAULT_THREADS = 1
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_REPEATS = 20
+DEFAULT_WARMUP = 3
+# Доля одного ядра, которую проверка может занимать в среднем
+DEFAULT_CPU_BUDGET = 0.05
+CANARY_SEED = 4321
+PROBE_METRICS = ("model_age_s", "model_changed", "latency_p50_ms", "latency_p95_ms", "latency_p99_ms",
+                 "throughput", "finite", "canary_accuracy", "drift_l2", "drift_kl", "top1_agreement", "cpu_seconds")
+
+
+def latest_experiment(results_dir=DEFAULT_RESULTS_DIR):
+    experiments = sorted(Path(results_dir).glob("exp_*")) if Path(results_dir).is_dir() else []
+    return experiments[-1] if experiments else None
+
+
+def _percentile(sorted_values, q):
+    index = (len(sorted_values) - 1) * q
+    low, high = math.floor(index), math.ceil(index)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (index - low)
+
+
+class ModelProbe:
+    """
+    Канареечный прогон последней модели эксперимента
+
+    Args:
+        exp_dir: директория эксперимента (None — последний exp_* в results_dir)
+        threads: потоки torch для инференса
+        batch_size / repeats: размер канареечного батча и число замеров
+        cpu_budget: средняя доля ядра; сверх неё прогоны пропускаются
+        data_root: корень CIFAR-10 для канарейки из тестовой выборки (иначе синтетика)
+    """
+
+    def __init__(self, exp_dir=None, results_dir=DEFAULT_RESULTS_DIR, threads=DEFAULT_THREADS,
+                 batch_size=DEFAULT_BATCH_SIZE, repeats=DEFAULT_REPEATS, cpu_budget=DEFAULT_CPU_BUDGET,
+                 data_root=None):
+        # Ленивый импорт: torch и модули тренировки нужны только при включённой проверке
+        if str(SRC_DIR) not in sys.path:
+            sys.path.insert(0, str(SRC_DIR))
+        import torch
+        from eval_worker import find_checkpoints, load_held_out
+
+        self.torch = torch
+        self.find_checkpoints = find_checkpoints
+        self.exp_dir = Path(exp_dir) if exp_dir else None
+        self.results_dir = results_dir
+        self.threads = threads
+        self.repeats = repeats
+        self.cpu_budget = cpu_budget
+        torch.set_num_threads(threads)
+        if data_root:
+            inputs, targets = load_held_out(data_root)
+            self.inputs, self.targets = inputs[:batch_size], targets[:batch_size]
+        else:
+            generator = torch.Generator().manual_seed(CANARY_SEED)
+            self.inputs, self.targets = torch.randn(batch_size, 3, 32, 32, generator=generator), None
+        self.model = None
+        self.model_path = None
+        self.model_mtime = None
+        self.previous_logits = None
+        self.previous_model = None
+        self.next_allowed = 0.0
+
+    def _newest_model(self):
+        exp_dir = self.exp_dir or latest_experiment(self.results_dir)
+        if exp_dir is None or not exp_dir.is_dir():
+            return None
+        # find_checkpoints упорядочивает по эпохам, финальная модель — последней
+        candidates = self.find_checkpoints(str(exp_dir))
+        return exp_dir / candidates[-1] if candidates else None
+
+    def _load(self, path):
+        from checkpoint_io import load_checkpoint
+        from train_example import SimpleCNN
+
+        state = load_checkpoint(str(path))
+        state_dict = state.get("model_state_dict", state)
+        model = SimpleCNN(num_classes=10)
+        model.load_state_dict(state_dict, assign=True)
+        model.eval()
+        return model
+
+    def _drift(self, logits):
+        if self.previous_logits is None:
+            return {}
+        torch = self.torch
+        log_p = torch.log_softmax(self.previous_logits, dim=1)
+        log_q = torch.log_softmax(logits, dim=1)
+        return {
+            "drift_l2": (logits - self.previous_logits).norm(dim=1).mean().item(),
+            "drift_kl": torch.sum(log_p.exp() * (log_p - log_q), dim=1).mean().item(),
+            "top1_agreement": (logits.argmax(dim=1) == self.previous_logits.argmax(dim=1)).float().mean().item(),
+        }
+
+    def __call__(self):
+        """Словарь результатов или None (нет модели или исчерпан бюджет CPU)"""
+        if time.monotonic() < self.next_allowed:
+            return None
+        path = self._newest_model()
+        if path is None:
+            return None
+        # Время CPU только этого потока: process_time внутри run_monitoring учёл бы
+        # и другие проверки, и агент метрик
+        cpu_start = time.thread_time()
+        mtime = path.stat().st_mtime
+        changed = path != self.model_path or mtime != self.model_mtime
+        if changed:
+            self.model = self._load(path)
+            self.model_path, self.model_mtime = path, mtime
+
+        torch = self.torch
+        latencies = []
+        with torch.inference_mode():
+            for i in range(DEFAULT_WARMUP + self.repeats):
+                start = time.perf_counter()
+                logits = self.model(self.inputs)
+                if i >= DEFAULT_WARMUP:
+                    latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        result = {
+            "model": str(path),
+            "model_age_s": time.time() - mtime,
+            "model_changed": 1.0 if changed else 0.0,
+            "latency_p50_ms": _percentile(latencies, 0.5) * 1000,
+            "latency_p95_ms": _percentile(latencies, 0.95) * 1000,
+            "latency_p99_ms": _percentile(latencies, 0.99) * 1000,
+            "throughput": len(self.inputs) * len(latencies) / sum(latencies),
+            "finite": 1.0 if torch.isfinite(logits).all().item() else 0.0,
+        }
+        if self.targets is not None:
+            result["canary_accuracy"] = (logits.argmax(dim=1) == self.targets).float().mean().item()
+        if changed:
+            # Дрейф — к предыдущей модели; для той же модели он нулевой и не пересчитывается
+            result.update(self._drift(logits))
+            result["previous_model"] = str(self.previous_model) if self.previous_model else None
+            self.previous_logits, self.previous_model = logits.clone(), path
+        # Потоки пула torch (threads > 1) сюда не попадают — оценка сверху: время × потоки
+        cpu_used = (time.thread_time() - cpu_start) * self.threads
+        result["cpu_seconds"] = cpu_used
+        self.next_allowed = time.monotonic() + cpu_used / self.cpu_budget
+        return result
+
+
+def format_result(result):
+    line = (f"p50 {result['latency_p50_ms']:.1f} ms, p99 {result['latency_p99_ms']:.1f} ms, "
+            f"{result['throughput']:.0f} samples/s")
+    if "drift_kl" in result:
+        line += (f", drift KL {result['drift_kl']:.4f}, L2 {result['drift_l2']:.3f}, "
+                 f"top-1 agreement {result['top1_agreement']:.1%}")
+    if not result["finite"]:
+        line += ", ❌ non-finite logits"
+    return line
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Model canary latency and drift probe")
+    parser.add_argument("exp_dir", nargs="?", default=None, help="Директория эксперимента (по умолчанию — последняя)")
+    parser.add_argument("--results-dir", default=str(DEFAULT_RESULTS_DIR), help="Где искать exp_*")
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS, help="Потоки torch")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Размер канареечного батча")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="Замеров задержки")
+    parser.add_argument("--data-root", default=None, help="Корень CIFAR-10 (иначе синтетическая канарейка)")
+    parser.add_argument("--json", action="store_true", help="Вывести результат в JSON")
+    args = parser.parse_args()
+
+    # Разовый запуск — без ограничения доли CPU между прогонами
+    probe = ModelProbe(args.exp_dir, args.results_dir, args.threads, args.batch_size, args.repeats,
+                       cpu_budget=1.0, data_root=args.data_root)
+    result = probe()
+    if result is None:
+        print("❌ No model found")
+        return 1
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"🧪 {os.path.relpath(result['model'])}: {format_result(result)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
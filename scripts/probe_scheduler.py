@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Probe Scheduler
+Асинхронный планировщик независимых проверок. Каждая проверка идёт своей
+задачей с фиксированным шагом по монотонным часам (время работы проверки
+не добавляется к интервалу), имеет таймаут и счётчик пропущенных тиков.
+Блокирующие функции выполняются в пуле потоков, поэтому медленная
+проверка не задерживает остальные.
+"""
+
+import asyncio
+import inspect
+import math
+import time
+
+# Период проверки, что циклы проверок живы, сек
+WATCHDOG_INTERVAL = 5.0
+
+
+class Probe:
+    """
+    Описание проверки и её статистика
+
+    Args:
+        name: имя проверки
+        func: функция без аргументов (обычная — в потоке, или корутинная)
+        interval: шаг запуска, сек
+        timeout: предел одного запуска, сек (по умолчанию — interval)
+    """
+
+    def __init__(self, name, func, interval, timeout=None):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.timeout = timeout if timeout is not None else interval
+        self.runs = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.missed_ticks = 0
+        self.restarts = 0
+        self.last_duration = None
+        self.max_duration = 0.0
+        self.last_error = None
+        # Запуск, переживший таймаут: поток нельзя прервать, новый не стартует
+        self.inflight = None
+
+    def stats(self):
+        return {
+            "interval": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "missed_ticks": self.missed_ticks,
+            "restarts": self.restarts,
+            "last_duration": self.last_duration,
+            "max_duration": self.max_duration,
+            "last_error": self.last_error,
+        }
+
+
+class ProbeScheduler:
+    """
+    Запускает проверки и передаёт результаты в on_sample(probe, value)
+
+    on_sample вызывается в цикле событий; исключения проверок и таймауты
+    учитываются в статистике и передаются в on_error(probe, error).
+    """
+
+    def __init__(self, probes, on_sample=None, on_error=None):
+        self.probes = list(probes)
+        self.on_sample = on_sample
+        self.on_error = on_error
+
+    def _start(self, probe):
+        if inspect.iscoroutinefunction(probe.func):
+            return asyncio.ensure_future(probe.func())
+        return asyncio.ensure_future(asyncio.to_thread(probe.func))
+
+    async def _run_once(self, probe):
+        if probe.inflight is not None and not probe.inflight.done():
+            # Предыдущий запуск ещё висит после таймаута — тик пропускается
+            probe.missed_ticks += 1
+            return
+        started = time.monotonic()
+        task = probe.inflight = self._start(probe)
+        done, _ = await asyncio.wait({task}, timeout=probe.timeout)
+        duration = time.monotonic() - started
+        probe.last_duration = duration
+        probe.max_duration = max(probe.max_duration, duration)
+        if not done:
+            probe.timeouts += 1
+            probe.last_error = f"timeout after {probe.timeout}s"
+            if inspect.iscoroutinefunction(probe.func):
+                task.cancel()
+            self._report_error(probe, TimeoutError(probe.last_error))
+            return
+        probe.runs += 1
+        if task.exception() is not None:
+            probe.failures += 1
+            probe.last_error = repr(task.exception())
+            self._report_error(probe, task.exception())
+            return
+        if self.on_sample:
+            # Исключение обработчика (запись архива, оповещения) не должно завершить цикл проверки
+            try:
+                self.on_sample(probe, task.result())
+            except Exception as e:
+                probe.failures += 1
+                probe.last_error = repr(e)
+                self._report_error(probe, e)
+
+    def _report_error(self, probe, error):
+        if self.on_error:
+            self.on_error(probe, error)
+
+    async def _probe_loop(self, probe, start):
+        tick = 0
+        while True:
+            await asyncio.sleep(max(0.0, start + tick * probe.interval - time.monotonic()))
+            await self._run_once(probe)
+            # Следующий тик — ближайший в будущем; пропущенные учитываются, а не догоняются
+            elapsed_ticks = math.floor((time.monotonic() - start) / probe.interval) + 1
+            probe.missed_ticks += max(0, elapsed_ticks - (tick + 1))
+            tick = max(tick + 1, elapsed_ticks)
+
+    async def run(self, duration=None):
+        """Работает duration секунд (None — до отмены); возвращает статистику"""
+        start = time.monotonic()
+        tasks = [asyncio.ensure_future(self._probe_loop(probe, start)) for probe in self.probes]
+        try:
+            while duration is None or time.monotonic() - start < duration:
+                remaining = WATCHDOG_INTERVAL if duration is None else \
+                    min(WATCHDOG_INTERVAL, start + duration - time.monotonic())
+                await asyncio.sleep(max(0.0, remaining))
+                # Упавший цикл проверки перезапускается, иначе она молча замолчала бы до конца прогона
+                for i, (probe, task) in enumerate(zip(self.probes, tasks)):
+                    if not task.done():
+                        continue
+                    error = task.exception() if not task.cancelled() else None
+                    probe.restarts += 1
+                    probe.last_error = repr(error)
+                    self._report_error(probe, RuntimeError(f"probe loop stopped ({error!r}), restarting"))
+                    tasks[i] = asyncio.ensure_future(self._probe_loop(probe, time.monotonic()))
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return self.stats()
+
+    def stats(self):
+        return {probe.name: probe.stats() for probe in self.probes}
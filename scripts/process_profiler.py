@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+"""
+Process Profiler
+Наблюдение за процессом тренировки по PID без его перезапуска: CPU-время,
+потоки, переключения контекста, RSS, ввод-вывод и открытые файлы за
+интервал (psutil), а по запросу или по аномалии — выборка Python-стеков в
+collapsed-формат (flamegraph.pl, speedscope) и SVG-flamegraph.
+
+Стеки снимаются py-spy, если он установлен, иначе кооперативно: тренировка
+запускает StackSampler, который ждёт файл <exp_dir>/profile.request и
+пишет стеки в <exp_dir>/profiles/. PID тренировка кладёт в <exp_dir>/train.pid.
+
+Использование:
+    python scripts/process_profiler.py stats --interval 5 --count 12
+    python scripts/process_profiler.py profile --pid 12345 --seconds 30
+    python scripts/process_profiler.py render profiles/stacks_20250101_120000.folded
+"""
+
+import argparse
+import html
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from log_analyzer import RollingMedianMAD
+
+PID_FILE = "train.pid"
+PROFILE_REQUEST = "profile.request"
+PROFILES_DIR = "profiles"
+DEFAULT_RESULTS_DIR = Path(__file__).resolve().parent.parent / "experiments" / "results"
+DEFAULT_PROFILE_SECONDS = 30
+DEFAULT_RATE = 50
+REQUEST_POLL_INTERVAL = 1.0
+MB = 1024 ** 2
+PROCESS_METRICS = ("cpu_percent", "cpu_user_s", "cpu_system_s", "threads", "ctx_voluntary_ps",
+                   "ctx_involuntary_ps", "rss_mb", "read_mbps", "write_mbps", "open_files", "handles")
+# Аномалии, запускающие профилирование: (метрика, направление)
+TRIGGER_METRICS = (("cpu_percent", -1), ("ctx_involuntary_ps", 1), ("rss_mb", 1))
+TRIGGER_THRESHOLD = 6.0
+TRIGGER_HISTORY = 60
+TRIGGER_COOLDOWN = 1800
+FLAME_WIDTH = 1200
+FLAME_ROW = 16
+FLAME_MIN_FRACTION = 0.001
+
+
+def write_pid_file(exp_dir):
+    path = Path(exp_dir) / PID_FILE
+    path.write_text(str(os.getpid()), encoding="utf-8")
+    return path
+
+
+def remove_pid_file(exp_dir):
+    try:
+        (Path(exp_dir) / PID_FILE).unlink()
+    except FileNotFoundError:
+        pass
+
+
+def discover_pid(results_dir=DEFAULT_RESULTS_DIR):
+    """(pid, exp_dir) самого свежего эксперимента с живым train.pid или (None, None)"""
+    import psutil
+
+    results_dir = Path(results_dir)
+    candidates = sorted(results_dir.glob(f"exp_*/{PID_FILE}"), key=lambda p: p.stat().st_mtime, reverse=True) \
+        if results_dir.is_dir() else []
+    for pid_path in candidates:
+        try:
+            pid = int(pid_path.read_text(encoding="utf-8").strip())
+        except (OSError, ValueError):
+            continue
+        if psutil.pid_exists(pid):
+            return pid, pid_path.parent
+    return None, None
+
+
+class ProcessTracker:
+    """
+    Счётчики одного процесса за интервал между вызовами sample()
+
+    Недоступные на платформе или без прав счётчики возвращаются как None.
+    """
+
+    def __init__(self, pid, exp_dir=None):
+        import psutil
+
+        self.psutil = psutil
+        self.pid = pid
+        self.exp_dir = Path(exp_dir) if exp_dir else None
+        self.process = psutil.Process(pid)
+        self.name = self.process.name()
+        self.previous = None
+
+    def alive(self):
+        try:
+            return self.process.is_running() and self.process.status() != self.psutil.STATUS_ZOMBIE
+        except self.psutil.Error:
+            return False
+
+    def _read(self, method):
+        try:
+            return getattr(self.process, method)()
+        except (self.psutil.AccessDenied, AttributeError, NotImplementedError):
+            return None
+
+    def sample(self):
+        """Словарь по PROCESS_METRICS + timestamp; psutil.NoSuchProcess, если процесс завершился"""
+        now = time.monotonic()
+        with self.process.oneshot():
+            cpu = self.process.cpu_times()
+            threads = self.process.num_threads()
+            ctx = self._read("num_ctx_switches")
+            memory = self.process.memory_info()
+            io = self._read("io_counters")
+            handles = self._read("num_handles") if os.name == "nt" else self._read("num_fds")
+        open_files = self._read("open_files")
+        # Накопительные счётчики; скорости — по разнице с прошлым отсчётом
+        current = {"time": now, "cpu": cpu.user + cpu.system,
+                   "ctx_voluntary": ctx.voluntary if ctx else None,
+                   "ctx_involuntary": ctx.involuntary if ctx else None,
+                   "read_bytes": io.read_bytes if io else None,
+                   "write_bytes": io.write_bytes if io else None}
+        previous, self.previous = self.previous, current
+
+        def rate(key, scale=1.0):
+            if previous is None or current[key] is None or previous[key] is None:
+                return None
+            elapsed = current["time"] - previous["time"]
+            return (current[key] - previous[key]) / elapsed / scale if elapsed > 0 else None
+
+        return {
+            "timestamp": time.time(),
+            "cpu_percent": rate("cpu", 0.01),
+            "cpu_user_s": cpu.user,
+            "cpu_system_s": cpu.system,
+            "threads": threads,
+            "ctx_voluntary_ps": rate("ctx_voluntary"),
+            "ctx_involuntary_ps": rate("ctx_involuntary"),
+            "rss_mb": memory.rss / MB,
+            "read_mbps": rate("read_bytes", MB),
+            "write_mbps": rate("write_bytes", MB),
+            "open_files": len(open_files) if open_files is not None else None,
+            "handles": handles,
+        }
+
+
+class ProfileTrigger:
+    """Аномалии счётчиков процесса (скользящие медиана/MAD) с паузой между срабатываниями"""
+
+    def __init__(self, threshold=TRIGGER_THRESHOLD, cooldown=TRIGGER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.history = {name: RollingMedianMAD(TRIGGER_HISTORY, refresh=1) for name, _ in TRIGGER_METRICS}
+        self.last_fired = -float("inf")
+
+    def check(self, sample):
+        """Причина срабатывания (строка) или None"""
+        reason = None
+        for name, direction in TRIGGER_METRICS:
+            value = sample.get(name)
+            if value is None:
+                continue
+            median = self.history[name].check(value, self.threshold, direction)
+            if median is not None and reason is None:
+                reason = f"{name} {value:.1f} vs median {median:.1f}"
+            self.history[name].add(value)
+        if reason is None or time.monotonic() - self.last_fired < self.cooldown:
+            return None
+        self.last_fired = time.monotonic()
+        return reason
+
+
+def collapse_frames(frames, thread_names, skip_thread=None):
+    """sys._current_frames() -> collapsed-стеки вида поток;функция (файл:строка);..."""
+    stacks = []
+    for thread_id, frame in frames.items():
+        if thread_id == skip_thread:
+            continue
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        names.append(thread_names.get(thread_id, f"thread-{thread_id}"))
+        stacks.append(";".join(reversed(names)))
+    return stacks
+
+
+def write_collapsed(counts, path):
+    """Counter стеков -> файл .folded (атомарно)"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + f".tmp.{os.getpid()}")
+    with open(tmp, "w", encoding="utf-8") as f:
+        for stack, count in counts.most_common():
+            f.write(f"{stack} {count}\n")
+    os.replace(tmp, path)
+    return path
+
+
+def read_collapsed(path):
+    counts = Counter()
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            if stack and count.isdigit():
+                counts[stack] += int(count)
+    return counts
+
+
+def render_flamegraph(counts, path, title="Flame graph"):
+    """Самодостаточный SVG-flamegraph из collapsed-стеков (подсказки — <title>)"""
+    root = {"count": 0, "children": {}}
+    for stack, count in counts.items():
+        node = root
+        node["count"] += count
+        for name in stack.split(";"):
+            node = node["children"].setdefault(name, {"count": 0, "children": {}})
+            node["count"] += count
+    total = max(root["count"], 1)
+    rects, depth_max = [], 0
+
+    def layout(node, x, depth):
+        nonlocal depth_max
+        for name, child in sorted(node["children"].items()):
+            width = child["count"] / total * FLAME_WIDTH
+            if child["count"] / total >= FLAME_MIN_FRACTION:
+                rects.append((name, child["count"], x, depth, width))
+                depth_max = max(depth_max, depth)
+                layout(child, x, depth + 1)
+            x += width
+
+    layout(root, 0.0, 0)
+    height = (depth_max + 2) * FLAME_ROW + 24
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{FLAME_WIDTH}" height="{height}" '
+             f'font-family="monospace" font-size="11">',
+             f'<text x="4" y="14">{html.escape(title)} — {total} samples</text>']
+    for name, count, x, depth, width in rects:
+        y = height - (depth + 1) * FLAME_ROW
+        hue = zlib.crc32(name.encode("utf-8")) % 50
+        label = html.escape(name)
+        text = f'<text x="{x + 2:.1f}" y="{y + 11}">{label[:int(width / 7)]}</text>' if width > 21 else ""
+        parts.append(f'<g><title>{label} ({count} samples, {count / total:.1%})</title>'
+                     f'<rect x="{x:.1f}" y="{y}" width="{max(width - 0.5, 0.1):.1f}" height="{FLAME_ROW - 1}" '
+                     f'fill="hsl({hue},85%,60%)"/>{text}</g>')
+    parts.append("</svg>")
+    path = Path(path)
+    path.write_text("\n".join(parts), encoding="utf-8")
+    return path
+
+
+def profile_name():
+    return f"stacks_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+
+class StackSampler:
+    """
+    Кооперативный сэмплер стеков внутри процесса тренировки
+
+    Фоновый поток раз в секунду проверяет <exp_dir>/profile.request
+    ({"seconds": 30, "rate": 50}) и на время запроса снимает
+    sys._current_frames() с заданной частотой. Между запросами накладные
+    расходы — один stat в секунду.
+    """
+
+    def __init__(self, exp_dir):
+        self.exp_dir = Path(exp_dir)
+        self.request_path = self.exp_dir / PROFILE_REQUEST
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join(timeout=5)
+
+    def _run(self):
+        while not self.stop_event.wait(REQUEST_POLL_INTERVAL):
+            if not self.request_path.exists():
+                continue
+            try:
+                request = json.loads(self.request_path.read_text(encoding="utf-8") or "{}")
+            except (OSError, ValueError):
+                request = {}
+            try:
+                self.request_path.unlink()
+            except FileNotFoundError:
+                pass
+            self.sample(float(request.get("seconds", DEFAULT_PROFILE_SECONDS)), float(request.get("rate", DEFAULT_RATE)))
+
+    def sample(self, seconds, rate):
+        counts = Counter()
+        own = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline and not self.stop_event.is_set():
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            counts.update(collapse_frames(sys._current_frames(), names, own))
+            time.sleep(1.0 / rate)
+        name = profile_name()
+        folded = write_collapsed(counts, self.exp_dir / PROFILES_DIR / f"{name}.folded")
+        render_flamegraph(counts, folded.with_suffix(".svg"), f"PID {os.getpid()}, {seconds:g}s")
+        return folded
+
+
+def request_profile(exp_dir, seconds=DEFAULT_PROFILE_SECONDS, rate=DEFAULT_RATE):
+    """Запрос кооперативного профиля: результат появится в <exp_dir>/profiles/"""
+    path = Path(exp_dir) / PROFILE_REQUEST
+    tmp = path.with_name(path.name + f".tmp.{os.getpid()}")
+    tmp.write_text(json.dumps({"seconds": seconds, "rate": rate}), encoding="utf-8")
+    os.replace(tmp, path)
+    return path
+
+
+def profile_with_py_spy(pid, seconds, rate, out_dir):
+    """Блокирующая запись py-spy в collapsed-формат + SVG; None без py-spy"""
+    py_spy = shutil.which("py-spy")
+    if py_spy is None:
+        return None
+    folded = Path(out_dir) / f"{profile_name()}.folded"
+    folded.parent.mkdir(parents=True, exist_ok=True)
+    result = subprocess.run([py_spy, "record", "--pid", str(pid), "--duration", str(int(seconds)),
+                             "--rate", str(int(rate)), "--format", "raw", "--nonblocking", "--output", str(folded)],
+                            capture_output=True, text=True)
+    if result.returncode != 0 or not folded.exists():
+        raise RuntimeError(f"py-spy failed: {result.stderr.strip()[-300:]}")
+    render_flamegraph(read_collapsed(folded), folded.with_suffix(".svg"), f"PID {pid}, {seconds:g}s (py-spy)")
+    return folded
+
+
+def start_profile(pid, exp_dir=None, seconds=DEFAULT_PROFILE_SECONDS, rate=DEFAULT_RATE, out_dir=None):
+    """
+    Неблокирующий запуск профилирования цели
+
+    py-spy — в фоновом потоке (результат в out_dir или <exp_dir>/profiles),
+    иначе кооперативный запрос в exp_dir.
+
+    Returns:
+        каталог, где появится профиль, или None, если снять стеки нечем
+    """
+    out_dir = Path(out_dir) if out_dir else (Path(exp_dir) / PROFILES_DIR if exp_dir else Path(PROFILES_DIR))
+    if shutil.which("py-spy"):
+        threading.Thread(target=profile_with_py_spy, args=(pid, seconds, rate, out_dir),
+                         name="py-spy", daemon=True).start()
+        return out_dir
+    if exp_dir is not None:
+        request_profile(exp_dir, seconds, rate)
+        return Path(exp_dir) / PROFILES_DIR
+    return None
+
+
+def resolve_target(args):
+    if args.pid:
+        return args.pid, args.exp_dir
+    pid, exp_dir = discover_pid(args.results_dir)
+    if pid is None:
+        print(f"❌ No running training found in {args.results_dir} ({PID_FILE})")
+    return pid, exp_dir or args.exp_dir
+
+
+def cmd_stats(args):
+    pid, exp_dir = resolve_target(args)
+    if pid is None:
+        return 1
+    tracker = ProcessTracker(pid, exp_dir)
+    print(f"🔍 PID {pid} ({tracker.name})" + (f", {exp_dir}" if exp_dir else ""))
+    tracker.sample()
+    for _ in range(args.count):
+        time.sleep(args.interval)
+        sample = tracker.sample()
+        print(" ".join(f"{name}={sample[name]:.1f}" if isinstance(sample[name], float) else f"{name}={sample[name]}"
+                       for name in PROCESS_METRICS))
+    return 0
+
+
+def cmd_profile(args):
+    pid, exp_dir = resolve_target(args)
+    if pid is None:
+        return 1
+    out_dir = Path(args.out) if args.out else (Path(exp_dir) / PROFILES_DIR if exp_dir else Path(PROFILES_DIR))
+    print(f"🔥 Profiling PID {pid} for {args.seconds:g}s...")
+    folded = profile_with_py_spy(pid, args.seconds, args.rate, out_dir)
+    if folded is None:
+        if exp_dir is None:
+            print("❌ py-spy not installed and no experiment dir for cooperative sampling")
+            return 1
+        # Кооперативно: ждём новый профиль от StackSampler цели
+        before = set(out_dir.glob("*.folded"))
+        request_profile(exp_dir, args.seconds, args.rate)
+        deadline = time.time() + args.seconds + 30
+        while time.time() < deadline:
+            created = set(out_dir.glob("*.folded")) - before
+            if created:
+                folded = created.pop()
+                break
+            time.sleep(1)
+        if folded is None:
+            print("❌ No profile received (is StackSampler running in the target?)")
+            return 1
+    counts = read_collapsed(folded)
+    print(f"✅ {folded} ({sum(counts.values())} samples), flame graph: {folded.with_suffix('.svg')}")
+    leaf = Counter()
+    for stack, count in counts.items():
+        leaf[stack.rsplit(";", 1)[-1]] += count
+    for name, count in leaf.most_common(args.top):
+        print(f"   {count / max(sum(counts.values()), 1):6.1%}  {name}")
+    return 0
+
+
+def cmd_render(args):
+    counts = read_collapsed(args.folded)
+    out = args.out or str(Path(args.folded).with_suffix(".svg"))
+    render_flamegraph(counts, out, Path(args.folded).name)
+    print(f"✅ Flame graph: {out}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Attach-by-PID training process profiler")
+    subparsers = parser.add_subparsers(dest="command")
+
+    for name, help_text in (("stats", "Счётчики процесса за интервал"), ("profile", "Выборка Python-стеков")):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("--pid", type=int, default=None, help="PID (иначе train.pid из --results-dir)")
+        sub.add_argument("--exp-dir", default=None, help="Директория эксперимента цели")
+        sub.add_argument("--results-dir", default=str(DEFAULT_RESULTS_DIR), help="Где искать exp_*/train.pid")
+    stats_parser = subparsers.choices["stats"]
+    stats_parser.add_argument("--interval", type=float, default=5.0, help="Интервал, сек")
+    stats_parser.add_argument("--count", type=int, default=12, help="Число отсчётов")
+    profile_parser = subparsers.choices["profile"]
+    profile_parser.add_argument("--seconds", type=float, default=DEFAULT_PROFILE_SECONDS, help="Длительность, сек")
+    profile_parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="Отсчётов в секунду")
+    profile_parser.add_argument("--out", default=None, help="Каталог профилей")
+    profile_parser.add_argument("--top", type=int, default=10, help="Сколько горячих функций показать")
+
+    render_parser = subparsers.add_parser("render", help="SVG-flamegraph из .folded")
+    render_parser.add_argument("folded", help="Файл collapsed-стеков")
+    render_parser.add_argument("--out", default=None, help="Путь SVG")
+
+    args = parser.parse_args()
+    if args.command == "stats":
+        return cmd_stats(args)
+    if args.command == "profile":
+        return cmd_profile(args)
+    if args.command == "render":
+        return cmd_render(args)
+    parser.print_help()
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,42 +5,307 @@ ML Monitoring Script
 """
 
 import argparse
+import json
+import math
 import os
+import re
+import shutil
 import sys
 import time
 import logging
 from datetime import datetime, timedelta
 from pathlib import Path
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('monitoring.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
 
 logger = logging.getLogger(__name__)
 
 def setup_logging(log_dir="logs"):
-    """Настройка дополнительного логирования в файл"""
+    """Настройка логирования: очередь + фоновая запись в файлы и консоль
+    
+    monitoring.log (полный формат), <log_dir>/monitoring.txt (краткий) и
+    stdout обслуживает поток QueueListener (log_setup), поэтому вызовы
+    logger не ждут диска; файлы ротируются и сжимаются. <log_dir>/monitoring_archive
+    — те же записи в архиве с индексом по времени (log_archive query).
+    """
+    from log_archive import archive_handler
+    from log_setup import console_handler, file_handler, start_queue_logging
+
     log_path = Path(log_dir)
     log_path.mkdir(exist_ok=True)
     
-    file_handler = logging.FileHandler(log_path / "monitoring.txt")
-    file_handler.setLevel(logging.INFO)
-    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
-    logger.addHandler(file_handler)
+    start_queue_logging([
+        file_handler('monitoring.log', LOG_FORMAT),
+        file_handler(log_path / "monitoring.txt", '%(asctime)s - %(message)s'),
+        archive_handler(log_path / "monitoring_archive", LOG_FORMAT),
+        console_handler(LOG_FORMAT),
+    ])
+
+# Интервалы проверок, сек (каждая идёт по своему расписанию)
+RESOURCES_INTERVAL = 10
+LOG_SCAN_INTERVAL = 30
+MODEL_HEALTH_INTERVAL = 60
+PROCESS_INTERVAL = 10
+MODEL_PROBE_INTERVAL = 300
+MODEL_PROBE_TIMEOUT = 120
+DISK_SPACE_INTERVAL = 60
+STATUS_INTERVAL = 600
+DISK_FREE_WARN_GB = 10
+LOG_SCAN_PATTERN = re.compile(r"ERROR|Traceback|CUDA out of memory|NaN|❌")
+LOG_SCAN_SUFFIXES = (".log", ".txt", ".jsonl")
+DEFAULT_RESULTS_DIR = Path(__file__).resolve().parent.parent / "experiments" / "results"
+HISTORY_FILE = "resources_history.npz"
+ARCHIVE_DIR = "metrics_archive"
+# Чанк архива — час отсчётов ресурсов
+ARCHIVE_CHUNK_ROWS = 3600 // RESOURCES_INTERVAL
+
+
+class LogScanner:
+    """Инкрементальный просмотр логов: читаются только новые байты"""
+
+    def __init__(self, log_dirs):
+        self.log_dirs = [Path(d) for d in log_dirs]
+        self.offsets = {}
+
+    def __call__(self):
+        errors, last_error, new_bytes = 0, None, 0
+        for log_dir in self.log_dirs:
+            if not log_dir.is_dir():
+                continue
+            for path in log_dir.rglob("*"):
+                # Собственные логи мониторинга не сканируем
+                if path.suffix not in LOG_SCAN_SUFFIXES or path.stem.startswith("monitoring"):
+                    continue
+                offset = self.offsets.get(path, 0)
+                size = path.stat().st_size
+                if size < offset:
+                    offset = 0  # файл ротирован или перезаписан
+                if size == offset:
+                    continue
+                with open(path, "rb") as f:
+                    f.seek(offset)
+                    data = f.read()
+                # Незавершённую строку дочитаем в следующий раз
+                complete = data[:data.rfind(b"\n") + 1]
+                self.offsets[path] = offset + len(complete)
+                new_bytes += len(complete)
+                for line in complete.decode("utf-8", "replace").splitlines():
+                    if LOG_SCAN_PATTERN.search(line):
+                        errors += 1
+                        last_error = f"{path.name}: {line.strip()[:200]}"
+        return {"errors": errors, "last_error": last_error, "new_bytes": new_bytes}
+
+
+def check_model_health(results_dir):
+    """Свежесть чекпоинтов и последняя оценка в последнем эксперименте"""
+    experiments = sorted(Path(results_dir).glob("exp_*")) if Path(results_dir).is_dir() else []
+    if not experiments:
+        return None
+    exp_dir = experiments[-1]
+    artifacts = [p for p in (exp_dir / "checkpoints").glob("*") if ".tmp." not in p.name] + \
+        list(exp_dir.glob("final_model*"))
+    newest = max((p.stat().st_mtime for p in artifacts), default=None)
+    health = {"experiment": exp_dir.name, "checkpoints": len(artifacts),
+              "checkpoint_age_s": time.time() - newest if newest else None,
+              "eval_loss": None, "healthy": True}
+    eval_log = exp_dir / "logs" / "eval_metrics.jsonl"
+    if eval_log.exists():
+        lines = eval_log.read_text(encoding="utf-8").strip().splitlines()
+        if lines:
+            health["eval_loss"] = json.loads(lines[-1]).get("loss")
+            health["healthy"] = health["eval_loss"] is not None and math.isfinite(health["eval_loss"])
+    return health
+
+
+def check_disk_space(paths):
+    """Свободное место на дисках с логами и результатами"""
+    usage = {}
+    for path in paths:
+        if Path(path).exists():
+            total, _, free = shutil.disk_usage(path)
+            usage[str(path)] = {"free_gb": free / 1024**3, "free_percent": free / total * 100}
+    return usage
+
+
+class TrainingProcessProbe:
+    """Счётчики процесса тренировки: заданный PID или живой exp_*/train.pid"""
+
+    def __init__(self, results_dir, pid=None):
+        self.results_dir = results_dir
+        self.pid = pid
+        self.tracker = None
+
+    def _attach(self):
+        from process_profiler import ProcessTracker, discover_pid
+
+        pid, exp_dir = discover_pid(self.results_dir)
+        if self.pid is not None and pid != self.pid:
+            pid, exp_dir = self.pid, None
+        if pid is None:
+            return None
+        tracker = ProcessTracker(pid, exp_dir)
+        logger.info(f"🔗 Процесс тренировки: PID {pid} ({tracker.name})" + (f", {exp_dir}" if exp_dir else ""))
+        return tracker
+
+    def __call__(self):
+        import psutil
+
+        try:
+            if self.tracker is None or not self.tracker.alive():
+                self.tracker = self._attach()
+            return self.tracker.sample() if self.tracker else None
+        except psutil.NoSuchProcess:
+            self.tracker = None
+            return None
+
+
+def training_process_probe(results_dir, pid=None):
+    """TrainingProcessProbe или None без psutil"""
+    try:
+        import psutil  # noqa: F401
+    except ImportError:
+        logger.warning("⚠️ psutil не установлен — наблюдение за процессом тренировки отключено")
+        return None
+    return TrainingProcessProbe(results_dir, pid)
+
+
+def model_canary_probe(results_dir, threads):
+    """Канареечный прогон модели (model_probe); torch загружается при первом запуске, в потоке проверки"""
+    state = {}
+    
+    def run():
+        if "probe" not in state:
+            from model_probe import ModelProbe
+
+            try:
+                state["probe"] = ModelProbe(results_dir=results_dir, threads=threads)
+            except ImportError as e:
+                logger.warning(f"⚠️ Проверка модели отключена: {e}")
+                state["probe"] = None
+        return state["probe"]() if state["probe"] else None
+    return run
+
+
+def resource_probe():
+    """(функция отсчёта ресурсов, список метрик) или (None, None) без psutil"""
+    try:
+        from gpu_monitor import ResourceSampler
+    except ImportError:
+        logger.warning("⚠️ psutil не установлен — проверка ресурсов отключена")
+        return None, None
+    sampler = ResourceSampler()
+
+    def sample():
+        row, _ = sampler.sample()
+        return dict(zip(sampler.columns, row))
+    return sample, sampler.columns[1:]
+
+
+def alert_values(probe_name, value):
+    """Отсчёт проверки -> метрики для правил ("<проверка>.<поле>" в alert_rules.json)"""
+    if not value or probe_name == "status":
+        return None
+    if probe_name == "disk_space":
+        return {"free_gb": min(usage["free_gb"] for usage in value.values()),
+                "free_percent": min(usage["free_percent"] for usage in value.values())}
+    return value
+
+
+class MonitorMetrics:
+    """Метрики мониторинга для /metrics (metrics_exporter)"""
+
+    def __init__(self, resource_metrics):
+        from metrics_exporter import MetricsRegistry
+        from model_probe import PROBE_METRICS as MODEL_PROBE_METRICS
+        from process_profiler import PROCESS_METRICS
+
+        self.registry = MetricsRegistry()
+        self.resources = {name: self.registry.gauge(f"ml_monitor_{name}", f"Latest sampled {name}")
+                          for name in resource_metrics or ()}
+        self.probe_runs = self.registry.counter("ml_monitor_probe_runs", "Completed probe runs")
+        self.probe_errors = self.registry.counter("ml_monitor_probe_errors", "Failed or timed out probe runs")
+        self.probe_missed = self.registry.gauge("ml_monitor_probe_missed_ticks", "Probe ticks skipped so far")
+        self.probe_duration = self.registry.histogram("ml_monitor_probe_duration_seconds", "Probe run duration")
+        self.log_errors = self.registry.counter("ml_monitor_log_errors", "Error lines found in logs")
+        self.disk_free = self.registry.gauge("ml_monitor_disk_free_gb", "Free disk space")
+        self.process = {name: self.registry.gauge(f"ml_monitor_train_process_{name}", f"Training process {name}")
+                        for name in PROCESS_METRICS}
+        self.model = {name: self.registry.gauge(f"ml_monitor_model_{name}", f"Model canary {name}")
+                      for name in MODEL_PROBE_METRICS}
+        self.alerts = self.registry.counter("ml_monitor_alerts", "Alert rule transitions to firing")
+        self.alert_firing = self.registry.gauge("ml_monitor_alert_firing", "1 while the alert rule is firing")
+
+    def record_sample(self, probe, value):
+        self.probe_runs.inc(probe=probe.name)
+        self.probe_duration.observe(probe.last_duration, probe=probe.name)
+        self.probe_missed.set(probe.missed_ticks, probe=probe.name)
+        if probe.name == "resources":
+            for name, gauge in self.resources.items():
+                gauge.set(value[name])
+        elif probe.name == "log_scan":
+            self.log_errors.inc(value["errors"])
+        elif probe.name == "disk_space":
+            for path, usage in value.items():
+                self.disk_free.set(usage["free_gb"], path=path)
+        elif probe.name == "training_process" and value:
+            for name, gauge in self.process.items():
+                if value[name] is not None:
+                    gauge.set(value[name])
+        elif probe.name == "model_probe" and value:
+            for name, gauge in self.model.items():
+                if name in value:
+                    gauge.set(value[name])
+
+    def record_alert(self, event):
+        firing = event["state"] == "firing"
+        if firing:
+            self.alerts.inc(rule=event["rule"], severity=event["severity"])
+        self.alert_firing.set(1 if firing else 0, rule=event["rule"])
+
+    def record_error(self, probe):
+        self.probe_errors.inc(probe=probe.name)
+        self.probe_missed.set(probe.missed_ticks, probe=probe.name)
+
 
-def monitor_system(duration_hours=72):
+def monitor_system(duration_hours=72, log_dir="logs", results_dir=DEFAULT_RESULTS_DIR, metrics_port=None,
+                   train_pid=None, profile_seconds=None, profile_on_anomaly=True,
+                   alert_rules=None, alert_webhook=None, model_probe_threads=1,
+                   agent_collector=None, agent_protocol="tcp"):
     """
     Основная функция мониторинга системы
     
     Args:
-        duration_hours (int): Продолжительность мониторинга в часах
+        duration_hours (float): Продолжительность мониторинга в часах
+        log_dir (str): Директория логов для сканирования ошибок
+        results_dir (str): Директория экспериментов для проверки модели
+        metrics_port (int): Порт для /metrics в формате OpenMetrics (None — выключено)
+        train_pid (int): PID тренировки (None — из train.pid последнего эксперимента)
+        profile_seconds (float): Длительность выборки стеков (None — DEFAULT_PROFILE_SECONDS)
+        profile_on_anomaly (bool): Снимать стеки при аномалии счётчиков процесса;
+            по запросу — файл <log_dir>/profile.request
+        alert_rules (str): Файл правил оповещений (None — alert_rules.json, пустая строка — без оповещений)
+        alert_webhook (str): URL webhook для оповещений (alert_rules.py serve — локальная заглушка)
+        model_probe_threads (int): Потоки канареечной проверки модели (0 — выключена)
+        agent_collector (str): host:port коллектора (metrics_collector.py serve) — режим агента
+        agent_protocol (str): Транспорт агента: tcp или udp
     """
+    # Тяжёлые модули — только при запуске мониторинга, чтобы --help не ждал их импорта
+    import asyncio
+
+    from alert_rules import DEFAULT_RULES_PATH, AlertEngine, LogNotifier, WebhookNotifier, load_rules
+    from metrics_archive import MetricsArchive
+    from metrics_collector import MetricsAgent, parse_address
+    from metrics_exporter import start_metrics_server
+    from model_probe import PROBE_METRICS as MODEL_PROBE_METRICS, format_result
+    from probe_scheduler import Probe, ProbeScheduler
+    from process_profiler import DEFAULT_PROFILE_SECONDS, PROCESS_METRICS, PROFILE_REQUEST, ProfileTrigger, start_profile
+    from timeseries_store import TimeSeriesStore
+
+    if profile_seconds is None:
+        profile_seconds = DEFAULT_PROFILE_SECONDS
+    if alert_rules is None:
+        alert_rules = DEFAULT_RULES_PATH
     start_time = datetime.now()
     end_time = start_time + timedelta(hours=duration_hours)
     
@@ -48,36 +313,168 @@ def monitor_system(duration_hours=72):
     logger.info(f"📅 Начало: {start_time.strftime('%Y-%m-%d %H:%M:%S')}")
     logger.info(f"📅 Окончание: {end_time.strftime('%Y-%m-%d %H:%M:%S')}")
     
-    iteration = 0
+    state = {"status_count": 0, "process": None, "model": None}
     
-    try:
-        while datetime.now() < end_time:
-            iteration += 1
-            current_time = datetime.now()
-            remaining_time = end_time - current_time
-            
-            # Логирование статуса каждые 10 минут
-            if iteration % 60 == 1:  # каждый час при интервале 10 секунд
-                logger.info(f"📊 Итерация {iteration}")
-                logger.info(f"⏰ Время: {current_time.strftime('%Y-%m-%d %H:%M:%S')}")
-                logger.info(f"⏳ Осталось: {str(remaining_time).split('.')[0]}")
-                
-                # Здесь можно добавить проверки ML модели, метрики и т.д.
-                # Например:
-                # - Проверка доступности API
-                # - Мониторинг использования GPU/CPU
-                # - Проверка качества предсказаний
-                # - Анализ логов ошибок
-            
-            # Спим 10 секунд между проверками
-            time.sleep(10)
+    def report_status():
+        state["status_count"] += 1
+        current_time = datetime.now()
+        return {"iteration": state["status_count"], "time": current_time,
+                "remaining": max(end_time - current_time, timedelta(0))}
+    
+    probes = [
+        Probe("log_scan", LogScanner([log_dir, results_dir]), LOG_SCAN_INTERVAL),
+        Probe("model_health", lambda: check_model_health(results_dir), MODEL_HEALTH_INTERVAL),
+        Probe("disk_space", lambda: check_disk_space([log_dir, results_dir]), DISK_SPACE_INTERVAL),
+        Probe("status", report_status, STATUS_INTERVAL),
+    ]
+    sample_resources, resource_metrics = resource_probe()
+    # История ресурсов за весь прогон в кольцевых буферах фиксированного размера
+    history = TimeSeriesStore(resource_metrics, run_hours=duration_hours) if sample_resources else None
+    # Полные отсчёты — в сжатый колоночный архив для анализа после прогона
+    archive = MetricsArchive(Path(log_dir) / ARCHIVE_DIR).writer("resources", resource_metrics, ARCHIVE_CHUNK_ROWS) \
+        if sample_resources else None
+    if sample_resources is not None:
+        probes.insert(0, Probe("resources", sample_resources, RESOURCES_INTERVAL))
+    process_probe = training_process_probe(results_dir, train_pid)
+    process_archive = MetricsArchive(Path(log_dir) / ARCHIVE_DIR).writer("training_process", PROCESS_METRICS,
+                                                                       ARCHIVE_CHUNK_ROWS) if process_probe else None
+    if process_probe is not None:
+        probes.insert(1, Probe("training_process", process_probe, PROCESS_INTERVAL))
+    if model_probe_threads > 0:
+        probes.append(Probe("model_probe", model_canary_probe(results_dir, model_probe_threads),
+                            MODEL_PROBE_INTERVAL, MODEL_PROBE_TIMEOUT))
+    model_archive = MetricsArchive(Path(log_dir) / ARCHIVE_DIR).writer("model_probe", MODEL_PROBE_METRICS) \
+        if model_probe_threads > 0 else None
+    profile_trigger = ProfileTrigger() if profile_on_anomaly else None
+    profile_request = Path(log_dir) / PROFILE_REQUEST
+    
+    def profile(reason):
+        tracker = process_probe.tracker
+        target = start_profile(tracker.pid, tracker.exp_dir, profile_seconds)
+        if target is None:
+            logger.warning(f"⚠️ Стеки PID {tracker.pid} снять нечем (нет py-spy и train.pid)")
+        else:
+            logger.info(f"🔥 Профилирование PID {tracker.pid} на {profile_seconds:g} с ({reason}) -> {target}")
+    scheduler = ProbeScheduler(probes)
+    exporter = MonitorMetrics(resource_metrics) if metrics_port is not None else None
+    server = start_metrics_server(exporter.registry, metrics_port) if exporter else None
+    if server:
+        logger.info(f"📡 Метрики: http://{server.server_address[0]}:{server.server_address[1]}/metrics")
+    
+    # Правила оповещений вычисляются на каждом отсчёте (alert_rules)
+    notifiers = [LogNotifier(logger)]
+    webhook = WebhookNotifier(alert_webhook) if alert_webhook else None
+    if webhook:
+        notifiers.append(webhook)
+    if exporter:
+        notifiers.append(exporter.record_alert)
+    alerts = AlertEngine(load_rules(alert_rules), notifiers) if alert_rules else None
+    if alerts:
+        logger.info(f"🚨 Правил оповещений: {len(alerts.rules)} ({alert_rules})")
+    
+    # Режим агента: те же отсчёты пачками уходят на общий коллектор раннеров
+    agent = MetricsAgent(parse_address(agent_collector), agent_protocol) if agent_collector else None
+    if agent:
+        logger.info(f"📡 Агент метрик: {agent.host} -> {agent_collector} ({agent_protocol})")
+    
+    def on_sample(probe, value):
+        if exporter:
+            exporter.record_sample(probe, value)
+        values = alert_values(probe.name, value)
+        if alerts:
+            if values:
+                alerts.observe_many(values, prefix=f"{probe.name}.")
+            alerts.tick()
+        if agent and values:
+            agent.send(probe.name, values.get("timestamp", time.time()), values)
+        if probe.name == "resources":
+            history.append(value["timestamp"], value)
+            archive.append(value["timestamp"], value)
+        elif probe.name == "training_process" and value:
+            state["process"] = value
+            process_archive.append(value["timestamp"], value)
+            reason = profile_trigger.check(value) if profile_trigger else None
+            if profile_request.exists():
+                profile_request.unlink()
+                reason = "по запросу"
+            if reason:
+                profile(reason)
+        elif probe.name == "model_probe" and value:
+            state["model"] = value
+            model_archive.append(time.time(), value)
+            if value["model_changed"]:
+                logger.info(f"🧪 Модель {Path(value['model']).name}: {format_result(value)}")
+        elif probe.name == "log_scan" and value["errors"]:
+            logger.warning(f"⚠️ Ошибок в логах: {value['errors']}, последняя: {value['last_error']}")
+        elif probe.name == "model_health" and value and not value["healthy"]:
+            logger.warning(f"⚠️ {value['experiment']}: eval loss {value['eval_loss']}")
+        elif probe.name == "disk_space":
+            for path, usage in value.items():
+                if usage["free_gb"] < DISK_FREE_WARN_GB:
+                    logger.warning(f"⚠️ Мало места на диске ({path}): {usage['free_gb']:.1f} GB")
+        elif probe.name == "status":
+            logger.info(f"📊 Итерация {value['iteration']}")
+            logger.info(f"⏰ Время: {value['time'].strftime('%Y-%m-%d %H:%M:%S')}")
+            logger.info(f"⏳ Осталось: {str(value['remaining']).split('.')[0]}")
+            since = history.last_timestamp - STATUS_INTERVAL if history and history.last_timestamp else None
+            _, cpu = history.query("cpu_percent", since) if since else (None, [])
+            if len(cpu):
+                _, cpu_max = history.query("cpu_percent", since, consolidation="max")
+                logger.info(f"💻 CPU {cpu.mean():.0f}% (max {cpu_max.max():.0f}%), "
+                            f"RAM {history.latest('mem_percent'):.0f}%")
+            process = state["process"]
+            if process and process["cpu_percent"] is not None:
+                logger.info(f"🧵 Тренировка: CPU {process['cpu_percent']:.0f}%, потоков {process['threads']}, "
+                            f"RSS {process['rss_mb']:.0f} MB")
+            model = state["model"]
+            if model:
+                logger.info(f"🧪 Модель {Path(model['model']).name}: p50 {model['latency_p50_ms']:.1f} ms, "
+                            f"p99 {model['latency_p99_ms']:.1f} ms, {model['throughput']:.0f} samples/s")
+            lagging = {name: stats["missed_ticks"] + stats["timeouts"]
+                       for name, stats in scheduler.stats().items() if stats["missed_ticks"] or stats["timeouts"]}
+            if lagging:
+                logger.info(f"🐢 Пропущенные тики/таймауты: {lagging}")
+    
+    def on_error(probe, error):
+        if exporter:
+            exporter.record_error(probe)
+        logger.error(f"❌ Проверка {probe.name}: {error}")
+    
+    scheduler.on_sample = on_sample
+    scheduler.on_error = on_error
     
+    try:
+        stats = asyncio.run(scheduler.run(duration_hours * 3600))
     except KeyboardInterrupt:
         logger.info("⚠️ Мониторинг прерван пользователем")
+        stats = scheduler.stats()
     except Exception as e:
         logger.error(f"❌ Ошибка в процессе мониторинга: {str(e)}")
         return 1
+    finally:
+        # Закрытие и при сбое: иначе теряются несброшенные чанки архивов (до ARCHIVE_CHUNK_ROWS строк)
+        if server:
+            server.stop()
+        if webhook:
+            webhook.close()
+        if agent:
+            agent.close()
+            agent_stats = agent.stats()
+            logger.info(f"📡 Агент: отправлено {agent_stats['sent_rows']} отсчётов ({agent_stats['sent_bytes'] / 1024:.0f} KB), "
+                        f"отброшено {agent_stats['dropped']}, ошибок отправки {agent_stats['failures']}, "
+                        f"потеряно {agent_stats['failed_rows']}")
+        if process_archive is not None:
+            process_archive.close()
+        if model_archive is not None:
+            model_archive.close()
+        if history is not None:
+            archive.close()
+            history.save(Path(log_dir) / HISTORY_FILE)
+            logger.info(f"💾 История ресурсов: {Path(log_dir) / HISTORY_FILE}")
     
+    for name, probe_stats in stats.items():
+        logger.info(f"📈 {name}: {probe_stats['runs']} запусков, {probe_stats['failures']} ошибок, "
+                    f"{probe_stats['timeouts']} таймаутов, {probe_stats['missed_ticks']} пропущенных тиков")
     logger.info("✅ Мониторинг завершен успешно")
     return 0
 
@@ -85,8 +482,8 @@ def main():
     """Основная функция"""
     parser = argparse.ArgumentParser(description='ML Monitoring Script')
     parser.add_argument(
-        '--duration-hours', 
-        type=int, 
+        '--duration-hours', '--hours',
+        type=float,
         default=72,
         help='Продолжительность мониторинга в часах (по умолчанию: 72)'
     )
@@ -96,6 +493,70 @@ def main():
         default='logs',
         help='Директория для логов (по умолчанию: logs)'
     )
+    parser.add_argument(
+        '--results-dir',
+        type=str,
+        default=str(DEFAULT_RESULTS_DIR),
+        help='Директория экспериментов для проверки модели'
+    )
+    
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        default=None,
+        help='Порт HTTP /metrics (OpenMetrics) для живого наблюдения'
+    )
+    
+    parser.add_argument(
+        '--train-pid',
+        type=int,
+        default=None,
+        help='PID тренировки (по умолчанию — train.pid последнего эксперимента)'
+    )
+    parser.add_argument(
+        '--profile-seconds',
+        type=float,
+        default=None,
+        help='Длительность выборки стеков при аномалии или по запросу (по умолчанию: 30)'
+    )
+    parser.add_argument(
+        '--no-auto-profile',
+        action='store_true',
+        help='Не снимать стеки автоматически при аномалиях процесса'
+    )
+    
+    parser.add_argument(
+        '--alert-rules',
+        type=str,
+        default=None,
+        help='Файл правил оповещений JSON (по умолчанию: scripts/alert_rules.json; пустая строка — без оповещений)'
+    )
+    parser.add_argument(
+        '--alert-webhook',
+        type=str,
+        default=None,
+        help='URL webhook для оповещений (локально: alert_rules.py serve)'
+    )
+    
+    parser.add_argument(
+        '--model-probe-threads',
+        type=int,
+        default=1,
+        help='Потоки канареечной проверки модели (0 — выключить)'
+    )
+    
+    parser.add_argument(
+        '--agent-collector',
+        type=str,
+        default=None,
+        help='host:port коллектора метрик (metrics_collector.py serve); включает режим агента'
+    )
+    parser.add_argument(
+        '--agent-protocol',
+        choices=('tcp', 'udp'),
+        default='tcp',
+        help='Транспорт агента (по умолчанию: tcp)'
+    )
     
     args = parser.parse_args()
     
@@ -103,7 +564,10 @@ def main():
     setup_logging(args.log_dir)
     
     # Запуск мониторинга
-    return monitor_system(args.duration_hours)
+    return monitor_system(args.duration_hours, args.log_dir, args.results_dir, args.metrics_port,
+                          args.train_pid, args.profile_seconds, not args.no_auto_profile,
+                          args.alert_rules, args.alert_webhook, args.model_probe_threads,
+                          args.agent_collector, args.agent_protocol)
 
 if __name__ == "__main__":
     sys.exit(main())
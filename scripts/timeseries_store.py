@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Time-Series Store
+Хранилище метрик фиксированного размера в стиле RRD: несколько кольцевых
+буферов numpy разного разрешения (по умолчанию 1 с за последний час, 1 мин
+за сутки, 10 мин за весь прогон), в каждом ячейки хранят min/max/sum/count.
+Добавление — O(1) на архив, запрос диапазона — векторная выборка из самого
+подробного архива, покрывающего начало диапазона. Память не растёт со
+временем: 72 часа истории двух десятков метрик занимают несколько МБ.
+
+Использование:
+    python scripts/timeseries_store.py resources_history.npz --metric cpu_percent --last 3600
+"""
+
+import argparse
+import math
+import sys
+import time
+
+import numpy as np
+
+# (шаг в секундах, число ячеек; None — на весь прогон)
+DEFAULT_ARCHIVES = ((1, 3600), (60, 1440), (600, None))
+DEFAULT_RUN_HOURS = 72
+CONSOLIDATIONS = ("mean", "min", "max")
+
+
+class Archive:
+    """Кольцевой буфер одного разрешения"""
+
+    def __init__(self, step, capacity, num_metrics):
+        self.step = step
+        self.capacity = capacity
+        # Номер интервала (timestamp // step), записанного в ячейку; -1 — пусто
+        self.buckets = np.full(capacity, -1, dtype=np.int64)
+        self.min = np.full((capacity, num_metrics), np.inf, dtype=np.float32)
+        self.max = np.full((capacity, num_metrics), -np.inf, dtype=np.float32)
+        self.sum = np.zeros((capacity, num_metrics), dtype=np.float64)
+        self.count = np.zeros((capacity, num_metrics), dtype=np.int32)
+
+    def append(self, timestamp, values, present):
+        bucket = int(timestamp // self.step)
+        slot = bucket % self.capacity
+        current = self.buckets[slot]
+        if bucket < current:
+            return  # старее, чем хранит ячейка
+        if bucket != current:
+            self.buckets[slot] = bucket
+            self.min[slot] = np.inf
+            self.max[slot] = -np.inf
+            self.sum[slot] = 0.0
+            self.count[slot] = 0
+        np.fmin(self.min[slot], values, out=self.min[slot], where=present)
+        np.fmax(self.max[slot], values, out=self.max[slot], where=present)
+        np.add(self.sum[slot], values, out=self.sum[slot], where=present)
+        self.count[slot] += present
+
+    def covers(self, start, now):
+        return start >= (now // self.step - self.capacity + 1) * self.step
+
+    def select(self, metric_index, start, end, consolidation):
+        """(начала интервалов, значения) для [start, end]; пустые ячейки пропускаются"""
+        first, last = int(start // self.step), int(end // self.step)
+        first = max(first, last - self.capacity + 1)
+        wanted = np.arange(first, last + 1, dtype=np.int64)
+        slots = wanted % self.capacity
+        valid = (self.buckets[slots] == wanted) & (self.count[slots, metric_index] > 0)
+        slots, wanted = slots[valid], wanted[valid]
+        if consolidation == "min":
+            values = self.min[slots, metric_index].astype(np.float64)
+        elif consolidation == "max":
+            values = self.max[slots, metric_index].astype(np.float64)
+        else:
+            values = self.sum[slots, metric_index] / self.count[slots, metric_index]
+        return wanted * self.step, values
+
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.buckets, self.min, self.max, self.sum, self.count))
+
+
+class TimeSeriesStore:
+    """
+    Многоразрешающее хранилище для фиксированного набора метрик
+
+    Args:
+        metrics: имена метрик (колонки)
+        archives: пары (шаг, число ячеек); None — ячеек на run_hours
+        run_hours: длительность прогона для архивов "на весь прогон"
+    """
+
+    def __init__(self, metrics, archives=DEFAULT_ARCHIVES, run_hours=DEFAULT_RUN_HOURS):
+        self.metrics = list(metrics)
+        self.index = {name: i for i, name in enumerate(self.metrics)}
+        self.archives = [Archive(step, capacity or math.ceil(run_hours * 3600 / step) + 1, len(self.metrics))
+                         for step, capacity in archives]
+        self.last_timestamp = None
+
+    def append(self, timestamp, values):
+        """Отсчёт: список значений по metrics или словарь (недостающие — NaN)"""
+        if isinstance(values, dict):
+            values = [values.get(name, np.nan) for name in self.metrics]
+        values = np.asarray(values, dtype=np.float64)
+        present = ~np.isnan(values)
+        for archive in self.archives:
+            archive.append(timestamp, values, present)
+        self.last_timestamp = timestamp if self.last_timestamp is None else max(self.last_timestamp, timestamp)
+
+    def query(self, metric, start=None, end=None, consolidation="mean"):
+        """
+        Ряд метрики за [start, end] из самого подробного архива, покрывающего start
+
+        Returns:
+            (timestamps, values): начала интервалов и консолидированные значения
+        """
+        if consolidation not in CONSOLIDATIONS:
+            raise ValueError(f"Unknown consolidation: {consolidation}")
+        if self.last_timestamp is None:
+            return np.empty(0), np.empty(0)
+        end = self.last_timestamp if end is None else end
+        start = end - 3600 if start is None else start
+        archive = next((a for a in self.archives if a.covers(start, self.last_timestamp)), self.archives[-1])
+        return archive.select(self.index[metric], start, end, consolidation)
+
+    def latest(self, metric):
+        """Последнее значение метрики (среднее текущей ячейки самого подробного архива)"""
+        if self.last_timestamp is None:
+            return None
+        _, values = self.archives[0].select(self.index[metric], self.last_timestamp, self.last_timestamp, "mean")
+        return float(values[-1]) if len(values) else None
+
+    def nbytes(self):
+        return sum(archive.nbytes() for archive in self.archives)
+
+    def save(self, path):
+        """Сохраняет все архивы в .npz"""
+        arrays = {"metrics": np.array(self.metrics),
+                  "steps": np.array([a.step for a in self.archives]),
+                  "last_timestamp": np.array(self.last_timestamp if self.last_timestamp is not None else np.nan)}
+        for i, archive in enumerate(self.archives):
+            for field in ("buckets", "min", "max", "sum", "count"):
+                arrays[f"a{i}_{field}"] = getattr(archive, field)
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            store = cls(data["metrics"].tolist(), archives=[(int(step), 1) for step in data["steps"]])
+            for i, archive in enumerate(store.archives):
+                for field in ("buckets", "min", "max", "sum", "count"):
+                    setattr(archive, field, data[f"a{i}_{field}"])
+                archive.capacity = len(archive.buckets)
+            last = float(data["last_timestamp"])
+            store.last_timestamp = None if math.isnan(last) else last
+        return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query a saved multi-resolution time-series store")
+    parser.add_argument("path", help="Файл .npz (TimeSeriesStore.save)")
+    parser.add_argument("--metric", default=None, help="Метрика (по умолчанию — список метрик)")
+    parser.add_argument("--last", type=float, default=3600, help="Окно в секундах от последнего отсчёта")
+    parser.add_argument("--consolidation", choices=CONSOLIDATIONS, default="mean", help="Консолидация")
+    args = parser.parse_args()
+
+    store = TimeSeriesStore.load(args.path)
+    if args.metric is None:
+        print(f"📊 Metrics: {', '.join(store.metrics)} ({store.nbytes() / 1024**2:.1f} MB in memory)")
+        return 0
+    if args.metric not in store.index:
+        print(f"❌ Unknown metric: {args.metric}")
+        return 1
+    end = store.last_timestamp or time.time()
+    timestamps, values = store.query(args.metric, end - args.last, end, args.consolidation)
+    for timestamp, value in zip(timestamps, values):
+        print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))}  {value:.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
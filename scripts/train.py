@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Training Entry Point
+Точка входа длинного прогона: запускает train_model из experiments/src с
+неблокирующим логированием (log_setup). Вывод тренировки попадает в
+<log-dir>/train.log с ротацией и сжатием сегментов и дублируется в консоль,
+поэтому в workflow не нужен Tee-Object. Параллельно пишется
+<log-dir>/train_archive — архив с индексом по времени (log_archive).
+
+Использование:
+    python scripts/train.py --epochs 50 --batch-size 64 --log-dir logs/run
+    python scripts/train.py --data-root ../data --sampler importance --metrics-port 9108
+"""
+
+import argparse
+import contextlib
+import logging
+import os
+import sys
+from pathlib import Path
+
+from log_archive import archive_handler
+from log_setup import StreamToLogger, console_handler, file_handler, start_queue_logging, stop_queue_logging
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "experiments" / "src"
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+CHECKPOINT_FORMATS = ("safetensors", "torch", "store")
+SAMPLERS = ("uniform", "importance")
+
+logger = logging.getLogger("train")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-run training entry point")
+    parser.add_argument("--epochs", type=int, default=5, help="Число эпох (по умолчанию: 5)")
+    parser.add_argument("--batch-size", type=int, default=32, help="Размер батча (по умолчанию: 32)")
+    parser.add_argument("--learning-rate", type=float, default=0.001, help="Скорость обучения")
+    parser.add_argument("--checkpoint-format", choices=CHECKPOINT_FORMATS, default="safetensors",
+                        help="Формат чекпоинтов")
+    parser.add_argument("--data-root", default=None, help="Корень CIFAR-10 (иначе симуляция)")
+    parser.add_argument("--sampler", choices=SAMPLERS, default="uniform", help="Семплер примеров")
+    parser.add_argument("--num-workers", type=int, default=0, help="Процессы DataLoader")
+    parser.add_argument("--eval-threads", type=int, default=0, help="Потоки фоновой оценки (0 — выключена)")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Порт HTTP /metrics (OpenMetrics)")
+    parser.add_argument("--log-dir", default="logs", help="Директория логов (по умолчанию: logs)")
+    parser.add_argument("--rotate-mb", type=int, default=50, help="Ротация train.log по размеру, МБ")
+    args = parser.parse_args()
+
+    # Пути пользователя — от текущей директории, тренировка — из experiments/src
+    log_file = os.path.abspath(os.path.join(args.log_dir, "train.log"))
+    data_root = os.path.abspath(args.data_root) if args.data_root else None
+    start_queue_logging([
+        file_handler(log_file, LOG_FORMAT, max_bytes=args.rotate_mb * 1024 * 1024),
+        archive_handler(os.path.join(os.path.dirname(log_file), "train_archive"), LOG_FORMAT),
+        console_handler("%(message)s"),
+    ])
+    os.chdir(SRC_DIR)
+    sys.path.insert(0, str(SRC_DIR))
+
+    stream = StreamToLogger(logger)
+    try:
+        with contextlib.redirect_stdout(stream), contextlib.redirect_stderr(StreamToLogger(logger, logging.ERROR)):
+            from train_example import train_model
+            exp_dir, _ = train_model(num_epochs=args.epochs, batch_size=args.batch_size,
+                                     learning_rate=args.learning_rate, checkpoint_format=args.checkpoint_format,
+                                     eval_threads=args.eval_threads, data_root=data_root, sampler=args.sampler,
+                                     num_workers=args.num_workers, metrics_port=args.metrics_port)
+    except Exception:
+        logger.exception("❌ Training failed")
+        return 1
+    finally:
+        stream.flush()
+        stop_queue_logging()
+    print(f"✅ Experiment: {os.path.abspath(exp_dir)}, log: {log_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
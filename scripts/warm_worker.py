@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тёплый воркер: фреймворки импортированы и прогреты заранее
+
+Долгоживущий демон держит импортированными torch/torchvision/tensorflow с
+инициализированными пулами потоков и oneDNN. Клиент отправляет ему скрипт
+по Unix-сокету и получает stdout/stderr потоком и код возврата, поэтому
+короткие задачи и smoke-тесты стартуют за миллисекунды. --fork запускает
+каждую задачу в отдельном форке (изоляция состояния модулей, параллельные
+задачи); без него задачи выполняются по очереди в самом демоне.
+
+Использование:
+    python scripts/warm_worker.py serve --preload torch,torchvision &
+    python scripts/warm_worker.py run experiments/src/train_example.py
+    python scripts/warm_worker.py run --fork temp/test_tf.py
+    python scripts/warm_worker.py stop
+
+Если демон недоступен (или платформа без AF_UNIX/fork, как Windows), клиент
+выполняет скрипт локально в своём процессе.
+"""
+
+import argparse
+import contextlib
+import getpass
+import io
+import json
+import os
+import runpy
+import selectors
+import socket
+import socketserver
+import struct
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+SOCKET_ENV = "WARM_WORKER_SOCKET"
+DEFAULT_PRELOAD = "torch,torchvision"
+FRAME_HEADER = struct.Struct(">cI")
+FRAME_STDOUT = b"o"
+FRAME_STDERR = b"e"
+FRAME_EXIT = b"x"
+PIPE_READ_SIZE = 65536
+
+
+def default_socket_path():
+    """Путь сокета: WARM_WORKER_SOCKET или временная директория пользователя"""
+    user = os.getuid() if hasattr(os, "getuid") else getpass.getuser()
+    return os.environ.get(SOCKET_ENV, os.path.join(tempfile.gettempdir(), f"ml-warm-worker-{user}.sock"))
+
+
+def send_frame(sock, kind, payload):
+    sock.sendall(FRAME_HEADER.pack(kind, len(payload)) + payload)
+
+
+def recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("warm worker closed the connection")
+        data += chunk
+    return bytes(data)
+
+
+class FrameWriter(io.TextIOBase):
+    """Текстовый поток, отправляющий каждую запись кадром в сокет"""
+
+    def __init__(self, sock, kind):
+        self.sock = sock
+        self.kind = kind
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        if text:
+            send_frame(self.sock, self.kind, text.encode("utf-8", "replace"))
+        return len(text)
+
+
+def warm_up(modules):
+    """Импорт и прогрев фреймворков (пулы потоков, oneDNN)"""
+    for name in modules:
+        start = time.perf_counter()
+        try:
+            module = __import__(name)
+        except ImportError as e:
+            print(f"⚠️ {name} not available: {e}")
+            continue
+        if name == "torch":
+            x = module.randn(64, 64)
+            (x @ x).sum().item()
+            conv = module.nn.Conv2d(3, 8, 3)
+            conv(module.randn(1, 3, 32, 32)).sum().item()
+        elif name == "tensorflow":
+            x = module.random.normal((64, 64))
+            module.linalg.matmul(x, x).numpy()
+        print(f"🔥 {name} warmed in {time.perf_counter() - start:.2f}s")
+
+
+def run_script(argv, cwd):
+    """Выполняет скрипт как python <argv>; возвращает код возврата"""
+    script = argv[0]
+    saved_argv, saved_path0, saved_cwd = sys.argv, sys.path[0], os.getcwd()
+    sys.argv = list(argv)
+    os.chdir(cwd)
+    sys.path[0] = os.path.dirname(os.path.abspath(script))
+    try:
+        runpy.run_path(script, run_name="__main__")
+        return 0
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        if isinstance(e.code, int):
+            return e.code
+        print(e.code, file=sys.stderr)
+        return 1
+    except Exception:
+        traceback.print_exc()
+        return 1
+    finally:
+        sys.argv = saved_argv
+        sys.path[0] = saved_path0
+        os.chdir(saved_cwd)
+
+
+class WorkerHandler(socketserver.StreamRequestHandler):
+    """Одно соединение — одна задача"""
+
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        if request.get("command") == "shutdown":
+            send_frame(self.request, FRAME_EXIT, b"0")
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return
+        argv, cwd = request["argv"], request["cwd"]
+        if request.get("fork") and hasattr(os, "fork"):
+            code = self._run_forked(argv, cwd, request.get("env"))
+        else:
+            code = self._run_inline(argv, cwd)
+        send_frame(self.request, FRAME_EXIT, str(code).encode())
+
+    def _run_inline(self, argv, cwd):
+        # sys.stdout и cwd общие для процесса — задачи без форка идут по очереди
+        with self.server.inline_lock:
+            out = FrameWriter(self.request, FRAME_STDOUT)
+            err = FrameWriter(self.request, FRAME_STDERR)
+            with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+                return run_script(argv, cwd)
+
+    def _run_forked(self, argv, cwd, env):
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.dup2(out_w, 1)
+            os.dup2(err_w, 2)
+            for fd in (out_r, out_w, err_r, err_w):
+                os.close(fd)
+            sys.stdout = open(1, "w", buffering=1, closefd=False)
+            sys.stderr = open(2, "w", buffering=1, closefd=False)
+            if env:
+                os.environ.clear()
+                os.environ.update(env)
+            code = run_script(argv, cwd)
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+
+        os.close(out_w)
+        os.close(err_w)
+        selector = selectors.DefaultSelector()
+        selector.register(out_r, selectors.EVENT_READ, FRAME_STDOUT)
+        selector.register(err_r, selectors.EVENT_READ, FRAME_STDERR)
+        open_fds = 2
+        while open_fds:
+            for key, _ in selector.select():
+                data = os.read(key.fd, PIPE_READ_SIZE)
+                if data:
+                    send_frame(self.request, key.data, data)
+                else:
+                    selector.unregister(key.fd)
+                    os.close(key.fd)
+                    open_fds -= 1
+        _, status = os.waitpid(pid, 0)
+        return os.waitstatus_to_exitcode(status)
+
+
+class WarmWorkerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path):
+        self.inline_lock = threading.Lock()
+        super().__init__(socket_path, WorkerHandler)
+
+
+def cmd_serve(args):
+    """Запуск демона"""
+    if not hasattr(socket, "AF_UNIX"):
+        print("❌ Unix sockets are not supported on this platform", file=sys.stderr)
+        return 1
+    warm_up([name for name in args.preload.split(",") if name])
+    if os.path.exists(args.socket):
+        os.remove(args.socket)
+    with WarmWorkerServer(args.socket) as server:
+        os.chmod(args.socket, 0o600)
+        print(f"✅ Warm worker listening on {args.socket}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if os.path.exists(args.socket):
+                os.remove(args.socket)
+    return 0
+
+
+def connect(socket_path):
+    """Соединение с демоном или None, если он недоступен"""
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def submit(sock, request):
+    """Отправляет задачу и транслирует вывод; возвращает код возврата"""
+    sock.sendall(json.dumps(request).encode() + b"\n")
+    while True:
+        kind, size = FRAME_HEADER.unpack(recv_exact(sock, FRAME_HEADER.size))
+        payload = recv_exact(sock, size)
+        if kind == FRAME_EXIT:
+            return int(payload)
+        stream = sys.stdout if kind == FRAME_STDOUT else sys.stderr
+        stream.buffer.write(payload)
+        stream.flush()
+
+
+def cmd_run(args):
+    """Отправка скрипта демону (или локальный запуск без демона)"""
+    argv = [args.script] + args.args
+    sock = connect(args.socket)
+    if sock is None:
+        print("⚠️ Warm worker not available, running locally", file=sys.stderr)
+        return run_script(argv, os.getcwd())
+    with sock:
+        return submit(sock, {"argv": argv, "cwd": os.getcwd(), "fork": args.fork, "env": dict(os.environ)})
+
+
+def cmd_stop(args):
+    """Остановка демона"""
+    sock = connect(args.socket)
+    if sock is None:
+        print("⚠️ Warm worker not running")
+        return 0
+    with sock:
+        return submit(sock, {"command": "shutdown"})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm framework worker daemon")
+    parser.add_argument("--socket", default=default_socket_path(), help="Путь Unix-сокета")
+    subparsers = parser.add_subparsers(dest="command")
+
+    serve_parser = subparsers.add_parser("serve", help="Запустить демон")
+    serve_parser.add_argument("--preload", default=DEFAULT_PRELOAD,
+                              help=f"Модули для прогрева через запятую (по умолчанию: {DEFAULT_PRELOAD})")
+
+    run_parser = subparsers.add_parser("run", help="Выполнить скрипт в демоне")
+    run_parser.add_argument("--fork", action="store_true", help="Отдельный форк на задачу")
+    run_parser.add_argument("script", help="Путь к скрипту")
+    run_parser.add_argument("args", nargs=argparse.REMAINDER, help="Аргументы скрипта")
+
+    subparsers.add_parser("stop", help="Остановить демон")
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        return cmd_serve(args)
+    if args.command == "run":
+        return cmd_run(args)
+    if args.command == "stop":
+        return cmd_stop(args)
+    parser.print_help()
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
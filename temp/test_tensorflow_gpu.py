@@ -1,6 +1,12 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+from compute_bench import print_report, run_benchmarks
+
 print("=== TensorFlow GPU Test ===")
 try:
     import tensorflow as tf
@@ -19,18 +25,14 @@ try:
     for i, gpu in enumerate(gpus):
         print(f"   GPU {i}: {gpu}")
         
-    if len(gpus) > 0:
-        # Тест простого вычисления на GPU
-        print("🧪 Testing GPU computation...")
-        with tf.device('/GPU:0'):
-            a = tf.constant([[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]])
-            b = tf.constant([[7.0, 8.0], [9.0, 10.0], [11.0, 12.0]])
-            c = tf.matmul(a, b)
-            result = c.numpy()
-            print(f"✅ GPU computation result:\n{result}")
-    else:
+    if len(gpus) == 0:
         print("❌ No GPU devices found - TensorFlow running on CPU only")
-        
+
+    # Бенчмарк CPU вместо матрицы 2x3: GEMM, conv2d SimpleCNN, пропускная способность памяти
+    print("🧪 Running CPU compute benchmark...")
+    report = run_benchmarks(["tensorflow"], quick=True)
+    print_report(report)
+
     print("✅ TensorFlow test completed successfully")
         
 except ImportError as e:
@@ -1,6 +1,12 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+from compute_bench import print_report, run_benchmarks
+
 print("=== TensorFlow Test ===")
 try:
     import tensorflow as tf
@@ -13,15 +19,24 @@ try:
         print(f"   GPU {i}: {gpu}")
         
     if len(gpus) > 0:
-        # Тест простого вычисления на GPU
-        with tf.device('/GPU:0'):
-            a = tf.constant([[1.0, 2.0], [3.0, 4.0]])
-            b = tf.constant([[5.0, 6.0], [7.0, 8.0]])
-            c = tf.matmul(a, b)
-            print(f"✅ GPU computation test: {c.numpy()}")
+        # Вычисление на каждом GPU сверяется с CPU
+        with tf.device('/CPU:0'):
+            a = tf.random.normal((512, 512), seed=1)
+            b = tf.random.normal((512, 512), seed=2)
+            expected = tf.matmul(a, b)
+        for i in range(len(gpus)):
+            with tf.device(f'/GPU:{i}'):
+                c = tf.matmul(a, b)
+            error = float(tf.reduce_max(tf.abs(c - expected)))
+            print(f"{'✅' if error < 1e-2 else '❌'} GPU {i} computation test: max |GPU - CPU| = {error:.2e}")
     else:
         print("❌ No GPU devices found")
-        
+
+    # Бенчмарк CPU вместо матрицы 2x2: GEMM, conv2d SimpleCNN, пропускная способность памяти
+    print("🧪 Running CPU compute benchmark...")
+    report = run_benchmarks(["tensorflow"], quick=True)
+    print_report(report)
+
 except ImportError as e:
     print(f"❌ TensorFlow not installed: {e}")
 except Exception as e: